@@ -0,0 +1,481 @@
+"""
+Asyncio interface to locust, for embedding locust in services which run on an event loop
+
+Each stage (git, parse, render) has a coroutine counterpart to its run function. Work against
+libgit2 and rendering happens on a bounded thread pool, and Python AST work happens on a bounded
+process pool, so that a single event loop can run many analyses concurrently.
+
+Every coroutine accepts a timeout (in seconds) which bounds the whole call - for the async
+iterators, the whole iteration - and raises asyncio.TimeoutError once it has passed. Cancelling a
+coroutine stops it from scheduling any further work. Work which has already been handed to a pool
+runs to completion in the background, but its results are discarded.
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import os
+import sys
+import tempfile
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from . import git
+from . import parse
+from . import render
+
+T = TypeVar("T")
+
+DEFAULT_THREADS = min(32, (os.cpu_count() or 1) + 4)
+DEFAULT_PROCESSES = os.cpu_count() or 1
+
+_pools_lock = threading.Lock()
+_threads = DEFAULT_THREADS
+_processes = DEFAULT_PROCESSES
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# Returned by next() once a patch iterator is exhausted, since StopIteration cannot cross a future.
+_DONE: Any = object()
+
+
+def configure(threads: Optional[int] = None, processes: Optional[int] = None) -> None:
+    """
+    Sets the sizes of the pools that locust.aio offloads work to, shutting down any pools which are
+    already running (after their pending work is done).
+
+    If processes is 0, AST work happens on the thread pool instead of on a process pool.
+    """
+    global _threads, _processes
+    if threads is not None and threads < 1:
+        raise ValueError(f"Number of threads must be positive, got: {threads}")
+    if processes is not None and processes < 0:
+        raise ValueError(f"Number of processes must not be negative, got: {processes}")
+
+    shutdown()
+    with _pools_lock:
+        if threads is not None:
+            _threads = threads
+        if processes is not None:
+            _processes = processes
+
+
+def shutdown(wait: bool = True) -> None:
+    """
+    Shuts down the pools that locust.aio offloads work to. They are started again on demand.
+    """
+    global _thread_pool, _process_pool
+    with _pools_lock:
+        thread_pool, _thread_pool = _thread_pool, None
+        process_pool, _process_pool = _process_pool, None
+    for pool in [thread_pool, process_pool]:
+        if pool is None:
+            continue
+        # Pending work can only be cancelled from Python 3.9 - before that, it still runs.
+        if sys.version_info >= (3, 9):
+            pool.shutdown(wait=wait, cancel_futures=True)
+        else:
+            pool.shutdown(wait=wait)
+
+
+def thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _pools_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(
+                max_workers=_threads, thread_name_prefix="locust-aio"
+            )
+        return _thread_pool
+
+
+def process_pool() -> Executor:
+    global _process_pool
+    if _processes == 0:
+        return thread_pool()
+    with _pools_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=_processes)
+        return _process_pool
+
+
+def get_deadline(timeout: Optional[float]) -> Optional[float]:
+    if timeout is None:
+        return None
+    return asyncio.get_running_loop().time() + timeout
+
+
+async def before_deadline(awaitable: Awaitable[T], deadline: Optional[float]) -> T:
+    """
+    Awaits the given awaitable, raising asyncio.TimeoutError if it is not done by the given deadline
+    (in event loop time).
+    """
+    if deadline is None:
+        return await awaitable
+    remaining = deadline - asyncio.get_running_loop().time()
+    return await asyncio.wait_for(awaitable, max(remaining, 0))
+
+
+async def in_thread(deadline: Optional[float], function: Any, *args: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await before_deadline(
+        loop.run_in_executor(thread_pool(), function, *args), deadline
+    )
+
+
+def source_definitions(
+    filepath: str, source: str, ignore_docstrings: bool = False
+) -> List[bytes]:
+    """
+    Process pool worker for AST work. Protobuf messages cannot be pickled, so definitions cross the
+    process boundary in their serialized form.
+    """
+    definitions = parse.LocustVisitor(ignore_docstrings).source_definitions(
+        filepath, source
+    )
+    return [definition.SerializeToString() for definition in definitions]
+
+
+async def iter_patches_on_repository(
+    repository: Any,
+    initial_ref: str,
+    terminal_ref: Optional[str],
+    sources: Optional[git.SourceCache],
+    deadline: Optional[float],
+) -> AsyncIterator[git.PatchInfo]:
+    patches: Iterator[git.PatchInfo] = git.iter_patches(
+        repository, initial_ref, terminal_ref, sources
+    )
+    while True:
+        patch = await in_thread(deadline, next, patches, _DONE)
+        if patch is _DONE:
+            return
+        yield patch
+
+
+async def iter_patches(
+    repo_dir: str,
+    initial: Optional[str],
+    terminal: Optional[str],
+    sources: Optional[git.SourceCache] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[git.PatchInfo]:
+    """
+    Generates the patches that git.run would return for the given arguments, as they are read.
+    """
+    deadline = get_deadline(timeout)
+    repository = await in_thread(deadline, git.get_repository, repo_dir)
+    initial_ref, terminal_ref = await in_thread(
+        deadline, git.resolve_refs, repository, initial, terminal
+    )
+    async for patch in iter_patches_on_repository(
+        repository, initial_ref, terminal_ref, sources, deadline
+    ):
+        yield patch
+
+
+async def git_run(
+    repo_dir: str,
+    initial: Optional[str],
+    terminal: Optional[str],
+    sources: Optional[git.SourceCache] = None,
+    timeout: Optional[float] = None,
+) -> git.GitResult:
+    """
+    Coroutine counterpart to git.run.
+    """
+    deadline = get_deadline(timeout)
+    repository = await in_thread(deadline, git.get_repository, repo_dir)
+    initial_ref, terminal_ref = await in_thread(
+        deadline, git.resolve_refs, repository, initial, terminal
+    )
+    patches = [
+        patch
+        async for patch in iter_patches_on_repository(
+            repository, initial_ref, terminal_ref, sources, deadline
+        )
+    ]
+    return git.GitResult(
+        repo=git.repository_path(repository),
+        initial_ref=initial_ref,
+        terminal_ref=terminal_ref,
+        patches=patches,
+    )
+
+
+async def definitions_in_source(
+    filepath: str,
+    source: str,
+    cache: Optional[parse.DefinitionsCache],
+    ignore_docstrings: bool = False,
+) -> List[parse.RawDefinition]:
+    """
+    Same as parse.cached_source_definitions, but parses sources on the process pool.
+    """
+    _, extension = os.path.splitext(filepath)
+    if extension != ".py" or not source:
+        return []
+
+    key = parse.definitions_cache_key(source, ignore_docstrings)
+    if cache is not None:
+        definitions = cache.get(key)
+        if definitions is not None:
+            return definitions
+
+    loop = asyncio.get_running_loop()
+    serialized_definitions = await loop.run_in_executor(
+        process_pool(), source_definitions, filepath, source, ignore_docstrings
+    )
+    definitions = [
+        parse.RawDefinition.FromString(serialized_definition)
+        for serialized_definition in serialized_definitions
+    ]
+    if cache is not None:
+        cache[key] = definitions
+    return definitions
+
+
+async def old_definitions(
+    patch: git.PatchInfo,
+    cache: Optional[parse.DefinitionsCache],
+    ignore_docstrings: bool = False,
+) -> List[parse.RawDefinition]:
+    """
+    Same as parse.old_definitions, but parses sources on the process pool.
+    """
+    try:
+        return await definitions_in_source(
+            patch.old_file, patch.old_source, cache, ignore_docstrings
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return []
+
+
+async def iter_patch_analyses(
+    git_result: git.GitResult,
+    cache: Optional[parse.DefinitionsCache] = None,
+    timeout: Optional[float] = None,
+    ignore_docstrings: bool = False,
+) -> AsyncIterator[parse.PatchAnalysis]:
+    """
+    Generates a parse.PatchAnalysis for each patch in the given git result whose new source can be
+    parsed, in order. The sources of all patches (on both sides) are parsed concurrently.
+    """
+    deadline = get_deadline(timeout)
+    tasks = [
+        asyncio.ensure_future(
+            definitions_in_source(
+                patch.new_file, patch.new_source, cache, ignore_docstrings
+            )
+        )
+        for patch in git_result.patches
+    ]
+    old_tasks = [
+        asyncio.ensure_future(old_definitions(patch, cache, ignore_docstrings))
+        for patch in git_result.patches
+    ]
+    try:
+        for patch, task, old_task in zip(git_result.patches, tasks, old_tasks):
+            try:
+                definitions = await before_deadline(task, deadline)
+            except asyncio.TimeoutError:
+                raise
+            except Exception:
+                # Sources which cannot be parsed are skipped, as in parse.definitions_by_patch.
+                continue
+            previous_definitions = await before_deadline(old_task, deadline)
+            _, changes = parse.locust_changes_in_patch(
+                patch, definitions, git_result.terminal_ref, previous_definitions
+            )
+            yield (patch, definitions, previous_definitions, changes)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for old_task in old_tasks:
+            old_task.cancel()
+
+
+async def iter_changes(
+    git_result: git.GitResult,
+    cache: Optional[parse.DefinitionsCache] = None,
+    timeout: Optional[float] = None,
+    ignore_docstrings: bool = False,
+) -> AsyncIterator[parse.LocustChange]:
+    """
+    Generates the changes that parse.calculate_python_changes would return for the given git
+    result, in the same order, as soon as the patch they belong to has been parsed. Moves between
+    files can only be detected once all patches have been parsed, so these changes are never marked
+    as moved (parse_run marks them).
+    """
+    async for _, _, _, changes in iter_patch_analyses(
+        git_result, cache, timeout, ignore_docstrings
+    ):
+        for change in changes:
+            yield change
+
+
+def write_git_result(git_result: git.GitResult) -> str:
+    from google.protobuf.json_format import MessageToDict
+
+    fd, git_result_filename = tempfile.mkstemp()
+    with os.fdopen(fd, "w") as ofp:
+        json.dump(MessageToDict(git_result, preserving_proto_field_name=True), ofp)
+    return git_result_filename
+
+
+async def run_plugin(
+    plugin: str, git_result: git.GitResult, git_result_filename: str
+) -> List[parse.LocustChange]:
+    """
+    Same as a single plugin invocation in parse.calculate_plugin_changes, but the plugin process is
+    killed if the coroutine is cancelled.
+    """
+    fd, outfile = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        process = await asyncio.create_subprocess_shell(
+            f"{plugin} -i {git_result_filename} -o {outfile}"
+        )
+        try:
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if returncode != 0:
+            raise RuntimeError(f"Plugin exited with status {returncode}")
+        return await in_thread(
+            None, parse.calculate_changes_from_file, git_result, outfile
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(
+            f"Error getting results from plugin ({plugin}):\n{repr(e)}",
+            file=sys.stderr,
+        )
+        return []
+    finally:
+        os.remove(outfile)
+
+
+async def plugin_changes(
+    plugins: List[str], git_result: git.GitResult
+) -> Dict[str, List[parse.LocustChange]]:
+    """
+    Coroutine counterpart to parse.calculate_plugin_changes. Plugins run concurrently.
+    """
+    if not plugins:
+        return {}
+    git_result_filename = await in_thread(None, write_git_result, git_result)
+    try:
+        results = await asyncio.gather(
+            *[run_plugin(plugin, git_result, git_result_filename) for plugin in plugins]
+        )
+    finally:
+        os.remove(git_result_filename)
+    return dict(zip(plugins, results))
+
+
+async def parse_run(
+    git_result: git.GitResult,
+    plugins: List[str],
+    cache: Optional[parse.DefinitionsCache] = None,
+    timeout: Optional[float] = None,
+    ignore_docstrings: bool = False,
+) -> parse.ParseResult:
+    """
+    Coroutine counterpart to parse.run. Plugins run alongside locust's own analysis.
+    """
+
+    async def python_changes() -> List[parse.LocustChange]:
+        analyses = [
+            analysis
+            async for analysis in iter_patch_analyses(
+                git_result, cache, ignore_docstrings=ignore_docstrings
+            )
+        ]
+        parse.detect_moves(analyses)
+        return [change for _, _, _, changes in analyses for change in changes]
+
+    python_task = asyncio.ensure_future(python_changes())
+    plugins_task = asyncio.ensure_future(plugin_changes(plugins, git_result))
+    try:
+        changes, plugin_changes_dict = await before_deadline(
+            asyncio.gather(python_task, plugins_task), get_deadline(timeout)
+        )
+    finally:
+        python_task.cancel()
+        plugins_task.cancel()
+
+    for _, changes_from_plugin in plugin_changes_dict.items():
+        changes.extend(changes_from_plugin)
+    return parse.ParseResult(
+        repo=git_result.repo,
+        initial_ref=git_result.initial_ref,
+        terminal_ref=git_result.terminal_ref,
+        patches=git_result.patches,
+        changes=changes,
+    )
+
+
+async def render_run(
+    parse_result: parse.ParseResult,
+    render_format: str,
+    github_url: Optional[str],
+    additional_metadata: Optional[Dict[str, Any]] = None,
+    max_changes: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    drop_cosmetic: bool = False,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Coroutine counterpart to render.run.
+    """
+    return await in_thread(
+        get_deadline(timeout),
+        render.run,
+        parse_result,
+        render_format,
+        github_url,
+        additional_metadata,
+        max_changes,
+        max_bytes,
+        drop_cosmetic,
+    )
+
+
+async def run(
+    repo_dir: str,
+    initial: Optional[str],
+    terminal: Optional[str],
+    plugins: List[str],
+    render_format: str = "json",
+    github_url: Optional[str] = None,
+    additional_metadata: Optional[Dict[str, Any]] = None,
+    sources: Optional[git.SourceCache] = None,
+    cache: Optional[parse.DefinitionsCache] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Runs all three stages of a locust analysis and returns the rendered result.
+    """
+    deadline = get_deadline(timeout)
+
+    async def analysis() -> str:
+        git_result = await git_run(repo_dir, initial, terminal, sources)
+        parse_result = await parse_run(git_result, plugins, cache)
+        return await render_run(
+            parse_result, render_format, github_url, additional_metadata
+        )
+
+    return await before_deadline(analysis(), deadline)
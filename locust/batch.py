@@ -0,0 +1,224 @@
+"""
+Runs locust over many (repository, initial, terminal) jobs described by a JSONL manifest
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, IO, List, Optional, Set, Tuple
+
+from . import git
+from .server import Analyzer, DEFAULT_CACHE_SIZE, InvalidRequest
+
+# Each worker process analyzes its jobs with its own Analyzer, which keeps repositories open and
+# caches warm from one job to the next.
+worker_analyzer: Optional[Analyzer] = None
+
+
+def job_id(job: Dict[str, Any]) -> str:
+    """
+    Returns the identifier of the given job, which is used to recognize jobs that have already
+    completed. Jobs which do not specify an "id" are identified by their repository and revisions.
+    """
+    if job.get("id") is not None:
+        return str(job["id"])
+    return f"{job.get('repo')}:{job.get('initial')}..{job.get('terminal')}"
+
+
+def read_jobs(manifest: IO[str]) -> List[Dict[str, Any]]:
+    """
+    Reads jobs from a JSONL manifest, in which every non-empty line is a JSON object of the form
+    accepted by server.Analyzer.analyze, optionally with an "id".
+    """
+    jobs: List[Dict[str, Any]] = []
+    for line_number, line in enumerate(manifest, start=1):
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid job on line {line_number}: {str(e)}")
+        if not isinstance(job, dict):
+            raise ValueError(f"Invalid job on line {line_number}: not a JSON object")
+        jobs.append(job)
+    return jobs
+
+
+def completed_jobs(output_path: str) -> Set[str]:
+    """
+    Returns the identifiers of the jobs which completed successfully according to the given results
+    file. Lines which cannot be read (e.g. a line which was being written when a previous run was
+    interrupted) are ignored.
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r") as ifp:
+        for line in ifp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok":
+                completed.add(str(record.get("id")))
+    return completed
+
+
+def init_worker(cache_size: int) -> None:
+    global worker_analyzer
+    # Jobs come from a local manifest, so they may choose their own plugins.
+    worker_analyzer = Analyzer(cache_size, allow_request_plugins=True)
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs a single job in a worker process and returns its record for the results file.
+    """
+    if worker_analyzer is None:
+        init_worker(DEFAULT_CACHE_SIZE)
+    assert worker_analyzer is not None
+
+    record: Dict[str, Any] = {
+        "id": job_id(job),
+        "repo": job.get("repo"),
+        "initial": job.get("initial"),
+        "terminal": job.get("terminal"),
+    }
+    start = time.perf_counter()
+    try:
+        result = worker_analyzer.analyze(job)
+        record["status"] = "ok"
+        if job.get("format", "json") == "json":
+            record["result"] = json.loads(result)
+        else:
+            record["result"] = result
+    except (InvalidRequest, ValueError, git.GitRepositoryNotFound) as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    except KeyError as e:
+        record["status"] = "error"
+        record["error"] = f"Unknown revision: {str(e)}"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = repr(e)
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def run(
+    jobs: List[Dict[str, Any]],
+    output: IO[str],
+    workers: Optional[int] = None,
+    cache_size: int = DEFAULT_CACHE_SIZE,
+    completed: Optional[Set[str]] = None,
+) -> Tuple[int, int, int]:
+    """
+    Runs the given jobs across a pool of worker processes, writing a JSON record for each job to
+    output as soon as it finishes. Jobs whose identifiers are in completed are skipped.
+
+    Returns a tuple of the form: (number of successful jobs, number of failed jobs, number of
+    skipped jobs)
+    """
+    if completed is None:
+        completed = set()
+    pending = [job for job in jobs if job_id(job) not in completed]
+    num_skipped = len(jobs) - len(pending)
+    num_ok = 0
+    num_failed = 0
+    if not pending:
+        return num_ok, num_failed, num_skipped
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(cache_size,)
+    ) as executor:
+        futures = [executor.submit(run_job, job) for job in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            if record["status"] == "ok":
+                num_ok += 1
+            else:
+                num_failed += 1
+            print(json.dumps(record), file=output, flush=True)
+
+    return num_ok, num_failed, num_skipped
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "manifest",
+        type=argparse.FileType("r"),
+        help=(
+            "JSONL file describing one job per line, e.g. "
+            '{"id": ..., "repo": ..., "initial": ..., "terminal": ..., "plugins": [...]}'
+        ),
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help=(
+            "Path to the NDJSON file to write results to. If the file already exists, jobs which "
+            "completed successfully are skipped and new results are appended to it. If not "
+            "specified, writes results to stdout."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Number of blob sources (and, separately, of blob definitions) each worker caches",
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust batch",
+        description="Locust: Run locust over many jobs described in a JSONL manifest",
+    )
+    populate_argument_parser(parser)
+    args = parser.parse_args(argv)
+
+    with args.manifest as ifp:
+        jobs = read_jobs(ifp)
+
+    if args.output is None:
+        counts = run(jobs, sys.stdout, args.workers, args.cache_size)
+    else:
+        completed = completed_jobs(args.output)
+        # A previous run may have been interrupted in the middle of writing a record.
+        terminate_line = False
+        if os.path.exists(args.output):
+            with open(args.output, "rb") as ifp:
+                ifp.seek(0, os.SEEK_END)
+                if ifp.tell() > 0:
+                    ifp.seek(-1, os.SEEK_END)
+                    terminate_line = ifp.read(1) != b"\n"
+        with open(args.output, "a") as ofp:
+            if terminate_line:
+                ofp.write("\n")
+            counts = run(jobs, ofp, args.workers, args.cache_size, completed)
+
+    num_ok, num_failed, num_skipped = counts
+    print(
+        f"Jobs: {num_ok} succeeded, {num_failed} failed, {num_skipped} skipped",
+        file=sys.stderr,
+    )
+    if num_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Definition-level blame: which commit last changed each definition in a file, and how often it changed
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from . import git
+from . import parse
+from .index import DEFINITION_TYPES
+
+if TYPE_CHECKING:
+    import pygit2
+
+# (old start, old number of lines, new start, new number of lines) for each hunk of a diff without
+# context lines, in the order of the file.
+Hunks = List[Tuple[int, int, int, int]]
+
+
+def blob_hunks(
+    repository: "pygit2.Repository",
+    old_blob: Optional["pygit2.Blob"],
+    new_blob: "pygit2.Blob",
+) -> Optional[Hunks]:
+    """
+    Returns the hunks which take old_blob to new_blob, or None if there is no old blob.
+    """
+    if old_blob is None:
+        return None
+    patch = repository.diff(old_blob, new_blob, context_lines=0)
+    return [
+        (hunk.old_start, hunk.old_lines, hunk.new_start, hunk.new_lines)
+        for hunk in patch.hunks
+    ]
+
+
+def touches(hunks: Hunks, start: int, end: int) -> bool:
+    """
+    Returns True if any of the hunks changes the lines from start to end (inclusive, on the new side
+    of the hunks).
+    """
+    for _, _, new_start, new_lines in hunks:
+        if new_lines > 0:
+            if new_start <= end and start <= new_start + new_lines - 1:
+                return True
+        # Without context lines, the new start of a pure deletion is the line before the deleted
+        # lines.
+        elif start <= new_start < end:
+            return True
+    return False
+
+
+def map_line(hunks: Hunks, line: int, forward: bool) -> int:
+    """
+    Maps a line on the new side of the hunks to the corresponding line on their old side. Lines
+    which were inserted (and have no counterpart on the old side) are mapped to the closest line
+    which was not - after them if forward is True, before them otherwise.
+    """
+    shift = 0
+    for old_start, old_lines, new_start, new_lines in hunks:
+        new_end = new_start + new_lines
+        if new_lines > 0 and new_start <= line < new_end:
+            if old_lines > 0:
+                return old_start + min(line - new_start, old_lines - 1)
+            # Pure insertions start after the line old_start.
+            return old_start + 1 if forward else old_start
+        if (new_lines > 0 and new_end <= line) or (new_lines == 0 and new_start < line):
+            shift += new_lines - old_lines
+    return line - shift
+
+
+def map_extent(hunks: Hunks, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """
+    Maps the lines from start to end (inclusive, on the new side of the hunks) to the corresponding
+    lines on the old side. Returns None if none of the lines existed on the old side.
+    """
+    old_start = map_line(hunks, start, True)
+    old_end = map_line(hunks, end, False)
+    if old_start > old_end:
+        return None
+    return old_start, old_end
+
+
+def file_definitions(path: str, source: str) -> List[parse.RawDefinition]:
+    patch = git.PatchInfo(new_file=path, new_source=source)
+    definitions = parse.cached_patch_definitions(patch)
+    return [
+        definition
+        for definition in definitions
+        if definition.change_type in DEFINITION_TYPES
+    ]
+
+
+def cache_path(repository: "pygit2.Repository", oid: str) -> str:
+    return os.path.join(repository.path, "locust", "blame", f"{oid}.json")
+
+
+def read_cache(repository: "pygit2.Repository", oid: str) -> Dict[str, Any]:
+    try:
+        with open(cache_path(repository, oid), "r") as ifp:
+            cached = json.load(ifp)
+    except (OSError, ValueError):
+        return {}
+    return cached if isinstance(cached, dict) else {}
+
+
+def write_cache(
+    repository: "pygit2.Repository", oid: str, cached: Dict[str, Any]
+) -> None:
+    path = cache_path(repository, oid)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as ofp:
+        json.dump(cached, ofp)
+    os.replace(temporary_path, path)
+
+
+def blame_definitions(
+    repository: "pygit2.Repository", path: str, commit: "pygit2.Commit"
+) -> List[Dict[str, Any]]:
+    """
+    Walks the first-parent history of the given file back from the given commit. For each definition
+    in the file at that commit, finds the last commit which changed it, the commit which introduced
+    it and the number of commits which changed it.
+
+    The extent of each definition is carried back from commit to commit through the hunks of the
+    file alone, so no revision of the file other than the first needs to be parsed.
+    """
+    import pygit2
+
+    blob = repository.get(commit.tree[path].id)
+    if not isinstance(blob, pygit2.Blob):
+        raise ValueError(f"No file at path {path} in commit {commit.id}")
+    definitions = file_definitions(path, blob.data.decode(errors="ignore"))
+
+    results: List[Dict[str, Any]] = [
+        {
+            "name": definition.name,
+            "type": definition.change_type,
+            "line": definition.line,
+            "end_line": definition.end_line,
+            "last_commit": None,
+            "introduced": None,
+            "changes": 0,
+        }
+        for definition in definitions
+    ]
+    # Extents of the definitions which are still being tracked, in the coordinates of the current
+    # revision of the file.
+    extents: Dict[int, Tuple[int, int]] = {
+        i: (definition.line, definition.end_line or definition.line)
+        for i, definition in enumerate(definitions)
+    }
+
+    current: Optional[pygit2.Commit] = commit
+    current_blob = blob
+    while current is not None and extents:
+        parent = current.parents[0] if current.parents else None
+        parent_blob: Optional[pygit2.Blob] = None
+        if parent is not None:
+            try:
+                candidate = repository.get(parent.tree[path].id)
+                if isinstance(candidate, pygit2.Blob):
+                    parent_blob = candidate
+            except KeyError:
+                pass
+
+        if parent_blob is None or parent_blob.id != current_blob.id:
+            hunks = blob_hunks(repository, parent_blob, current_blob)
+            commit_hash = str(current.id)
+            for i, (start, end) in list(extents.items()):
+                if hunks is not None and not touches(hunks, start, end):
+                    old_extent = map_extent(hunks, start, end)
+                    if old_extent is not None:
+                        extents[i] = old_extent
+                        continue
+
+                results[i]["changes"] += 1
+                if results[i]["last_commit"] is None:
+                    results[i]["last_commit"] = commit_hash
+                old_extent = (
+                    map_extent(hunks, start, end) if hunks is not None else None
+                )
+                if old_extent is None:
+                    results[i]["introduced"] = commit_hash
+                    del extents[i]
+                else:
+                    extents[i] = old_extent
+
+        if parent_blob is None:
+            break
+        current = parent
+        current_blob = parent_blob
+
+    return results
+
+
+def run(
+    repo_dir: str,
+    path: str,
+    revision: str = "HEAD",
+    definition: Optional[str] = None,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Returns the blame of each definition in the given file at the given revision (or only of the
+    given definition and the definitions nested in it).
+
+    Results are cached (in the git directory) per blob, and keyed by the commit which last changed
+    the file, so repeated queries for the same version of a file do not walk its history again.
+
+    Raises a ValueError if there is no such file in the revision, or if it is not valid Python.
+    """
+    import pygit2
+
+    repository = git.get_repository(repo_dir)
+    commit = repository.revparse_single(revision).peel(pygit2.Commit)
+    path = os.path.normpath(path)
+    try:
+        entry = commit.tree[path]
+    except KeyError:
+        entry = None
+    if not isinstance(entry, pygit2.Blob):
+        raise ValueError(f"No file at path {path} in revision {revision}")
+    oid = str(entry.id)
+
+    # Results only depend on the history of the file, so they are the same for every commit since
+    # the file last changed.
+    last_change = commit
+    while last_change.parents:
+        parent = last_change.parents[0]
+        try:
+            parent_oid = str(parent.tree[path].id)
+        except KeyError:
+            break
+        if parent_oid != oid:
+            break
+        last_change = parent
+
+    cache_key = f"{path}:{last_change.id}"
+    cached = read_cache(repository, oid) if use_cache else {}
+    results = cached.get(cache_key)
+    if results is None:
+        try:
+            results = blame_definitions(repository, path, last_change)
+        except SyntaxError as e:
+            raise ValueError(f"Could not parse {path} in revision {revision}: {str(e)}")
+        if use_cache:
+            cached[cache_key] = results
+            write_cache(repository, oid, cached)
+
+    if definition is not None:
+        results = [
+            result
+            for result in results
+            if result["name"] == definition
+            or result["name"].startswith(f"{definition}.")
+        ]
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust blame",
+        description=(
+            "Locust: For each definition in a file, report the commit which last changed it, the "
+            "commit which introduced it and the number of commits which changed it"
+        ),
+    )
+    parser.add_argument(
+        "-r", "--repo", required=False, default=".", help="Path to git repository"
+    )
+    parser.add_argument(
+        "target",
+        help="Path of the file (relative to the repository root), optionally followed by "
+        ":<definition> (e.g. locust/render.py:nest_results)",
+    )
+    parser.add_argument(
+        "--at", default="HEAD", help="Revision at which to blame (default: HEAD)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Do not read or write cached results"
+    )
+    args = parser.parse_args(argv)
+
+    path, _, definition = args.target.partition(":")
+    try:
+        results = run(args.repo, path, args.at, definition or None, not args.no_cache)
+    except ValueError as e:
+        print(f"Could not blame {path}: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        for result in results:
+            print(json.dumps(result))
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+In-memory caches shared between locust runs in long-lived processes
+"""
+from collections import OrderedDict
+import threading
+from typing import Iterator, MutableMapping, TypeVar
+
+KT = TypeVar("KT")
+VT = TypeVar("VT")
+
+
+class LRUCache(MutableMapping[KT, VT]):
+    """
+    Thread-safe mapping which holds at most max_size items, evicting the least recently used item
+    when it is full.
+
+    Can be used wherever locust accepts a cache (e.g. git.SourceCache, parse.DefinitionsCache).
+    """
+
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise ValueError(f"Cache size must be positive, got: {max_size}")
+        self.max_size = max_size
+        self._items: "OrderedDict[KT, VT]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: KT) -> VT:
+        with self._lock:
+            value = self._items[key]
+            self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: KT, value: VT) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __delitem__(self, key: KT) -> None:
+        with self._lock:
+            del self._items[key]
+
+    def __iter__(self) -> Iterator[KT]:
+        with self._lock:
+            keys = list(self._items)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._items)
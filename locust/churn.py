@@ -0,0 +1,324 @@
+"""
+Aggregates locust changes over a range of history, to find the definitions which change most often
+"""
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import heapq
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import git
+from . import log
+from . import parse
+from .cache import LRUCache
+from .server import DEFAULT_CACHE_SIZE
+
+DEFAULT_TYPES = ["function", "async_function", "class"]
+SORT_KEYS = ["count", "changed_lines"]
+
+# (index of the commit in the range, hash of its first parent, hash of the commit, author)
+CommitSpec = Tuple[int, str, str, str]
+
+
+class ChurnTable:
+    """
+    Aggregates changes by (filepath, name). Each aggregated definition is a row, and the statistics
+    for the rows are stored column by column in compact arrays:
+    - counts: number of commits in which the definition changed
+    - changed_lines: total number of lines changed in the definition
+    - first_commits, last_commits: indices (in the range) of the first and last of those commits
+
+    Commits must be added in order.
+    """
+
+    def __init__(self):
+        self.rows: Dict[Tuple[str, str], int] = {}
+        self.filepaths: List[str] = []
+        self.names: List[str] = []
+        self.counts = array("L")
+        self.changed_lines = array("Q")
+        self.first_commits = array("l")
+        self.last_commits = array("l")
+        self.authors: List[str] = []
+        self.author_ids: Dict[str, int] = {}
+        # (row, author ID) for every author who changed the definition in each row
+        self.row_authors: Set[Tuple[int, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def row(self, filepath: str, name: str) -> int:
+        key = (filepath, name)
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.names)
+            self.rows[key] = row
+            self.filepaths.append(filepath)
+            self.names.append(name)
+            self.counts.append(0)
+            self.changed_lines.append(0)
+            self.first_commits.append(-1)
+            self.last_commits.append(-1)
+        return row
+
+    def author_id(self, author: str) -> int:
+        author_id = self.author_ids.get(author)
+        if author_id is None:
+            author_id = len(self.authors)
+            self.author_ids[author] = author_id
+            self.authors.append(author)
+        return author_id
+
+    def add(
+        self, change: parse.LocustChange, commit_index: int, author_id: int
+    ) -> None:
+        row = self.row(change.filepath, change.name)
+        # A definition may appear several times in the changes of a single commit.
+        if self.last_commits[row] != commit_index:
+            self.counts[row] += 1
+        if self.first_commits[row] < 0:
+            self.first_commits[row] = commit_index
+        self.last_commits[row] = commit_index
+        self.changed_lines[row] += change.changed_lines
+        self.row_authors.add((row, author_id))
+
+    def merge(self, other: "ChurnTable") -> None:
+        """
+        Adds the rows of a table which aggregated commits later in the range to this table.
+        """
+        for other_row, (filepath, name) in enumerate(zip(other.filepaths, other.names)):
+            row = self.row(filepath, name)
+            self.counts[row] += other.counts[other_row]
+            self.changed_lines[row] += other.changed_lines[other_row]
+            if self.first_commits[row] < 0:
+                self.first_commits[row] = other.first_commits[other_row]
+            self.last_commits[row] = other.last_commits[other_row]
+        for other_row, other_author_id in other.row_authors:
+            row = self.rows[(other.filepaths[other_row], other.names[other_row])]
+            self.row_authors.add((row, self.author_id(other.authors[other_author_id])))
+
+    def top(self, k: int, sort_key: str = "count") -> List[int]:
+        """
+        Returns the k rows with the highest values in the given column, highest first.
+        """
+        column = self.counts if sort_key == "count" else self.changed_lines
+        return heapq.nlargest(k, range(len(self)), key=column.__getitem__)
+
+
+def commit_specs(
+    repo_dir: str,
+    revision_range: str,
+    first_parent: bool = False,
+    since: Optional[datetime] = None,
+) -> List[CommitSpec]:
+    import pygit2
+
+    repository = git.get_repository(repo_dir)
+    specs: List[CommitSpec] = []
+    for parent, commit_hash in log.commits_in_range(
+        repository, revision_range, first_parent
+    ):
+        commit = repository.get(commit_hash)
+        assert isinstance(commit, pygit2.Commit)
+        if since is not None and commit.commit_time < since.timestamp():
+            continue
+        specs.append(
+            (
+                len(specs),
+                parent,
+                commit_hash,
+                f"{commit.author.name} <{commit.author.email}>",
+            )
+        )
+    return specs
+
+
+def churn_in_commits(
+    repo_dir: str,
+    commits: List[CommitSpec],
+    plugins: List[str],
+    types: Optional[List[str]] = None,
+) -> ChurnTable:
+    """
+    Aggregates the changes in the given (consecutive) commits. Runs in worker processes.
+    """
+    repository = git.get_repository(repo_dir)
+    sources: git.SourceCache = LRUCache(DEFAULT_CACHE_SIZE)
+    cache: parse.DefinitionsCache = LRUCache(DEFAULT_CACHE_SIZE)
+    table = ChurnTable()
+    for commit_index, parent, commit, author in commits:
+        author_id = table.author_id(author)
+        git_result = git.run_on_repository(repository, parent, commit, sources)
+        for change in parse.run(git_result, plugins, cache).changes:
+            if types is None or change.change_type in types:
+                table.add(change, commit_index, author_id)
+    return table
+
+
+def run(
+    repo_dir: str,
+    revision_range: str,
+    plugins: List[str],
+    first_parent: bool = False,
+    since: Optional[datetime] = None,
+    types: Optional[List[str]] = None,
+    workers: Optional[int] = None,
+) -> Tuple[ChurnTable, List[CommitSpec]]:
+    """
+    Aggregates the changes in every commit in the given revision range. The range is split into
+    consecutive chunks of commits, which are analyzed in parallel.
+
+    Returns a tuple of the form: (aggregated changes, commits in the range)
+    """
+    if types is None:
+        types = DEFAULT_TYPES
+    if workers is None:
+        workers = os.cpu_count() or 1
+    commits = commit_specs(repo_dir, revision_range, first_parent, since)
+    if workers == 1 or len(commits) <= 1:
+        return churn_in_commits(repo_dir, commits, plugins, types), commits
+
+    # More chunks than workers, so that workers which finish early can pick up more work.
+    num_chunks = min(len(commits), 4 * workers)
+    chunk_size = -(-len(commits) // num_chunks)
+    chunks = [commits[i : i + chunk_size] for i in range(0, len(commits), chunk_size)]
+    table = ChurnTable()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(churn_in_commits, repo_dir, chunk, plugins, types)
+            for chunk in chunks
+        ]
+        # Chunks are merged in order, since merge expects later commits.
+        for future in futures:
+            table.merge(future.result())
+    return table, commits
+
+
+def top_changes(
+    table: ChurnTable, commits: List[CommitSpec], k: int, sort_key: str = "count"
+) -> List[Dict[str, Any]]:
+    """
+    Returns a dictionary describing each of the top k rows of the given table.
+    """
+    rows = table.top(k, sort_key)
+    authors_by_row: Dict[int, List[str]] = {row: [] for row in rows}
+    for row, author_id in table.row_authors:
+        if row in authors_by_row:
+            authors_by_row[row].append(table.authors[author_id])
+
+    return [
+        {
+            "filepath": table.filepaths[row],
+            "name": table.names[row],
+            "count": table.counts[row],
+            "changed_lines": table.changed_lines[row],
+            "first_commit": commits[table.first_commits[row]][2],
+            "last_commit": commits[table.last_commits[row]][2],
+            "authors": sorted(authors_by_row[row]),
+        }
+        for row in rows
+    ]
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    log.populate_argument_parser(parser)
+    parser.add_argument(
+        "--since",
+        type=lambda value: datetime.strptime(value, "%Y-%m-%d").replace(
+            tzinfo=timezone.utc
+        ),
+        default=None,
+        help="Only consider commits made on or after this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "-k",
+        "--top",
+        type=int,
+        default=20,
+        help="Number of definitions to report (default: 20)",
+    )
+    parser.add_argument(
+        "--sort",
+        choices=SORT_KEYS,
+        default="count",
+        help="Statistic by which to rank definitions (default: count)",
+    )
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        default=DEFAULT_TYPES,
+        help=f"Types of changes to aggregate (default: {' '.join(DEFAULT_TYPES)})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust churn",
+        description=(
+            "Locust: Find the definitions which changed most often in a range of history"
+        ),
+    )
+    populate_argument_parser(parser)
+    # Churn counts every change, whatever its classification, so of the arguments which
+    # parse.populate_argument_parser adds, only the plugins apply (--ignore-docstrings would not).
+    parse.add_plugins_argument(parser)
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Path to which to write results",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    table, commits = run(
+        args.repo,
+        args.range,
+        args.plugins,
+        args.first_parent,
+        args.since,
+        args.types,
+        args.workers,
+    )
+    seconds = time.perf_counter() - start
+    commits_per_second = len(commits) / seconds if seconds > 0 else 0.0
+    print(
+        f"Analyzed {len(commits)} commits in {seconds:.2f}s "
+        f"({commits_per_second:.1f} commits/s)",
+        file=sys.stderr,
+    )
+
+    results = {
+        "commits": len(commits),
+        "definitions": len(table),
+        "seconds": round(seconds, 6),
+        "commits_per_second": round(commits_per_second, 3),
+        "top": top_changes(table, commits, args.top, args.sort),
+    }
+    try:
+        with args.output as ofp:
+            print(json.dumps(results), file=ofp)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
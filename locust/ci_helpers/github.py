@@ -3,16 +3,34 @@ Command-line utility to help process GitHub Actions.
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import gzip
+import hashlib
 import json
 import os
-from typing import Any, Callable, Dict, List, Optional
-
-import requests
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 from .. import git
+from .. import notes
 from .. import parse
 from .. import render
 
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_API_URL = "https://spire.bugout.dev/github/summary"
+DEFAULT_SPOOL_DIR = os.path.join(os.path.expanduser("~"), ".locust", "spool")
+
+# Responses with these status codes are treated as transient and are retried.
+RETRY_STATUSES = [500, 502, 503, 504]
+
+# GitHub uses this as the "before" commit of pushes which create a branch.
+NULL_SHA = "0" * 40
+
 
 class ErrorDueSendingSummary(Exception):
     """
@@ -31,32 +49,311 @@ def generate_argument_parser() -> argparse.ArgumentParser:
           INITIAL_REF=$(locust.github initial)
           locust.github publish
     """
-    commands = ["type", "initial", "terminal", "repo", "publish"]
+    commands = ["type", "initial", "terminal", "repo", "publish", "flush"]
     parser = argparse.ArgumentParser(description="Locust GitHub Actions helper")
     git.populate_argument_parser(parser)
     parse.populate_argument_parser(parser)
+    notes.populate_argument_parser(parser)
     parser.add_argument(
         "command",
         choices=commands,
-        help="Information you would like this helper to provide",
+        help=(
+            "Information you would like this helper to provide (flush sends summaries which "
+            "previously failed to send)"
+        ),
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=float(os.environ.get("BUGOUT_API_CONNECT_TIMEOUT", 5)),
+        help="Timeout (in seconds) for connecting to the API",
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=float(os.environ.get("BUGOUT_API_READ_TIMEOUT", 30)),
+        help="Timeout (in seconds) for the API to respond once connected",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=int(os.environ.get("BUGOUT_API_RETRIES", 5)),
+        help="Number of times to retry sending a summary on connection errors and 5xx responses",
+    )
+    parser.add_argument(
+        "--backoff",
+        type=float,
+        default=0.5,
+        help=(
+            "Backoff factor (in seconds) for retries - retry n waits backoff * 2^(n - 1) seconds"
+        ),
+    )
+    parser.add_argument(
+        "--no-gzip",
+        action="store_true",
+        help="Send summaries uncompressed (they are gzip-compressed by default)",
+    )
+    parser.add_argument(
+        "--per-commit",
+        action="store_true",
+        help=(
+            "On push events, publish a separate summary for each commit in the push (against its "
+            "parent) instead of a single summary for the whole push"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of commits to analyze in parallel with --per-commit",
+    )
+    parser.add_argument(
+        "--no-merge-base",
+        action="store_true",
+        help=(
+            "On pull request events, compare the head of the pull request directly against the "
+            "head of its base branch instead of against their merge base"
+        ),
+    )
+    parser.add_argument(
+        "--spool-dir",
+        default=os.environ.get("LOCUST_SPOOL_DIR", DEFAULT_SPOOL_DIR),
+        help=(
+            "Directory in which to keep summaries that could not be sent, so that a later "
+            "invocation can send them"
+        ),
     )
     return parser
 
 
+@dataclass
+class DeliveryOptions:
+    """
+    Specifies how locust summaries are delivered to the API.
+    """
+
+    url: str = DEFAULT_API_URL
+    token: Optional[str] = None
+    connect_timeout: float = 5
+    read_timeout: float = 30
+    retries: int = 5
+    backoff: float = 0.5
+    compress: bool = True
+    spool_dir: Optional[str] = DEFAULT_SPOOL_DIR
+
+
+def delivery_options_from_args(args: argparse.Namespace) -> DeliveryOptions:
+    return DeliveryOptions(
+        url=os.environ.get("BUGOUT_API_URL", DEFAULT_API_URL),
+        token=os.environ.get("BUGOUT_SECRET"),
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retries=args.retries,
+        backoff=args.backoff,
+        compress=not args.no_gzip,
+        spool_dir=args.spool_dir,
+    )
+
+
+def create_session(options: DeliveryOptions) -> "requests.Session":
+    """
+    Creates an HTTP session which pools connections to the API and retries requests with
+    exponential backoff on connection errors and 5xx responses.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=options.retries,
+        connect=options.retries,
+        read=options.retries,
+        status=options.retries,
+        backoff_factor=options.backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    session.headers.update({"Content-Type": "application/json"})
+    if options.token is not None:
+        session.headers.update({"Authorization": f"Bearer {options.token}"})
+    return session
+
+
+def send_summary(
+    session: "requests.Session", options: DeliveryOptions, summary: str
+) -> None:
+    """
+    Sends a locust summary to the API, raising an error if it could not be delivered.
+    """
+    data = summary.encode()
+    headers: Dict[str, str] = {}
+    if options.compress:
+        data = gzip.compress(data)
+        headers["Content-Encoding"] = "gzip"
+
+    r = session.post(
+        url=options.url,
+        data=data,
+        headers=headers,
+        timeout=(options.connect_timeout, options.read_timeout),
+    )
+    r.raise_for_status()
+
+
+def is_rejection(error: Exception) -> bool:
+    """
+    Returns True if the given error is a 4xx response, i.e. the API rejected the summary and sending
+    it again would not help.
+    """
+    import requests
+
+    return (
+        isinstance(error, requests.HTTPError)
+        and error.response is not None
+        and 400 <= error.response.status_code < 500
+    )
+
+
+def target_spool_dir(spool_dir: str, url: str) -> str:
+    """
+    Returns the directory in which summaries for the API at the given URL are spooled. Each API has
+    its own directory, so summaries are only ever sent to the API they were meant for.
+    """
+    return os.path.join(spool_dir, hashlib.sha256(url.encode()).hexdigest()[:16])
+
+
+def spool_summary(spool_dir: str, url: str, summary: str) -> str:
+    """
+    Writes a summary which could not be delivered to the API at the given URL into the spool
+    directory. Returns the path to the spooled file.
+    """
+    target_dir = target_spool_dir(spool_dir, url)
+    os.makedirs(target_dir, exist_ok=True)
+    # The URL is only recorded for the benefit of whoever inspects the spool.
+    with open(os.path.join(target_dir, "url"), "w") as ofp:
+        ofp.write(url)
+    spool_file = os.path.join(target_dir, f"{time.time_ns()}-{os.getpid()}.json")
+    # Write to a temporary file and rename it so that flush never sees a partial summary.
+    with open(f"{spool_file}.tmp", "w") as ofp:
+        ofp.write(summary)
+    os.replace(f"{spool_file}.tmp", spool_file)
+    return spool_file
+
+
+def flush_spool(session: "requests.Session", options: DeliveryOptions) -> int:
+    """
+    Sends the summaries spooled for the API at options.url (oldest first), removing each one that is
+    delivered. Summaries which the API rejects (with a 4xx response) are moved to the rejected
+    subdirectory of the spool, and do not hold up the summaries after them. Stops at the first
+    summary which cannot be delivered for any other reason (e.g. the API is unreachable), raising
+    that error.
+
+    Returns the number of summaries that were delivered.
+    """
+    if options.spool_dir is None:
+        return 0
+    target_dir = target_spool_dir(options.spool_dir, options.url)
+    if not os.path.isdir(target_dir):
+        return 0
+
+    spool_files = sorted(
+        filename for filename in os.listdir(target_dir) if filename.endswith(".json")
+    )
+    delivered = 0
+    for filename in spool_files:
+        spool_file = os.path.join(target_dir, filename)
+        with open(spool_file, "r") as ifp:
+            summary = ifp.read()
+        try:
+            send_summary(session, options, summary)
+        except Exception as e:
+            if not is_rejection(e):
+                raise
+            rejected_dir = os.path.join(target_dir, "rejected")
+            os.makedirs(rejected_dir, exist_ok=True)
+            os.replace(spool_file, os.path.join(rejected_dir, filename))
+            continue
+        os.remove(spool_file)
+        delivered += 1
+    return delivered
+
+
+def deliver(summary: str, options: DeliveryOptions) -> None:
+    """
+    Delivers a locust summary to the API, first sending any summaries for the same API which were
+    spooled by previous invocations (failing to send those only produces a warning). If the summary
+    cannot be delivered, an ErrorDueSendingSummary error is raised - and unless the API rejected it
+    (with a 4xx response), it is spooled first (if a spool directory is configured).
+    """
+    session = create_session(options)
+    try:
+        try:
+            flush_spool(session, options)
+        except Exception as e:
+            print(
+                f"Warning: could not send spooled Locust summaries: {str(e)}",
+                file=sys.stderr,
+            )
+        send_summary(session, options, summary)
+    except Exception as e:
+        message = f"Exception {str(e)}"
+        if options.spool_dir is not None and not is_rejection(e):
+            spool_file = spool_summary(options.spool_dir, options.url, summary)
+            message = f"{message} (summary spooled to {spool_file})"
+        raise ErrorDueSendingSummary(message)
+    finally:
+        session.close()
+
+
 def publish(
     repo_url: str,
     initial: str,
     terminal: str,
-    comments_url: str,
+    comments_url: Optional[str],
     plugins: List[str],
     repo_dir: str,
+    options: Optional[DeliveryOptions] = None,
+    notes_ref: Optional[str] = None,
+    ignore_docstrings: bool = False,
+    similarity: Optional[git.SimilarityOptions] = None,
+    merge_base: bool = False,
 ) -> str:
     """
     Publish locust summary to API.
+
+    If notes_ref is provided, the analysis is cached in git notes under that ref (see locust.notes).
+    If merge_base is True, the terminal revision is compared against its merge base with the
+    initial revision (see git.run).
     """
-    git_result = git.run(repo_dir, initial, terminal)
-    parse_result = parse.run(git_result, plugins)
-    metadata: Dict[str, str] = {
+    if notes_ref is not None:
+        parse_result = notes.run(
+            repo_dir,
+            initial,
+            terminal,
+            plugins,
+            notes_ref,
+            ignore_docstrings,
+            similarity,
+            merge_base,
+        )
+    else:
+        git_result = git.run(
+            repo_dir,
+            initial,
+            terminal,
+            similarity=similarity,
+            merge_base=merge_base,
+        )
+        parse_result = parse.run(
+            git_result, plugins, ignore_docstrings=ignore_docstrings
+        )
+    metadata: Dict[str, Optional[str]] = {
         "comments_url": comments_url,
         "terminal_hash": terminal,
     }
@@ -68,21 +365,97 @@ def publish(
         metadata,
     )
 
-    url = os.environ.get("BUGOUT_API_URL", "https://spire.bugout.dev/github/summary")
-    token = os.environ.get("BUGOUT_SECRET")
-    headers = {"Content-Type": "application/json"}
-    if token is not None:
-        headers.update({"Authorization": f"Bearer {token}"})
-
-    try:
-        r = requests.post(url=url, data=results_json, headers=headers)
-        r.raise_for_status()
-    except Exception as e:
-        raise ErrorDueSendingSummary(f"Exception {str(e)}")
+    if options is None:
+        options = DeliveryOptions(
+            url=os.environ.get("BUGOUT_API_URL", DEFAULT_API_URL),
+            token=os.environ.get("BUGOUT_SECRET"),
+        )
+    deliver(results_json, options)
 
     return "Locust summary sent to API"
 
 
+def analyze_commits(
+    repo_dir: str,
+    commits: List[str],
+    plugins: List[str],
+    workers: Optional[int],
+    similarity: Optional[git.SimilarityOptions] = None,
+) -> List[Tuple[str, parse.ParseResult]]:
+    """
+    Analyzes each of the given commits against its (first) parent, in parallel.
+
+    All commits share a cache of blob sources and a cache of definitions, so blobs which are touched
+    by several commits in the sequence (e.g. as the new side of one commit and the old side of the
+    next) are only loaded and parsed once. Each worker thread opens its own handle on the
+    repository.
+
+    Returns a list of (commit, parse result) pairs in the same order as commits.
+    """
+    sources: git.SourceCache = {}
+    definitions: parse.DefinitionsCache = {}
+    local = threading.local()
+
+    def analyze(commit: str) -> Tuple[str, parse.ParseResult]:
+        import pygit2
+
+        repository = getattr(local, "repository", None)
+        if repository is None:
+            repository = git.get_repository(repo_dir)
+            local.repository = repository
+        parents = repository.revparse_single(commit).peel(pygit2.Commit).parents
+        initial = str(parents[0].id) if parents else git.NULL_REVISION
+        git_result = git.run_on_repository(
+            repository, initial, commit, sources, similarity
+        )
+        return (commit, parse.run(git_result, plugins, definitions))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze, commits))
+
+
+def publish_commits(
+    repo_url: str,
+    commits: List[Dict[str, Any]],
+    plugins: List[str],
+    repo_dir: str,
+    options: Optional[DeliveryOptions] = None,
+    workers: Optional[int] = None,
+    push_metadata: Optional[Dict[str, Any]] = None,
+    similarity: Optional[git.SimilarityOptions] = None,
+) -> str:
+    """
+    Publish one locust summary per commit (against its parent) to API, in a single batched request.
+
+    commits is a list of commit objects in the format of the "commits" list of a GitHub push event.
+    """
+    analyses = analyze_commits(
+        repo_dir, [commit["id"] for commit in commits], plugins, workers, similarity
+    )
+    summaries: List[Dict[str, Any]] = []
+    for commit, (commit_id, parse_result) in zip(commits, analyses):
+        metadata: Dict[str, Optional[str]] = {
+            "commit_url": commit.get("url"),
+            "terminal_hash": commit_id,
+        }
+        summaries.append(
+            json.loads(render.run(parse_result, "json", repo_url, metadata))
+        )
+
+    batch: Dict[str, Any] = {"summaries": summaries}
+    if push_metadata is not None:
+        batch["push"] = push_metadata
+
+    if options is None:
+        options = DeliveryOptions(
+            url=os.environ.get("BUGOUT_API_URL", DEFAULT_API_URL),
+            token=os.environ.get("BUGOUT_SECRET"),
+        )
+    deliver(json.dumps(batch), options)
+
+    return f"Locust summaries for {len(summaries)} commits sent to API"
+
+
 def helper_push(args: argparse.Namespace, event: Dict[str, Any]) -> str:
     """
     Process trigger on: [ push ] at GitHub Actions.
@@ -90,11 +463,13 @@ def helper_push(args: argparse.Namespace, event: Dict[str, Any]) -> str:
     Event structure defined here:
     https://docs.github.com/en/free-pro-team@latest/developers/webhooks-and-events/webhook-events-and-payloads#push
     """
-    pull_request = event["pull_request"]
     initial = event["before"]
+    if initial == NULL_SHA:
+        initial = git.NULL_REVISION
     terminal = event["after"]
     repo_url = event["repository"]["html_url"]
-    comments_url = pull_request["_links"]["comments"]["href"]
+    # Pushes are not associated with pull requests, so there are no comments to link to.
+    comments_url = None
 
     if args.command == "initial":
         return initial
@@ -102,9 +477,36 @@ def helper_push(args: argparse.Namespace, event: Dict[str, Any]) -> str:
         return terminal
     elif args.command == "repo":
         return repo_url
+    elif args.command == "publish" and args.per_commit:
+        result = publish_commits(
+            repo_url,
+            [commit for commit in event["commits"] if commit.get("distinct", True)],
+            args.plugins,
+            args.repo,
+            delivery_options_from_args(args),
+            args.workers,
+            {
+                "ref": event.get("ref"),
+                "before": event["before"],
+                "after": terminal,
+                "compare_url": event.get("compare"),
+            },
+            git.similarity_options_from_args(args),
+        )
+        return result
     elif args.command == "publish":
         result = publish(
-            repo_url, initial, terminal, comments_url, args.plugins, args.repo
+            repo_url,
+            initial,
+            terminal,
+            comments_url,
+            args.plugins,
+            args.repo,
+            delivery_options_from_args(args),
+            notes.notes_ref_from_args(args),
+            args.ignore_docstrings,
+            git.similarity_options_from_args(args),
+            args.merge_base,
         )
         return result
 
@@ -132,7 +534,19 @@ def helper_pr(args: argparse.Namespace, event: Dict[str, Any]) -> str:
         return repo_url
     elif args.command == "publish":
         result = publish(
-            repo_url, initial, terminal, comments_url, args.plugins, args.repo
+            repo_url,
+            initial,
+            terminal,
+            comments_url,
+            args.plugins,
+            args.repo,
+            delivery_options_from_args(args),
+            notes.notes_ref_from_args(args),
+            args.ignore_docstrings,
+            git.similarity_options_from_args(args),
+            # Pull requests are compared against their merge base by default, so that summaries do
+            # not include changes which landed on the base branch after the pull request branched.
+            not args.no_merge_base,
         )
         return result
 
@@ -143,6 +557,16 @@ def main():
     parser = generate_argument_parser()
     args = parser.parse_args()
 
+    if args.command == "flush":
+        options = delivery_options_from_args(args)
+        session = create_session(options)
+        try:
+            delivered = flush_spool(session, options)
+        finally:
+            session.close()
+        print(f"Sent {delivered} spooled Locust summaries to API")
+        return
+
     helpers: Dict[str, Callable[[str, Dict[str, Any]], str]] = {
         "push": helper_push,
         "pull_request": helper_pr,
@@ -2,18 +2,44 @@
 The Locust CLI
 """
 import argparse
+import contextlib
+import importlib
 import sys
+from typing import Dict, Optional
 
 from . import git
+from . import notes
 from . import parse
+from . import profiling
 from . import render
+from . import tracing
 from . import version
 
+# Subcommands of the locust CLI, mapped to the modules which implement them. Each module has a main
+# function which accepts the remaining command line arguments. Modules are only imported when their
+# subcommand is invoked.
+subcommands: Dict[str, str] = {
+    "batch": "locust.batch",
+    "blame": "locust.blame",
+    "churn": "locust.churn",
+    "hook": "locust.hook",
+    "index": "locust.index",
+    "log": "locust.log",
+    "merge": "locust.merge",
+    "multi": "locust.multi",
+    "query": "locust.query",
+    "serve": "locust.server",
+    "watch": "locust.watch",
+}
+
 
 def generate_argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Locust: Analyze Python code across git references",
-        epilog=f"Version {version.LOCUST_VERSION}",
+        epilog=(
+            f"Subcommands (run locust <subcommand> --help for details): "
+            f"{', '.join(subcommands)}. Version {version.LOCUST_VERSION}"
+        ),
     )
     parser.add_argument(
         "-v",
@@ -24,7 +50,10 @@ def generate_argument_parser() -> argparse.ArgumentParser:
     )
     git.populate_argument_parser(parser)
     parse.populate_argument_parser(parser)
+    notes.populate_argument_parser(parser)
     render.populate_argument_parser(parser)
+    profiling.populate_argument_parser(parser)
+    tracing.populate_argument_parser(parser)
     parser.add_argument(
         "-o",
         "--output",
@@ -36,15 +65,83 @@ def generate_argument_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def analyze(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> parse.ParseResult:
+    similarity = git.similarity_options_from_args(args)
+    if args.from_diff is not None:
+        if args.notes_cache:
+            parser.error("--notes-cache cannot be used with --from-diff")
+        try:
+            git_result = git.run_on_diff(
+                git.read_diff(args.from_diff), args.sources, args.blobs
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        return parse.run(
+            git_result, args.plugins, ignore_docstrings=args.ignore_docstrings
+        )
+    elif args.notes_cache:
+        return notes.run(
+            args.repo,
+            args.initial,
+            args.terminal,
+            args.plugins,
+            args.notes_ref,
+            args.ignore_docstrings,
+            similarity,
+            args.merge_base,
+            args.staged,
+        )
+    git_result = git.run(
+        args.repo,
+        args.initial,
+        args.terminal,
+        similarity=similarity,
+        merge_base=args.merge_base,
+        staged=args.staged,
+    )
+    return parse.run(git_result, args.plugins, ignore_docstrings=args.ignore_docstrings)
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in subcommands:
+        subcommand_module = importlib.import_module(subcommands[sys.argv[1]])
+        subcommand_module.main(sys.argv[2:])
+        return
+
     parser = generate_argument_parser()
     args = parser.parse_args()
+    git.validate_diff_arguments(parser, args)
+    render.validate_arguments(parser, args)
 
-    git_result = git.run(args.repo, args.initial, args.terminal)
-
-    parse_result = parse.run(git_result, args.plugins)
-
-    results_string = render.run(parse_result, args.format, args.github, args.metadata)
+    with contextlib.ExitStack() as stack:
+        if args.trace is not None:
+            stack.enter_context(tracing.tracing(args.trace))
+            stack.enter_context(tracing.span("locust", "cli"))
+        profiler: Optional[profiling.Profiler] = None
+        if args.profile:
+            profiler = stack.enter_context(profiling.profiling())
+        parse_result = analyze(parser, args)
+        # The stats in the result cover every stage up to rendering.
+        if profiler is not None:
+            parse_result.stats.CopyFrom(profiler.stats())
+        try:
+            results_string = render.run(
+                parse_result,
+                args.format,
+                args.github,
+                args.metadata,
+                args.max_changes,
+                args.max_bytes,
+                args.drop_cosmetic,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    if profiler is not None:
+        print(
+            profiling.format_stats(profiler.stats(), args.profile_top), file=sys.stderr
+        )
 
     try:
         with args.output as ofp:
@@ -2,15 +2,33 @@
 git-related functionality
 """
 import argparse
+import codecs
+from dataclasses import dataclass, field
+import hashlib
+import io
 import json
 import os
+import re
 import sys
-from typing import Any, List, Optional, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
 
-from google.protobuf.json_format import MessageToDict
-import pygit2
+from . import profiling
+from . import tracing
+from .git_pb2 import LineInfo, HunkBoundary, HunkInfo, PatchInfo, GitResult, Shard
 
-from .git_pb2 import LineInfo, HunkBoundary, HunkInfo, PatchInfo, GitResult
+# pygit2 takes a significant fraction of locust's startup time to import, so it is only imported by
+# the functions which actually touch a repository.
+if TYPE_CHECKING:
+    import pygit2
 
 
 class GitRepositoryNotFound(Exception):
@@ -21,19 +39,120 @@ class GitRepositoryNotFound(Exception):
 
 NULL_REVISION = "null"
 
+# Maps blob hashes to the (decoded) contents of the corresponding blobs. Sharing a cache like this
+# between runs against the same repository means that each blob is only ever loaded once.
+SourceCache = MutableMapping[str, Optional[str]]
 
-def get_repository(path: str = ".") -> pygit2.Repository:
+
+@dataclass
+class SimilarityOptions:
+    """
+    Options for the detection of renamed and copied files in diffs (the equivalents of git diff's -M,
+    -C and -l options).
+
+    Thresholds are similarity percentages. Copies are only looked for among the files which the
+    diff modifies. rename_limit bounds the number of files considered as sources of renames or
+    copies, so that detection stays cheap on large diffs - above it, files are reported as deleted
+    and added.
+    """
+
+    renames: bool = True
+    copies: bool = False
+    rename_threshold: int = 50
+    copy_threshold: int = 50
+    rename_limit: int = 1000
+
+
+DEFAULT_SIMILARITY = SimilarityOptions()
+
+
+def parse_shard(value: str) -> Shard:
+    """
+    Parses a shard specification of the form i/N - the i-th of N shards, counting from 0.
+
+    Raises a ValueError if the specification is not of that form.
+    """
+    index, separator, count = value.partition("/")
+    if not separator or not index.isdigit() or not count.isdigit():
+        raise ValueError(f"Invalid shard {value}: expected the form i/N")
+    shard = Shard(index=int(index), count=int(count))
+    if shard.index >= shard.count:
+        raise ValueError(f"Invalid shard {value}: i must be between 0 and N-1")
+    return shard
+
+
+def shard_argument(value: str) -> Shard:
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def shard_of(path: str, count: int) -> int:
+    """
+    Returns the shard (out of count shards) which the file at the given path belongs to. Files are
+    assigned to shards by a hash of their path, so every run (on any machine) assigns a file to the
+    same shard.
+    """
+    digest = hashlib.sha1(path.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def in_shard(path: str, shard: Optional[Shard]) -> bool:
+    return shard is None or shard_of(path, shard.count) == shard.index
+
+
+def shard_result(git_result: GitResult, shard: Shard) -> GitResult:
+    """
+    Returns a git result with only those patches of the given one which belong to the given shard.
+
+    Raises a ValueError if the given result already belongs to a different shard.
+    """
+    if git_result.HasField("shard"):
+        if git_result.shard != shard:
+            raise ValueError(
+                f"Git result is shard {git_result.shard.index}/{git_result.shard.count}, not "
+                f"{shard.index}/{shard.count}"
+            )
+        return git_result
+    return GitResult(
+        repo=git_result.repo,
+        initial_ref=git_result.initial_ref,
+        terminal_ref=git_result.terminal_ref,
+        patches=[
+            patch for patch in git_result.patches if in_shard(patch.new_file, shard)
+        ],
+        shard=shard,
+    )
+
+
+def get_repository(path: str = ".") -> "pygit2.Repository":
     """
     Returns a git repository object if it can find one at the given path, otherwise raises a
     GitRepositoryNotFound error.
     """
+    import pygit2
+
     repository_path: Optional[str] = pygit2.discover_repository(path)
     if repository_path is None:
         raise GitRepositoryNotFound(f"No git repository found at path: {path}")
-    return pygit2.Repository(repository_path)
+    with profiling.measure(profiling.OPEN), tracing.span(
+        "open repository", "git", path=repository_path
+    ):
+        return pygit2.Repository(repository_path)
 
 
-def get_empty_tree_hash(repo: pygit2.Repository) -> str:
+def repository_path(repository: "pygit2.Repository") -> str:
+    """
+    Returns the path that locust results refer to the given repository by: its working tree, or its
+    git directory if it is bare.
+    """
+    if repository.workdir is not None:
+        return os.path.normpath(repository.workdir)
+    return os.path.normpath(repository.path)
+
+
+def get_empty_tree_hash(repo: "pygit2.Repository") -> str:
     """
     The hash for the empty tree can be generated using: `git hash-object -t tree /dev/null`
     (see this Stack Overflow post for more details: https://stackoverflow.com/q/9765453)
@@ -45,15 +164,130 @@ def get_empty_tree_hash(repo: pygit2.Repository) -> str:
     return str(tree_builder.write())
 
 
+def blob_hash(source: str) -> str:
+    """
+    Returns the git object hash for a blob with the given contents. For sources which were read from
+    a (SHA-1) git repository, this is the hash of the blob they were read from.
+    """
+    data = source.encode()
+    return hashlib.sha1(b"blob %d\x00" % len(data) + data).hexdigest()
+
+
+def blob_source(
+    repository: "pygit2.Repository",
+    diff_file: "pygit2.DiffFile",
+    sources: Optional[SourceCache] = None,
+) -> Optional[str]:
+    """
+    Returns the source of the blob on one side of a diff delta, or None if the file does not exist
+    on that side of the delta.
+
+    If a sources cache is provided, the blob is only loaded from the repository if it is not already
+    in the cache.
+    """
+    import pygit2
+
+    # Files which do not exist on this side of the delta have an all-zero object ID.
+    if not any(diff_file.id.raw):
+        return None
+
+    key = str(diff_file.id)
+    if sources is not None and key in sources:
+        return sources[key]
+
+    source: Optional[str] = None
+    with tracing.span("blob_source", "git", file=diff_file.path, blob=key):
+        blob = repository.get(diff_file.id)
+        if isinstance(blob, pygit2.Blob):
+            source = blob.data.decode(errors="ignore")
+
+    if sources is not None:
+        sources[key] = source
+    return source
+
+
+def find_similar(diff: "pygit2.Diff", similarity: SimilarityOptions) -> None:
+    """
+    Marks the renamed and copied files in the given diff, according to the given options. The hunks
+    of a renamed or copied file only contain the lines which changed relative to the file it was
+    renamed or copied from.
+
+    Mutates the provided diff.
+    """
+    import pygit2
+
+    # The legacy constants work with every supported pygit2 (pygit2.enums only has them from 1.14).
+    flags = 0
+    if similarity.renames:
+        flags |= pygit2.GIT_DIFF_FIND_RENAMES
+    if similarity.copies:
+        flags |= pygit2.GIT_DIFF_FIND_COPIES
+    if not flags:
+        return
+    diff.find_similar(
+        flags=flags,
+        rename_threshold=similarity.rename_threshold,
+        copy_threshold=similarity.copy_threshold,
+        rename_limit=similarity.rename_limit,
+    )
+
+
 def get_patches(
-    repository: pygit2.Repository,
+    repository: "pygit2.Repository",
     initial: Optional[str] = None,
     terminal: Optional[str] = None,
+    sources: Optional[SourceCache] = None,
+    similarity: Optional[SimilarityOptions] = None,
+    staged: bool = False,
+    shard: Optional[Shard] = None,
 ) -> List[PatchInfo]:
     """
     Returns a list of patches taking the given repository from the initial revision to the terminal
     one.
+
+    Sources on the revision side(s) of the diff are read directly from the object database by blob
+    hash, through the sources cache if one is provided. Renamed and copied files are detected
+    according to the given similarity options (by default, DEFAULT_SIMILARITY).
+
+    If staged is True, the initial revision is compared against the index instead (like git diff
+    --cached) - the terminal revision must be None. Staged sources are read from the object
+    database, and untracked and unstaged changes are left out.
+
+    If a shard is given, only the patches to the files in that shard (see shard_of) are returned.
+    Renames and copies are still detected across the whole diff.
+    """
+    return list(
+        iter_patches(repository, initial, terminal, sources, similarity, staged, shard)
+    )
+
+
+def iter_patches(
+    repository: "pygit2.Repository",
+    initial: Optional[str] = None,
+    terminal: Optional[str] = None,
+    sources: Optional[SourceCache] = None,
+    similarity: Optional[SimilarityOptions] = None,
+    staged: bool = False,
+    shard: Optional[Shard] = None,
+) -> Iterator[PatchInfo]:
     """
+    Same as get_patches, but generates the patches one at a time. The sources for each patch are
+    only read once the patch is requested.
+    """
+    if staged and terminal is not None:
+        raise ValueError(
+            "Staged changes cannot be compared against a terminal revision"
+        )
+    if terminal is None and repository.is_bare:
+        raise ValueError(
+            "Bare repositories have no working tree to compare against - specify a terminal "
+            "revision"
+        )
+
+    # Before the first commit, staged changes are compared against the empty tree.
+    if staged and initial is None and repository.head_is_unborn:
+        initial = NULL_REVISION
+
     rev_initial = initial
     rev_terminal = terminal
     if rev_initial is None:
@@ -66,33 +300,57 @@ def get_patches(
     if terminal == NULL_REVISION:
         rev_terminal = get_empty_tree_hash(repository)
 
-    diff = repository.diff(a=rev_initial, b=rev_terminal, context_lines=0)
+    with profiling.measure(profiling.DIFF), tracing.span(
+        "diff", "git", initial=rev_initial, terminal=rev_terminal, staged=staged
+    ):
+        if staged:
+            import pygit2
+
+            initial_tree = repository.revparse_single(rev_initial).peel(pygit2.Tree)
+            # pygit2 ignores the options of diff_to_index when they are passed by keyword.
+            diff = initial_tree.diff_to_index(
+                repository.index, pygit2.GIT_DIFF_NORMAL, 0
+            )
+        else:
+            diff = repository.diff(a=rev_initial, b=rev_terminal, context_lines=0)
 
-    # We have to handle the case where initial=NULL_REVISION and terminal=None separately because of
-    # the lack of tracked file objects in the empty revision and how git handles the default empty
-    # argument for the terminal revision (checks against tracked files in initial revision).
-    if initial == NULL_REVISION and terminal is None:
-        status_diff = repository.diff()
-        diff.merge(status_diff)
+        # We have to handle the case where initial=NULL_REVISION and terminal=None separately
+        # because of the lack of tracked file objects in the empty revision and how git handles the
+        # default empty argument for the terminal revision (checks against tracked files in initial
+        # revision).
+        if initial == NULL_REVISION and terminal is None and not staged:
+            status_diff = repository.diff()
+            diff.merge(status_diff)
 
-    patches = [
-        PatchInfo(
-            old_file=patch.delta.old_file.path,
-            new_file=patch.delta.new_file.path,
-            hunks=[process_hunk(hunk) for hunk in patch.hunks],
-        )
-        for patch in diff
-    ]
-
-    for patch in patches:
-        old_filepath = os.path.join(repository.workdir, patch.old_file)
-        new_filepath = os.path.join(repository.workdir, patch.new_file)
-        old_source = None
-        if initial != NULL_REVISION:
-            old_source = revision_file(repository, rev_initial, old_filepath)
-        new_source = None
-        if terminal != NULL_REVISION:
-            new_source = revision_file(repository, terminal, new_filepath)
+        find_similar(diff, similarity or DEFAULT_SIMILARITY)
+
+    for i, delta in enumerate(diff.deltas):
+        # Patches are only generated for the files in the shard.
+        if not in_shard(delta.new_file.path, shard):
+            continue
+        with profiling.measure(profiling.DIFF, delta.new_file.path):
+            diff_patch = diff[i]
+            # pygit2 has no patch to offer for deltas without content changes.
+            if diff_patch is None:
+                continue
+            patch = PatchInfo(
+                old_file=diff_patch.delta.old_file.path,
+                new_file=diff_patch.delta.new_file.path,
+                hunks=[process_hunk(hunk) for hunk in diff_patch.hunks],
+            )
+        with profiling.measure(profiling.BLOBS, patch.new_file):
+            old_source = None
+            if initial != NULL_REVISION:
+                old_source = blob_source(repository, diff_patch.delta.old_file, sources)
+            new_source = None
+            if terminal is None and not staged:
+                # Files which were deleted from the working tree have no new source.
+                if diff_patch.delta.status_char() != "D":
+                    new_filepath = os.path.join(repository.workdir, patch.new_file)
+                    with tracing.span("revision_file", "git", file=patch.new_file):
+                        new_source = revision_file(repository, terminal, new_filepath)
+            elif terminal != NULL_REVISION:
+                new_source = blob_source(repository, diff_patch.delta.new_file, sources)
         # The following awkward workaround is because mypy-protobuf has weird behaviour around
         # fields. They are defined as optional in the __init__ method of the message class, but not
         # optional as attributes of the message class.
@@ -100,8 +358,7 @@ def get_patches(
             patch.old_source = old_source
         if new_source is not None:
             patch.new_source = new_source
-
-    return patches
+        yield patch
 
 
 def hunk_boundary(
@@ -114,6 +371,9 @@ def hunk_boundary(
     If operation_type is provided, it is used to filter down only to lines whose line_type matches
     the operation_type. Possible values: "+", "-", None.
 
+    Deleted lines only exist in the old source, so the boundary of the deletions in a hunk is given
+    in old line numbers. All other boundaries are given in new line numbers.
+
     If there are no lines of the  given type in the hunk, returns None.
     """
     line_type_p = lambda line: True
@@ -125,6 +385,13 @@ def hunk_boundary(
     if not admissible_lines:
         return None
 
+    if operation_type == "-":
+        return HunkBoundary(
+            operation_type=operation_type,
+            start=admissible_lines[0].old_line_number,
+            end=admissible_lines[-1].old_line_number,
+        )
+
     return HunkBoundary(
         operation_type=operation_type,
         start=admissible_lines[0].new_line_number,
@@ -132,13 +399,13 @@ def hunk_boundary(
     )
 
 
-def process_hunk(hunk: pygit2.DiffHunk) -> HunkInfo:
+def process_hunk(hunk: "pygit2.DiffHunk") -> HunkInfo:
     """
     Processes a hunk from a git diff into a HunkInfo object.
     """
-    pre_hunk_info = HunkInfo(
-        header=hunk.header,
-        lines=[
+    return hunk_from_lines(
+        hunk.header,
+        [
             LineInfo(
                 old_line_number=line.old_lineno,
                 new_line_number=line.new_lineno,
@@ -149,6 +416,13 @@ def process_hunk(hunk: pygit2.DiffHunk) -> HunkInfo:
         ],
     )
 
+
+def hunk_from_lines(header: str, lines: List[LineInfo]) -> HunkInfo:
+    """
+    Builds a HunkInfo object, with its boundaries, from the header and the lines of a hunk.
+    """
+    pre_hunk_info = HunkInfo(header=header, lines=lines)
+
     total_boundary = hunk_boundary(pre_hunk_info, None)
     insertions_boundary = hunk_boundary(pre_hunk_info, "+")
     deletions_boundary = hunk_boundary(pre_hunk_info, "-")
@@ -165,19 +439,24 @@ def process_hunk(hunk: pygit2.DiffHunk) -> HunkInfo:
 
 
 def revision_file(
-    repository: pygit2.Repository, revision: Optional[str], filepath: str
+    repository: "pygit2.Repository", revision: Optional[str], filepath: str
 ) -> Optional[str]:
     """
     Returns the source from the file at the given filepath on the given revision. If revision is
     None, returns the bytes from the filepath in the current working tree.
 
-    Filepath is expected to be an absolute, normalized path.
+    Filepath is expected to be an absolute, normalized path. In bare repositories, it is relative to
+    the git directory instead.
     """
-    repo_path = os.path.normpath(repository.workdir)
+    repo_path = repository_path(repository)
 
     content = bytes()
 
     if revision is None:
+        if repository.is_bare:
+            raise ValueError(
+                "Bare repositories have no working tree to read files from"
+            )
         assert (
             os.path.commonpath([repo_path, filepath]) == repo_path
         ), f"File ({filepath}) is not contained in repository ({repo_path})"
@@ -204,6 +483,372 @@ def revision_file(
     return content.decode(errors="ignore")
 
 
+DIFF_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+DIFF_GIT_HEADER = re.compile(r'^("(?:[^"\\]|\\.)*"|\S+) ("(?:[^"\\]|\\.)*"|\S+)$')
+FORMAT_PATCH_HEADER = re.compile(r"^From ([0-9a-f]{40}) ", re.MULTILINE)
+DEV_NULL = "/dev/null"
+
+
+@dataclass
+class DiffHunk:
+    """
+    A hunk of unified diff text. old_line and new_line are the line numbers of the first lines of the
+    hunk on either side, and lines are (origin, content) pairs - including context lines.
+    """
+
+    old_line: int
+    new_line: int
+    section: str
+    lines: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class DiffFile:
+    """
+    The hunks of unified diff text which change a single file. The path on the side on which the
+    file does not exist (the old side of an added file, the new side of a deleted one) is None.
+    """
+
+    old_path: Optional[str] = None
+    new_path: Optional[str] = None
+    hunks: List[DiffHunk] = field(default_factory=list)
+
+
+def diff_path(raw_path: str, prefix: str) -> Optional[str]:
+    """
+    Normalizes a path from a diff header: strips timestamps (as diff -u adds them) and the a/ or b/
+    prefix, and unquotes paths which git quoted. Returns None for /dev/null.
+    """
+    path = raw_path.rstrip("\r\n").split("\t")[0]
+    if len(path) > 1 and path[0] == '"' and path[-1] == '"':
+        # git quotes paths with unusual characters C-style, and escapes their bytes in octal.
+        path = codecs.escape_decode(path[1:-1].encode())[0].decode(errors="ignore")
+    if path == DEV_NULL:
+        return None
+    if path.startswith(prefix):
+        path = path[len(prefix) :]
+    return path
+
+
+def parse_diff(diff_text: str) -> List[DiffFile]:
+    """
+    Parses unified diff text (as produced by git diff, git format-patch or diff -u) into the files
+    it changes. Lines outside the diffs of files (e.g. commit messages and mail headers) are ignored.
+    """
+    files: List[DiffFile] = []
+    current: Optional[DiffFile] = None
+    # Whether the ---/+++ header of the current file has been read. Diffs which do not come from
+    # git have no other header, so another --- line starts the next file.
+    file_header = False
+    hunk: Optional[DiffHunk] = None
+    # Numbers of lines of the current hunk which have not been read yet, on either side.
+    old_remaining = 0
+    new_remaining = 0
+
+    for line in io.StringIO(diff_text):
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the line before it.
+            if hunk is not None and hunk.lines:
+                origin, content = hunk.lines[-1]
+                hunk.lines[-1] = (origin, content.rstrip("\r\n"))
+            continue
+
+        if hunk is not None and (old_remaining > 0 or new_remaining > 0):
+            # Some tools strip the space from empty context lines.
+            origin, content = (
+                (" ", line) if line in ("\n", "\r\n") else (line[0], line[1:])
+            )
+            if origin in (" ", "-", "+"):
+                hunk.lines.append((origin, content))
+                if origin != "+":
+                    old_remaining -= 1
+                if origin != "-":
+                    new_remaining -= 1
+                continue
+        hunk = None
+
+        if line.startswith("diff --git "):
+            current = DiffFile()
+            files.append(current)
+            file_header = False
+            header = line[len("diff --git ") :].rstrip("\r\n")
+            match = DIFF_GIT_HEADER.match(header)
+            if match is not None:
+                old_raw, new_raw = match.group(1), match.group(2)
+            else:
+                old_raw, _, new_raw = header.rpartition(" b/")
+                new_raw = f"b/{new_raw}"
+            current.old_path = diff_path(old_raw, "a/")
+            current.new_path = diff_path(new_raw, "b/")
+        elif line.startswith("--- "):
+            if current is None or file_header or current.hunks:
+                current = DiffFile()
+                files.append(current)
+            file_header = True
+            current.old_path = diff_path(line[len("--- ") :], "a/")
+        elif current is None:
+            continue
+        elif line.startswith("+++ "):
+            current.new_path = diff_path(line[len("+++ ") :], "b/")
+        elif line.startswith("new file mode"):
+            current.old_path = None
+        elif line.startswith("deleted file mode"):
+            current.new_path = None
+        elif line.startswith(("rename from ", "copy from ")):
+            current.old_path = diff_path(line.split(" ", 2)[2], "")
+        elif line.startswith(("rename to ", "copy to ")):
+            current.new_path = diff_path(line.split(" ", 2)[2], "")
+        elif line.startswith("@@ "):
+            match = DIFF_HUNK_HEADER.match(line.rstrip("\r\n"))
+            if match is None:
+                continue
+            old_start, new_start = int(match.group(1)), int(match.group(3))
+            old_remaining = int(match.group(2)) if match.group(2) is not None else 1
+            new_remaining = int(match.group(4)) if match.group(4) is not None else 1
+            # Hunks with no lines on one side start after the line in their header, on that side.
+            hunk = DiffHunk(
+                old_line=old_start if old_remaining else old_start + 1,
+                new_line=new_start if new_remaining else new_start + 1,
+                section=match.group(5),
+            )
+            current.hunks.append(hunk)
+
+    return files
+
+
+def hunk_range(start: int, lines: int) -> str:
+    return f"{start}" if lines == 1 else f"{start},{lines}"
+
+
+def zero_context_hunks(hunk: DiffHunk) -> List[HunkInfo]:
+    """
+    Splits a hunk of unified diff text at its context lines into hunks without context lines, like
+    the ones locust takes from git (which it diffs with context_lines=0).
+    """
+    hunks: List[HunkInfo] = []
+    group: List[LineInfo] = []
+    old_line, new_line = hunk.old_line, hunk.new_line
+    group_old_line, group_new_line = old_line, new_line
+    # The sentinel context line at the end closes the last group.
+    for origin, content in hunk.lines + [(" ", "")]:
+        if origin == " ":
+            if group:
+                deletions = sum(1 for line in group if line.line_type == "-")
+                insertions = len(group) - deletions
+                # Without context lines, the start of a side with no lines is the line before them.
+                old_start = group_old_line if deletions else group_old_line - 1
+                new_start = group_new_line if insertions else group_new_line - 1
+                header = (
+                    f"@@ -{hunk_range(old_start, deletions)} "
+                    f"+{hunk_range(new_start, insertions)} @@{hunk.section}\n"
+                )
+                hunks.append(hunk_from_lines(header, group))
+                group = []
+            old_line += 1
+            new_line += 1
+            continue
+
+        if not group:
+            group_old_line, group_new_line = old_line, new_line
+        if origin == "-":
+            group.append(
+                LineInfo(
+                    old_line_number=old_line,
+                    new_line_number=-1,
+                    line_type=origin,
+                    line=content,
+                )
+            )
+            old_line += 1
+        else:
+            group.append(
+                LineInfo(
+                    old_line_number=-1,
+                    new_line_number=new_line,
+                    line_type=origin,
+                    line=content,
+                )
+            )
+            new_line += 1
+    return hunks
+
+
+def diff_image(diff_file: DiffFile, side: str) -> str:
+    """
+    Reconstructs one side ("-" for the old one, "+" for the new one) of the given file from the
+    lines of its diff. Lines which the diff does not show are left blank, so that every line keeps
+    its line number.
+    """
+    lines: Dict[int, str] = {}
+    for hunk in diff_file.hunks:
+        line_number = hunk.old_line if side == "-" else hunk.new_line
+        for origin, content in hunk.lines:
+            if origin in (" ", side):
+                lines[line_number] = content
+                line_number += 1
+    if not lines:
+        return ""
+    return "".join(lines.get(i, "\n") for i in range(1, max(lines) + 1))
+
+
+def reverse_apply(diff_file: DiffFile, new_source: str) -> str:
+    """
+    Reconstructs the old source of the given file by undoing its diff on its new source. Raises a
+    ValueError if the new source does not match the diff.
+    """
+    mismatch = f"Source of {diff_file.new_path} does not match the diff"
+    new_lines = io.StringIO(new_source).readlines()
+    old_lines: List[str] = []
+    cursor = 0
+    for hunk in diff_file.hunks:
+        start = hunk.new_line - 1
+        if not cursor <= start <= len(new_lines):
+            raise ValueError(mismatch)
+        old_lines.extend(new_lines[cursor:start])
+        cursor = start
+        for origin, content in hunk.lines:
+            if origin == "-":
+                old_lines.append(content)
+                continue
+            if cursor >= len(new_lines):
+                raise ValueError(mismatch)
+            if new_lines[cursor].rstrip("\r\n") != content.rstrip("\r\n"):
+                raise ValueError(mismatch)
+            if origin == " ":
+                old_lines.append(new_lines[cursor])
+            cursor += 1
+    old_lines.extend(new_lines[cursor:])
+    return "".join(old_lines)
+
+
+def sources_filepath(sources_dir: str, path: str) -> str:
+    """
+    Returns the path at which the given file from a diff is found in sources_dir. Raises a
+    ValueError if the path is outside of sources_dir (e.g. absolute, or with .. components).
+    """
+    root = os.path.realpath(sources_dir)
+    filepath = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, filepath]) != root:
+        raise ValueError(f"Path {path} in the diff is outside of the sources directory")
+    return filepath
+
+
+def reconstruct_sources(
+    diff_files: List[DiffFile], sources_dir: str
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Reconstructs the (old, new) sources of each of the given files of a diff from sources_dir,
+    which contains the files as they are after the whole diff. Raises a ValueError if the sources
+    do not match the diff.
+
+    A diff may change the same file more than once (e.g. a git format-patch series), so the files
+    are undone from last to first: the new source of each file is its source after the patches
+    which come before it, which is the old source of the next patch to the same path.
+    """
+    current: Dict[str, Optional[str]] = {}
+
+    def source(path: str) -> Optional[str]:
+        if path not in current:
+            filepath = sources_filepath(sources_dir, path)
+            current[path] = None
+            if os.path.isfile(filepath):
+                with open(filepath, "rb") as ifp:
+                    current[path] = ifp.read().decode(errors="ignore")
+        return current[path]
+
+    sources: List[Tuple[Optional[str], Optional[str]]] = []
+    for diff_file in reversed(diff_files):
+        old_source: Optional[str] = None
+        new_source: Optional[str] = None
+        if diff_file.new_path is not None:
+            new_source = source(diff_file.new_path)
+            # Before this patch, there was no file at its new path (unless it modifies the file).
+            current[diff_file.new_path] = None
+        if diff_file.old_path is not None:
+            # The diff of a deleted file shows all of its lines.
+            if diff_file.new_path is None:
+                old_source = diff_image(diff_file, "-")
+            elif new_source is not None:
+                old_source = reverse_apply(diff_file, new_source)
+            current[diff_file.old_path] = old_source
+        sources.append((old_source, new_source))
+    sources.reverse()
+    return sources
+
+
+def read_diff(path: str) -> str:
+    """
+    Reads unified diff text from the given path, or from stdin if the path is "-".
+    """
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, "rb") as ifp:
+        return ifp.read().decode(errors="ignore")
+
+
+def run_on_diff(
+    diff_text: str,
+    sources_dir: Optional[str] = None,
+    blobs: bool = False,
+    shard: Optional[Shard] = None,
+) -> GitResult:
+    """
+    Same as run, but against unified diff text instead of a repository.
+
+    If sources_dir is given, new sources are read from it (it should contain the files as they are
+    after the diff) and old sources are reconstructed by undoing the diff on them. If blobs is True,
+    both sources are reconstructed from the diff alone - they only contain the lines which the diff
+    shows, so they are only complete for diffs with enough context (e.g. git diff --function-context
+    or -U<large number>). Otherwise, patches have no sources.
+
+    If a shard is given, only the files in that shard are analyzed.
+    """
+    diff_files = parse_diff(diff_text)
+    sources: Optional[List[Tuple[Optional[str], Optional[str]]]] = None
+    if sources_dir is not None:
+        sources = reconstruct_sources(diff_files, sources_dir)
+    patches: List[PatchInfo] = []
+    for i, diff_file in enumerate(diff_files):
+        new_file = diff_file.new_path or diff_file.old_path or ""
+        if not in_shard(new_file, shard):
+            continue
+        patch = PatchInfo(
+            old_file=diff_file.old_path or new_file,
+            new_file=new_file,
+            hunks=[
+                hunk_info
+                for hunk in diff_file.hunks
+                for hunk_info in zero_context_hunks(hunk)
+            ],
+        )
+        old_source: Optional[str] = None
+        new_source: Optional[str] = None
+        if sources is not None:
+            old_source, new_source = sources[i]
+        elif blobs:
+            if diff_file.old_path is not None:
+                old_source = diff_image(diff_file, "-")
+            if diff_file.new_path is not None:
+                new_source = diff_image(diff_file, "+")
+        if old_source is not None:
+            patch.old_source = old_source
+        if new_source is not None:
+            patch.new_source = new_source
+        patches.append(patch)
+
+    # git format-patch output names the commit of each patch - the result refers to the last one.
+    commits = FORMAT_PATCH_HEADER.findall(diff_text)
+    response = GitResult(
+        repo=os.path.normpath(os.path.abspath(sources_dir)) if sources_dir else "",
+        initial_ref="",
+        patches=patches,
+        shard=shard,
+    )
+    if commits:
+        response.terminal_ref = commits[-1][:7]
+    return response
+
+
 def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
     """
     Populates an argparse ArgumentParser object with the commonly used arguments for this module.
@@ -225,12 +870,221 @@ def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
         default=None,
         help="Terminal git revision",
     )
+    parser.add_argument(
+        "--no-renames",
+        action="store_true",
+        help="Do not detect renamed files (they are reported as deleted and added instead)",
+    )
+    parser.add_argument(
+        "--find-copies",
+        action="store_true",
+        help="Detect files which were copied from files modified in the same diff",
+    )
+    parser.add_argument(
+        "--rename-threshold",
+        type=int,
+        default=DEFAULT_SIMILARITY.rename_threshold,
+        help=(
+            "Minimum similarity (in percent) for a deleted and an added file to count as a rename "
+            f"(default: {DEFAULT_SIMILARITY.rename_threshold})"
+        ),
+    )
+    parser.add_argument(
+        "--copy-threshold",
+        type=int,
+        default=DEFAULT_SIMILARITY.copy_threshold,
+        help=(
+            "Minimum similarity (in percent) for an added file to count as a copy "
+            f"(default: {DEFAULT_SIMILARITY.copy_threshold})"
+        ),
+    )
+    parser.add_argument(
+        "--rename-limit",
+        type=int,
+        default=DEFAULT_SIMILARITY.rename_limit,
+        help=(
+            "Maximum number of files to consider as sources of renames and copies "
+            f"(default: {DEFAULT_SIMILARITY.rename_limit})"
+        ),
+    )
+    parser.add_argument(
+        "--from-diff",
+        default=None,
+        help=(
+            "Analyze unified diff text from the given file (or from stdin, if the value is -) "
+            "instead of revisions of a repository"
+        ),
+    )
+    parser.add_argument(
+        "--merge-base",
+        action="store_true",
+        help=(
+            "Diff from the merge base of the initial and terminal revisions (like git diff "
+            "initial...terminal), so that changes which only happened on the initial side are "
+            "left out"
+        ),
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help=(
+            "Compare the initial revision against the changes staged in the index (like git diff "
+            "--cached) instead of against the working tree, e.g. in a pre-commit hook"
+        ),
+    )
+    diff_sources = parser.add_mutually_exclusive_group()
+    diff_sources.add_argument(
+        "--sources",
+        default=None,
+        help=(
+            "With --from-diff: directory which contains the files as they are after the diff (their "
+            "old versions are reconstructed by undoing the diff)"
+        ),
+    )
+    diff_sources.add_argument(
+        "--blobs",
+        action="store_true",
+        help=(
+            "With --from-diff: reconstruct the files on either side of the diff from the lines it "
+            "shows (use diffs with enough context, e.g. git diff --function-context)"
+        ),
+    )
+
+
+def validate_diff_arguments(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    """
+    Exits with a usage error if the arguments mix --from-diff with revisions (or --merge-base or
+    --staged), use --sources or --blobs without it, or combine --staged with a terminal revision.
+    """
+    if args.from_diff is not None:
+        if args.initial is not None or args.terminal is not None or args.merge_base:
+            parser.error("--from-diff cannot be used with revisions or --merge-base")
+        if args.staged:
+            parser.error("--from-diff cannot be used with --staged")
+    elif args.sources is not None or args.blobs:
+        parser.error("--sources and --blobs can only be used with --from-diff")
+    if args.staged and args.terminal is not None:
+        parser.error("--staged cannot be used with a terminal revision")
+
+
+def add_shard_argument(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the --shard argument to an argparse ArgumentParser object. Results of sharded runs are
+    combined with locust merge.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "--shard",
+        type=shard_argument,
+        default=None,
+        help=(
+            "Only analyze the files in shard i/N (the i-th of N shards, counting from 0) - files are "
+            "assigned to shards by a hash of their path"
+        ),
+    )
+
+
+def similarity_options_from_args(args: argparse.Namespace) -> SimilarityOptions:
+    return SimilarityOptions(
+        renames=not args.no_renames,
+        copies=args.find_copies,
+        rename_threshold=args.rename_threshold,
+        copy_threshold=args.copy_threshold,
+        rename_limit=args.rename_limit,
+    )
 
 
-def run(repo_dir: str, initial: Optional[str], terminal: Optional[str]) -> GitResult:
+def run(
+    repo_dir: str,
+    initial: Optional[str],
+    terminal: Optional[str],
+    sources: Optional[SourceCache] = None,
+    similarity: Optional[SimilarityOptions] = None,
+    merge_base: bool = False,
+    staged: bool = False,
+    shard: Optional[Shard] = None,
+) -> GitResult:
+    """
+    Diffs the terminal revision (or the working tree, if it is None) against the initial revision.
+
+    If merge_base is True, the diff is taken from the merge base of the two revisions instead (like
+    git diff initial...terminal), so that it only contains the changes on the terminal side. If
+    staged is True, the index takes the place of the working tree (see get_patches). If a shard is
+    given, the result only contains the patches to the files in that shard, and records the shard.
+    """
     repo = get_repository(repo_dir)
+    return run_on_repository(
+        repo, initial, terminal, sources, similarity, merge_base, staged, shard
+    )
 
-    initial_ref: Optional[str] = None
+
+def run_on_repository(
+    repo: "pygit2.Repository",
+    initial: Optional[str],
+    terminal: Optional[str],
+    sources: Optional[SourceCache] = None,
+    similarity: Optional[SimilarityOptions] = None,
+    merge_base: bool = False,
+    staged: bool = False,
+    shard: Optional[Shard] = None,
+) -> GitResult:
+    """
+    Same as run, but against a repository object which has already been opened. This allows callers
+    which analyze many revision pairs in the same repository to keep it (and a sources cache) warm.
+    """
+    if merge_base:
+        initial = merge_base_revision(repo, initial, terminal)
+    if staged and initial is None and repo.head_is_unborn:
+        initial = NULL_REVISION
+    initial_ref, terminal_ref = resolve_refs(repo, initial, terminal)
+    patches = get_patches(
+        repo, initial_ref, terminal_ref, sources, similarity, staged, shard
+    )
+    response = GitResult(
+        repo=repository_path(repo),
+        initial_ref=initial_ref,
+        terminal_ref=terminal_ref,
+        patches=patches,
+        shard=shard,
+    )
+    return response
+
+
+def merge_base_revision(
+    repo: "pygit2.Repository", initial: Optional[str], terminal: Optional[str]
+) -> Optional[str]:
+    """
+    Returns the hash of the merge base of the given revisions, which stand for HEAD if they are
+    None. The null revision has no history, so it is returned as it is.
+
+    Raises a ValueError if the revisions have no common history (which is also the case when the
+    merge base is missing from a shallow clone).
+    """
+    import pygit2
+
+    if initial == NULL_REVISION or terminal == NULL_REVISION:
+        return initial
+
+    initial_commit = repo.revparse_single(initial or "HEAD").peel(pygit2.Commit)
+    terminal_commit = repo.revparse_single(terminal or "HEAD").peel(pygit2.Commit)
+    base = repo.merge_base(initial_commit.id, terminal_commit.id)
+    if base is None:
+        raise ValueError(
+            f"Revisions {initial or 'HEAD'} and {terminal or 'HEAD'} have no merge base"
+        )
+    return str(base)
+
+
+def resolve_refs(
+    repo: "pygit2.Repository", initial: Optional[str], terminal: Optional[str]
+) -> Tuple[str, Optional[str]]:
+    """
+    Resolves the given initial and terminal revisions to the short hashes that locust results refer
+    to them by. A terminal revision of None (the working tree) resolves to None.
+    """
     if initial is None:
         initial_ref = repo.revparse_single("HEAD").short_id
     elif initial == NULL_REVISION:
@@ -246,14 +1100,7 @@ def run(repo_dir: str, initial: Optional[str], terminal: Optional[str]) -> GitRe
     else:
         terminal_ref = repo.revparse_single(terminal).short_id
 
-    patches = get_patches(repo, initial_ref, terminal_ref)
-    response = GitResult(
-        repo=os.path.normpath(repo.workdir),
-        initial_ref=initial_ref,
-        terminal_ref=terminal_ref,
-        patches=patches,
-    )
-    return response
+    return initial_ref, terminal_ref
 
 
 def main():
@@ -270,10 +1117,30 @@ def main():
             "format)"
         ),
     )
+    add_shard_argument(parser)
 
     args = parser.parse_args()
+    validate_diff_arguments(parser, args)
+
+    from google.protobuf.json_format import MessageToDict
 
-    response = run(args.repo, args.initial, args.terminal)
+    if args.from_diff is not None:
+        try:
+            response = run_on_diff(
+                read_diff(args.from_diff), args.sources, args.blobs, args.shard
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        response = run(
+            args.repo,
+            args.initial,
+            args.terminal,
+            similarity=similarity_options_from_args(args),
+            merge_base=args.merge_base,
+            staged=args.staged,
+            shard=args.shard,
+        )
 
     try:
         with args.output as ofp:
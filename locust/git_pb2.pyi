@@ -113,6 +113,19 @@ class PatchInfo(google___protobuf___message___Message):
     def ClearField(self, field_name: typing_extensions___Literal[u"hunks",b"hunks",u"new_file",b"new_file",u"new_source",b"new_source",u"old_file",b"old_file",u"old_source",b"old_source"]) -> None: ...
 type___PatchInfo = PatchInfo
 
+class Shard(google___protobuf___message___Message):
+    DESCRIPTOR: google___protobuf___descriptor___Descriptor = ...
+    index: builtin___int = ...
+    count: builtin___int = ...
+
+    def __init__(self,
+        *,
+        index : typing___Optional[builtin___int] = None,
+        count : typing___Optional[builtin___int] = None,
+        ) -> None: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"count",b"count",u"index",b"index"]) -> None: ...
+type___Shard = Shard
+
 class GitResult(google___protobuf___message___Message):
     DESCRIPTOR: google___protobuf___descriptor___Descriptor = ...
     repo: typing___Text = ...
@@ -122,12 +135,17 @@ class GitResult(google___protobuf___message___Message):
     @property
     def patches(self) -> google___protobuf___internal___containers___RepeatedCompositeFieldContainer[type___PatchInfo]: ...
 
+    @property
+    def shard(self) -> type___Shard: ...
+
     def __init__(self,
         *,
         repo : typing___Optional[typing___Text] = None,
         initial_ref : typing___Optional[typing___Text] = None,
         terminal_ref : typing___Optional[typing___Text] = None,
         patches : typing___Optional[typing___Iterable[type___PatchInfo]] = None,
+        shard : typing___Optional[type___Shard] = None,
         ) -> None: ...
-    def ClearField(self, field_name: typing_extensions___Literal[u"initial_ref",b"initial_ref",u"patches",b"patches",u"repo",b"repo",u"terminal_ref",b"terminal_ref"]) -> None: ...
+    def HasField(self, field_name: typing_extensions___Literal[u"shard",b"shard"]) -> builtin___bool: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"initial_ref",b"initial_ref",u"patches",b"patches",u"repo",b"repo",u"shard",b"shard",u"terminal_ref",b"terminal_ref"]) -> None: ...
 type___GitResult = GitResult
@@ -0,0 +1,199 @@
+"""
+Runs locust from git server hooks (pre-receive, post-receive), against the updates in a push
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Iterator, List, NamedTuple, Optional, TextIO, Tuple, TYPE_CHECKING
+
+from . import git
+from . import parse
+from . import render
+from .cache import LRUCache
+from .server import DEFAULT_CACHE_SIZE
+
+if TYPE_CHECKING:
+    import pygit2
+
+
+# libgit2's GIT_REPOSITORY_OPEN_FROM_ENV flag, which not every supported version of pygit2 exports.
+REPOSITORY_OPEN_FROM_ENV = 1 << 4
+
+
+class RefUpdate(NamedTuple):
+    """
+    A ref update, as git passes it to pre-receive and post-receive hooks on stdin.
+    """
+
+    old: str
+    new: str
+    ref: str
+
+
+def is_null_hash(commit_hash: str) -> bool:
+    return set(commit_hash) == {"0"}
+
+
+def read_updates(ifp: TextIO) -> List[RefUpdate]:
+    """
+    Reads ref updates of the form "<old hash> <new hash> <ref>", one per line.
+    """
+    updates: List[RefUpdate] = []
+    for line in ifp:
+        components = line.split()
+        if not components:
+            continue
+        if len(components) != 3:
+            raise ValueError(f"Invalid ref update: {line.strip()}")
+        updates.append(RefUpdate(*components))
+    return updates
+
+
+def open_repository(repo_dir: Optional[str] = None) -> "pygit2.Repository":
+    """
+    Opens the repository that a hook runs in: the given one, or else the one in GIT_DIR (or the
+    current directory, where git runs hooks). git's other environment variables are respected, so
+    that the objects which a pre-receive hook receives (which git keeps in a quarantine directory
+    until the hook accepts them) are visible. GIT_DIR never overrides a repository which is given.
+    """
+    import pygit2
+
+    if repo_dir is None:
+        repo_dir = os.environ.get("GIT_DIR", ".")
+    # libgit2 only reads GIT_DIR when it is not given a path.
+    return pygit2.Repository(repo_dir, REPOSITORY_OPEN_FROM_ENV)
+
+
+def report_error(update: RefUpdate, error: Exception) -> None:
+    print(f"locust hook failed on {update.ref}: {repr(error)}", file=sys.stderr)
+
+
+def update_revisions(
+    repository: "pygit2.Repository", update: RefUpdate
+) -> Optional[Tuple[str, str]]:
+    """
+    Returns the initial and terminal revisions to analyze for the given ref update, or None if there
+    is nothing to analyze (the ref was deleted). New refs are analyzed against the first parent of
+    the commit they point to.
+    """
+    import pygit2
+
+    if is_null_hash(update.new):
+        return None
+    if not is_null_hash(update.old):
+        return update.old, update.new
+
+    commit = repository.revparse_single(update.new).peel(pygit2.Commit)
+    if commit.parent_ids:
+        return str(commit.parent_ids[0]), update.new
+    return git.NULL_REVISION, update.new
+
+
+def run(
+    repository: "pygit2.Repository",
+    updates: List[RefUpdate],
+    plugins: List[str],
+    ignore_docstrings: bool = False,
+    similarity: Optional[git.SimilarityOptions] = None,
+) -> Iterator[Tuple[RefUpdate, parse.ParseResult]]:
+    """
+    Generates a parse result for each of the given ref updates (except deletions), in order. Updates
+    which cannot be analyzed are reported on stderr and skipped, so they do not hold up the others.
+
+    All updates are analyzed against the same repository object, through shared caches of blob
+    sources and definitions, so a push which updates many refs to related commits reads and parses
+    each blob once.
+    """
+    sources: git.SourceCache = LRUCache(DEFAULT_CACHE_SIZE)
+    cache: parse.DefinitionsCache = LRUCache(DEFAULT_CACHE_SIZE)
+    for update in updates:
+        try:
+            revisions = update_revisions(repository, update)
+            if revisions is None:
+                continue
+            initial, terminal = revisions
+            git_result = git.run_on_repository(
+                repository, initial, terminal, sources, similarity
+            )
+            parse_result = parse.run(git_result, plugins, cache, ignore_docstrings)
+        except Exception as e:
+            report_error(update, e)
+            continue
+        yield update, parse_result
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust hook",
+        description=(
+            "Locust: Analyze the ref updates in a push, from a pre-receive or post-receive hook. "
+            "Reads updates from stdin (as git passes them to those hooks) and writes one JSON object "
+            'per line for each of them, of the form {"ref": ..., "old": ..., "new": ..., '
+            '"result": ...}. Errors are reported on stderr, and never reject the push.'
+        ),
+    )
+    parser.add_argument(
+        "-r",
+        "--repo",
+        required=False,
+        default=None,
+        help=(
+            "Path to git repository (default: GIT_DIR, or the current directory, where git runs "
+            "hooks). The objects of a push are visible in pre-receive hooks either way."
+        ),
+    )
+    parse.populate_argument_parser(parser)
+    render.populate_argument_parser(parser)
+    parser.add_argument(
+        "-i",
+        "--input",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="Path to a file of ref updates. If not specified, reads from stdin.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Path to which to write results",
+    )
+    args = parser.parse_args(argv)
+    render.validate_arguments(parser, args)
+
+    try:
+        with args.input as ifp:
+            updates = read_updates(ifp)
+        repository = open_repository(args.repo)
+        results = run(
+            repository, updates, args.plugins, ignore_docstrings=args.ignore_docstrings
+        )
+        with args.output as ofp:
+            for update, parse_result in results:
+                try:
+                    rendered = render.run(
+                        parse_result,
+                        args.format,
+                        args.github,
+                        args.metadata,
+                        args.max_changes,
+                        args.max_bytes,
+                        args.drop_cosmetic,
+                    )
+                except Exception as e:
+                    report_error(update, e)
+                    continue
+                result = json.loads(rendered) if args.format == "json" else rendered
+                record = {**update._asdict(), "result": result}
+                print(json.dumps(record), file=ofp, flush=True)
+    except BrokenPipeError:
+        pass
+    except Exception as e:
+        print(f"locust hook failed: {repr(e)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Persistent (SQLite) index of the definitions and changes in the history of a repository
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from . import git
+from . import log
+from . import parse
+from .cache import LRUCache
+from .server import DEFAULT_CACHE_SIZE
+
+if TYPE_CHECKING:
+    import pygit2
+
+DEFAULT_INDEX_FILENAME = "locust.sqlite"
+
+# Commits are written to the index in transactions of this many commits, so that an interrupted
+# build only loses the work done since the last transaction.
+COMMITS_PER_TRANSACTION = 100
+
+DEFINITION_TYPES = [
+    parse.ContextType.FUNCTION_DEF.value,
+    parse.ContextType.ASYNC_FUNCTION_DEF.value,
+    parse.ContextType.CLASS_DEF.value,
+]
+
+# Definitions are stored once per (blob, path). Every (blob, path) pair in any revision was
+# introduced by some commit, so indexing the new side of every patch in history is enough to know
+# the definitions in every revision. The indices are covering indices for the queries below.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    parent TEXT NOT NULL,
+    time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    commit_id INTEGER NOT NULL,
+    filepath TEXT NOT NULL,
+    name TEXT NOT NULL,
+    change_type TEXT NOT NULL,
+    line INTEGER,
+    changed_lines INTEGER,
+    total_lines INTEGER
+);
+CREATE INDEX IF NOT EXISTS changes_by_name
+    ON changes (name, commit_id, filepath, change_type, changed_lines, total_lines);
+CREATE TABLE IF NOT EXISTS files (
+    oid TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (oid, path)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS definitions (
+    oid TEXT NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    change_type TEXT NOT NULL,
+    line INTEGER,
+    end_line INTEGER
+);
+CREATE INDEX IF NOT EXISTS definitions_by_name
+    ON definitions (name, path, oid, change_type, line, end_line);
+"""
+
+
+def default_index_path(repository: "pygit2.Repository") -> str:
+    return os.path.join(repository.path, DEFAULT_INDEX_FILENAME)
+
+
+def connect(index_path: str) -> sqlite3.Connection:
+    """
+    Opens (and, if necessary, creates) the index at the given path.
+    """
+    connection = sqlite3.connect(index_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def index_commit(
+    connection: sqlite3.Connection,
+    repository: "pygit2.Repository",
+    parent: str,
+    commit: str,
+    sources: Optional[git.SourceCache] = None,
+    cache: Optional[parse.DefinitionsCache] = None,
+) -> None:
+    """
+    Adds the changes in the given commit (against the given parent), and the definitions in the
+    blobs it introduced, to the index. Does not commit the transaction.
+    """
+    import pygit2
+
+    git_result = git.run_on_repository(repository, parent, commit, sources)
+    parse_result = parse.run(git_result, [], cache)
+
+    commit_object = repository.get(commit)
+    assert isinstance(commit_object, pygit2.Commit)
+    cursor = connection.execute(
+        "INSERT INTO commits (hash, parent, time) VALUES (?, ?, ?)",
+        (commit, parent, commit_object.commit_time),
+    )
+    commit_id = cursor.lastrowid
+    connection.executemany(
+        "INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                commit_id,
+                change.filepath,
+                change.name,
+                change.change_type,
+                change.line,
+                change.changed_lines,
+                change.total_lines,
+            )
+            for change in parse_result.changes
+        ],
+    )
+
+    for patch in git_result.patches:
+        _, extension = os.path.splitext(patch.new_file)
+        if extension != ".py" or not patch.new_source:
+            continue
+        # The source was decoded leniently, so it may not hash back to the blob it was read from.
+        oid = str(commit_object.tree[patch.new_file].id)
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO files (oid, path) VALUES (?, ?)",
+            (oid, patch.new_file),
+        )
+        if cursor.rowcount == 0:
+            continue
+        try:
+            definitions = parse.cached_patch_definitions(patch, cache)
+        except Exception:
+            continue
+        connection.executemany(
+            "INSERT INTO definitions VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    oid,
+                    patch.new_file,
+                    definition.name,
+                    definition.change_type,
+                    definition.line,
+                    definition.end_line,
+                )
+                for definition in definitions
+                if definition.change_type in DEFINITION_TYPES
+            ],
+        )
+
+
+def build(
+    connection: sqlite3.Connection,
+    repo_dir: str,
+    revision: str = "HEAD",
+    first_parent: bool = False,
+) -> int:
+    """
+    Adds every commit in the history of the given revision which is not already in the index to the
+    index. Returns the number of commits which were added.
+    """
+    repository = git.get_repository(repo_dir)
+    indexed = set(row[0] for row in connection.execute("SELECT hash FROM commits"))
+    commits = [
+        (parent, commit)
+        for parent, commit in log.commits_in_range(repository, revision, first_parent)
+        if commit not in indexed
+    ]
+
+    sources: git.SourceCache = LRUCache(DEFAULT_CACHE_SIZE)
+    cache: parse.DefinitionsCache = LRUCache(DEFAULT_CACHE_SIZE)
+    for i, (parent, commit) in enumerate(commits):
+        index_commit(connection, repository, parent, commit, sources, cache)
+        if (i + 1) % COMMITS_PER_TRANSACTION == 0:
+            connection.commit()
+    connection.commit()
+    return len(commits)
+
+
+def name_candidates(name: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Returns the (filepath, name) pairs that a name given to a query could refer to. Besides the name
+    as locust reports it, a name may be qualified with the module that defines it (e.g.
+    locust.render.nest_results).
+    """
+    candidates: List[Tuple[Optional[str], str]] = [(None, name)]
+    components = name.split(".")
+    for i in range(1, len(components)):
+        module_path = "/".join(components[:i])
+        for filepath in [f"{module_path}.py", f"{module_path}/__init__.py"]:
+            candidates.append((filepath, ".".join(components[i:])))
+    return candidates
+
+
+def commits_touching(connection: sqlite3.Connection, name: str) -> List[Dict[str, Any]]:
+    """
+    Returns the commits which changed definitions with the given name, in the order they were
+    indexed (parents before children).
+    """
+    results: List[Dict[str, Any]] = []
+    for filepath, candidate_name in name_candidates(name):
+        query = (
+            "SELECT commits.hash, commits.time, changes.filepath, changes.name, "
+            "changes.change_type, changes.changed_lines, changes.total_lines "
+            "FROM changes JOIN commits ON commits.id = changes.commit_id "
+            "WHERE changes.name = ?"
+        )
+        parameters: List[Any] = [candidate_name]
+        if filepath is not None:
+            query += " AND changes.filepath = ?"
+            parameters.append(filepath)
+        query += " ORDER BY changes.commit_id"
+        for row in connection.execute(query, parameters):
+            results.append(
+                {
+                    "commit": row[0],
+                    "time": row[1],
+                    "filepath": row[2],
+                    "name": row[3],
+                    "type": row[4],
+                    "changed_lines": row[5],
+                    "total_lines": row[6],
+                }
+            )
+    return results
+
+
+def definitions_at(
+    connection: sqlite3.Connection,
+    repository: "pygit2.Repository",
+    revision: str,
+    name: str,
+) -> List[Dict[str, Any]]:
+    """
+    Returns the definitions with the given name in the given revision. Only the blobs which define
+    the name are looked up in the revision, so the cost of the query does not depend on the size of
+    the revision.
+    """
+    import pygit2
+
+    tree = repository.revparse_single(revision).peel(pygit2.Tree)
+    results: List[Dict[str, Any]] = []
+    for filepath, candidate_name in name_candidates(name):
+        query = "SELECT path, oid, change_type, line, end_line FROM definitions WHERE name = ?"
+        parameters: List[Any] = [candidate_name]
+        if filepath is not None:
+            query += " AND path = ?"
+            parameters.append(filepath)
+        for path, oid, change_type, line, end_line in connection.execute(
+            query, parameters
+        ):
+            try:
+                entry = tree[path]
+            except KeyError:
+                continue
+            if str(entry.id) != oid:
+                continue
+            results.append(
+                {
+                    "filepath": path,
+                    "name": candidate_name,
+                    "type": change_type,
+                    "line": line,
+                    "end_line": end_line,
+                }
+            )
+    results.sort(key=lambda result: (result["filepath"], result["line"]))
+    return results
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "-r", "--repo", required=False, default=".", help="Path to git repository"
+    )
+    parser.add_argument(
+        "--index",
+        default=None,
+        help=f"Path to the index (default: {DEFAULT_INDEX_FILENAME} in the git directory)",
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust index",
+        description=(
+            "Locust: Build (or bring up to date) an index of the definitions and changes in the "
+            "history of a repository. Query it with locust query."
+        ),
+    )
+    populate_argument_parser(parser)
+    parser.add_argument(
+        "revision",
+        nargs="?",
+        default="HEAD",
+        help="Revision whose history to index (default: HEAD)",
+    )
+    parser.add_argument(
+        "--first-parent",
+        action="store_true",
+        help="Only follow the first parent of merge commits",
+    )
+    args = parser.parse_args(argv)
+
+    index_path = args.index
+    if index_path is None:
+        index_path = default_index_path(git.get_repository(args.repo))
+    connection = connect(index_path)
+    try:
+        num_commits = build(connection, args.repo, args.revision, args.first_parent)
+    finally:
+        connection.close()
+    print(f"Indexed {num_commits} new commits in {index_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Runs locust over every commit in a range of history
+"""
+
+import argparse
+import json
+import sys
+from typing import Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from . import git
+from . import parse
+from .cache import LRUCache
+from .server import DEFAULT_CACHE_SIZE
+
+if TYPE_CHECKING:
+    import pygit2
+
+
+def parse_range(revision_range: str) -> Tuple[Optional[str], str]:
+    """
+    Splits a revision range of the form "A..B" into the tuple (A, B). A range consisting of a single
+    revision B stands for all the history leading up to B, and is returned as (None, B). Raises a
+    ValueError for malformed ranges, and for symmetric differences (A...B), which are not supported.
+    """
+    if ".." not in revision_range:
+        return None, revision_range
+    if "..." in revision_range:
+        raise ValueError(
+            f"Symmetric difference ranges are not supported: {revision_range} (use A..B)"
+        )
+    start, end = revision_range.split("..", 1)
+    if not start or not end:
+        raise ValueError(f"Invalid revision range: {revision_range}")
+    return start, end
+
+
+def range_argument(value: str) -> str:
+    try:
+        parse_range(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def commits_in_range(
+    repository: "pygit2.Repository", revision_range: str, first_parent: bool = False
+) -> List[Tuple[str, str]]:
+    """
+    Returns the commits which are reachable from the end of the given range but not from its start,
+    parents before children. Each commit is returned as a tuple of the form:
+    (hash of its first parent - or the null revision for root commits, hash of the commit)
+    """
+    import pygit2
+
+    start, end = parse_range(revision_range)
+    walker = repository.walk(
+        repository.revparse_single(end).peel(pygit2.Commit).id,
+        pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE,
+    )
+    if start is not None:
+        walker.hide(repository.revparse_single(start).peel(pygit2.Commit).id)
+    if first_parent:
+        walker.simplify_first_parent()
+
+    commits: List[Tuple[str, str]] = []
+    for commit in walker:
+        parent = git.NULL_REVISION
+        if commit.parent_ids:
+            parent = str(commit.parent_ids[0])
+        commits.append((parent, str(commit.id)))
+    return commits
+
+
+def run(
+    repo_dir: str,
+    revision_range: str,
+    plugins: List[str],
+    first_parent: bool = False,
+    sources: Optional[git.SourceCache] = None,
+    cache: Optional[parse.DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> Iterator[parse.ParseResult]:
+    """
+    Generates a parse result for each commit in the given revision range (against its first parent),
+    in commit order.
+
+    Each commit only differs from its parent in the files it touches, and the sources of those files
+    on the parent side are the ones which were read on the previous commit. Blob sources and
+    definitions are cached by blob hash, so every commit costs about as much as its own changes.
+    """
+    if sources is None:
+        sources = LRUCache(DEFAULT_CACHE_SIZE)
+    if cache is None:
+        cache = LRUCache(DEFAULT_CACHE_SIZE)
+
+    repository = git.get_repository(repo_dir)
+    for parent, commit in commits_in_range(repository, revision_range, first_parent):
+        git_result = git.run_on_repository(repository, parent, commit, sources)
+        yield parse.run(git_result, plugins, cache, ignore_docstrings)
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "-r", "--repo", required=False, default=".", help="Path to git repository"
+    )
+    parser.add_argument(
+        "range",
+        type=range_argument,
+        help=(
+            "Revision range of the form A..B (commits reachable from B but not from A) - a single "
+            "revision B stands for all the history leading up to B"
+        ),
+    )
+    parser.add_argument(
+        "--first-parent",
+        action="store_true",
+        help="Only follow the first parent of merge commits",
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust log",
+        description=(
+            "Locust: Analyze every commit in a range of history. Writes the parse result of each "
+            "commit (against its first parent) as one JSON object per line, in commit order."
+        ),
+    )
+    populate_argument_parser(parser)
+    parse.populate_argument_parser(parser)
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Path to which to write results",
+    )
+    args = parser.parse_args(argv)
+
+    from google.protobuf.json_format import MessageToDict
+
+    try:
+        with args.output as ofp:
+            for parse_result in run(
+                args.repo,
+                args.range,
+                args.plugins,
+                args.first_parent,
+                ignore_docstrings=args.ignore_docstrings,
+            ):
+                print(
+                    json.dumps(
+                        MessageToDict(parse_result, preserving_proto_field_name=True)
+                    ),
+                    file=ofp,
+                    flush=True,
+                )
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Merges the parse results of the shards of a sharded locust run into a single parse result
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+from . import parse
+
+
+def merge(results: List[parse.ParseResult]) -> parse.ParseResult:
+    """
+    Merges the parse results of every shard of a sharded run (in any order) into the parse result
+    of the whole run.
+
+    Raises a ValueError if a result is not from a sharded run, if the results do not agree on their
+    refs or on the number of shards, or if any shard is missing or occurs more than once. Results
+    may come from checkouts at different paths, so the merged result takes its repo from shard 0.
+
+    Patches in the merged result are ordered by path, and the changes follow the order of their
+    patches. Moves of definitions between files in different shards are not detected - they are
+    reported as a removal from one file and an addition to the other.
+    """
+    if not results:
+        raise ValueError("No parse results to merge")
+
+    shards: Dict[int, parse.ParseResult] = {}
+    count: Optional[int] = None
+    for result in results:
+        if not result.HasField("shard"):
+            raise ValueError("Parse result is not from a sharded run (no shard)")
+        if count is None:
+            count = result.shard.count
+        elif result.shard.count != count:
+            raise ValueError(
+                f"Results are from runs with different numbers of shards ({count} and "
+                f"{result.shard.count})"
+            )
+        if result.shard.index in shards:
+            raise ValueError(
+                f"Shard {result.shard.index}/{count} occurs more than once"
+            )
+        shards[result.shard.index] = result
+
+    missing = [str(index) for index in range(count or 0) if index not in shards]
+    if missing:
+        raise ValueError(f"Missing shards (out of {count}): {', '.join(missing)}")
+
+    first = shards[0]
+    for index in range(1, len(shards)):
+        result = shards[index]
+        for ref in ["initial_ref", "terminal_ref"]:
+            if getattr(result, ref) != getattr(first, ref):
+                raise ValueError(
+                    f"Shard {index}/{count} has {ref} {getattr(result, ref) or '(none)'}, but "
+                    f"shard 0/{count} has {getattr(first, ref) or '(none)'}"
+                )
+
+    patches = sorted(
+        [patch for index in range(len(shards)) for patch in shards[index].patches],
+        key=lambda patch: (patch.new_file, patch.old_file),
+    )
+    patch_order = {patch.new_file: i for i, patch in enumerate(patches)}
+    changes = sorted(
+        [change for index in range(len(shards)) for change in shards[index].changes],
+        key=lambda change: patch_order.get(change.filepath, len(patch_order)),
+    )
+    return parse.ParseResult(
+        repo=first.repo,
+        initial_ref=first.initial_ref,
+        terminal_ref=first.terminal_ref,
+        patches=patches,
+        changes=changes,
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust merge",
+        description=(
+            "Locust: Merge the parse results of every shard of a sharded run (produced with --shard "
+            "i/N) into a single parse result, which can be rendered with locust.render"
+        ),
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        type=argparse.FileType("r"),
+        help="Paths to the parse results of the shards (in JSON format)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Path to write the merged parse result to (in JSON format)",
+    )
+    args = parser.parse_args(argv)
+
+    from google.protobuf.json_format import MessageToDict, Parse
+
+    results: List[parse.ParseResult] = []
+    for ifp in args.inputs:
+        with ifp:
+            results.append(Parse(ifp.read(), parse.ParseResult()))
+
+    try:
+        result = merge(results)
+    except ValueError as e:
+        print(f"Could not merge parse results: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        with args.output as ofp:
+            print(
+                json.dumps(MessageToDict(result, preserving_proto_field_name=True)),
+                file=ofp,
+            )
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
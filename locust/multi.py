@@ -0,0 +1,122 @@
+"""
+Compares many heads against a single base revision, sharing work between the heads
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+from . import git
+from . import parse
+from . import render
+
+
+def run(
+    repo_dir: str,
+    base: Optional[str],
+    heads: List[str],
+    plugins: List[str],
+    sources: Optional[git.SourceCache] = None,
+    cache: Optional[parse.DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> List[parse.ParseResult]:
+    """
+    Returns the parse result of each of the given heads against the base revision, in the order of
+    the heads.
+
+    The diff of each head against the base is computed separately, but blob sources and definitions
+    are cached by blob hash across all the heads. Blobs which several heads have in common (e.g.
+    files changed on the base side, or files which a branch has not touched since it was rebased)
+    are therefore only read and parsed once. Heads which resolve to the same commit are only
+    analyzed once.
+    """
+    if sources is None:
+        sources = {}
+    if cache is None:
+        cache = {}
+
+    repository = git.get_repository(repo_dir)
+    results_by_ref: Dict[Optional[str], parse.ParseResult] = {}
+    results: List[parse.ParseResult] = []
+    for head in heads:
+        initial_ref, terminal_ref = git.resolve_refs(repository, base, head)
+        parse_result = results_by_ref.get(terminal_ref)
+        if parse_result is None:
+            git_result = git.run_on_repository(repository, initial_ref, head, sources)
+            parse_result = parse.run(git_result, plugins, cache, ignore_docstrings)
+            results_by_ref[terminal_ref] = parse_result
+        results.append(parse_result)
+    return results
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "-r", "--repo", required=False, default=".", help="Path to git repository"
+    )
+    parser.add_argument(
+        "base",
+        help='Base git revision (to take diffs against empty git tree, pass the value "null")',
+    )
+    parser.add_argument(
+        "heads", nargs="+", help="Git revisions to compare against the base revision"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust multi",
+        description=(
+            "Locust: Compare many heads against a single base revision. Writes one JSON object per "
+            'line for each head, of the form {"head": ..., "result": ...}.'
+        ),
+    )
+    populate_argument_parser(parser)
+    parse.populate_argument_parser(parser)
+    render.populate_argument_parser(parser)
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=False,
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="Path to which to write results",
+    )
+    args = parser.parse_args(argv)
+    render.validate_arguments(parser, args)
+
+    parse_results = run(
+        args.repo,
+        args.base,
+        args.heads,
+        args.plugins,
+        ignore_docstrings=args.ignore_docstrings,
+    )
+
+    try:
+        with args.output as ofp:
+            for head, parse_result in zip(args.heads, parse_results):
+                try:
+                    rendered = render.run(
+                        parse_result,
+                        args.format,
+                        args.github,
+                        args.metadata,
+                        args.max_changes,
+                        args.max_bytes,
+                        args.drop_cosmetic,
+                    )
+                except ValueError as e:
+                    parser.error(str(e))
+                result = json.loads(rendered) if args.format == "json" else rendered
+                print(json.dumps({"head": head, "result": result}), file=ofp)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Caches locust parse results in git notes, so that they travel with the repository
+"""
+import argparse
+import hashlib
+import json
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+from . import git
+from . import parse
+from .version import LOCUST_VERSION
+
+if TYPE_CHECKING:
+    import pygit2
+
+DEFAULT_NOTES_REF = "refs/notes/locust"
+
+# Used to sign notes commits in repositories which do not have a user configured (e.g. in CI).
+FALLBACK_NAME = "locust"
+FALLBACK_EMAIL = "locust@bugout.dev"
+
+
+def resolve_revision(repository: "pygit2.Repository", revision: Optional[str]) -> str:
+    """
+    Returns the full hash of the commit that the given revision points to, following the same
+    conventions as git.run (None means HEAD).
+    """
+    import pygit2
+
+    if revision == git.NULL_REVISION:
+        return git.NULL_REVISION
+    return str(repository.revparse_single(revision or "HEAD").peel(pygit2.Commit).id)
+
+
+def cache_key(
+    initial: str,
+    terminal: str,
+    plugins: List[str],
+    ignore_docstrings: bool = False,
+    similarity: Optional[git.SimilarityOptions] = None,
+) -> str:
+    """
+    Returns the key under which the parse result for the given (fully resolved) revisions and
+    plugins is stored. The key changes with the locust version, since results can differ between
+    versions.
+    """
+    key_components: Dict[str, Any] = {
+        "initial": initial,
+        "terminal": terminal,
+        "locust": LOCUST_VERSION,
+        "plugins": sorted(set(plugins or [])),
+    }
+    # Only part of the key when set, so that existing keys stay valid.
+    if ignore_docstrings:
+        key_components["ignore_docstrings"] = True
+    if similarity is not None and similarity != git.DEFAULT_SIMILARITY:
+        key_components["similarity"] = asdict(similarity)
+    return hashlib.sha1(json.dumps(key_components, sort_keys=True).encode()).hexdigest()
+
+
+def read_note(
+    repository: "pygit2.Repository", terminal: str, notes_ref: str
+) -> Dict[str, Any]:
+    """
+    Returns the cached results attached to the given commit, as a dictionary mapping cache keys to
+    parse results (in their JSON representation). Notes which cannot be read are treated as empty.
+    """
+    try:
+        note = repository.lookup_note(terminal, notes_ref)
+        cached_results = json.loads(note.message)
+    except (KeyError, ValueError):
+        return {}
+    if not isinstance(cached_results, dict):
+        return {}
+    return cached_results
+
+
+def lookup(
+    repository: "pygit2.Repository",
+    initial: str,
+    terminal: str,
+    plugins: List[str],
+    notes_ref: str = DEFAULT_NOTES_REF,
+    ignore_docstrings: bool = False,
+    similarity: Optional[git.SimilarityOptions] = None,
+) -> Optional[parse.ParseResult]:
+    """
+    Returns the cached parse result for the given (fully resolved) revisions and plugins, or None if
+    there is no such result in the notes under notes_ref.
+    """
+    from google.protobuf.json_format import ParseDict
+
+    cached_result = read_note(repository, terminal, notes_ref).get(
+        cache_key(initial, terminal, plugins, ignore_docstrings, similarity)
+    )
+    if cached_result is None:
+        return None
+
+    parse_result = ParseDict(cached_result, parse.ParseResult())
+    # The cached result may have been generated in a different clone of the repository.
+    parse_result.repo = git.repository_path(repository)
+    return parse_result
+
+
+def store(
+    repository: "pygit2.Repository",
+    parse_result: parse.ParseResult,
+    initial: str,
+    terminal: str,
+    plugins: List[str],
+    notes_ref: str = DEFAULT_NOTES_REF,
+    ignore_docstrings: bool = False,
+    similarity: Optional[git.SimilarityOptions] = None,
+) -> None:
+    """
+    Stores the given parse result in the note attached to the terminal commit under notes_ref,
+    alongside any results which are already cached for that commit.
+    """
+    import pygit2
+    from google.protobuf.json_format import MessageToDict
+
+    cached_results = read_note(repository, terminal, notes_ref)
+    key = cache_key(initial, terminal, plugins, ignore_docstrings, similarity)
+    cached_results[key] = MessageToDict(parse_result, preserving_proto_field_name=True)
+
+    try:
+        signature = repository.default_signature
+    except KeyError:
+        signature = pygit2.Signature(FALLBACK_NAME, FALLBACK_EMAIL)
+    repository.create_note(
+        json.dumps(cached_results, sort_keys=True),
+        signature,
+        signature,
+        terminal,
+        notes_ref,
+        True,
+    )
+
+
+def run(
+    repo_dir: str,
+    initial: Optional[str],
+    terminal: Optional[str],
+    plugins: List[str],
+    notes_ref: str = DEFAULT_NOTES_REF,
+    ignore_docstrings: bool = False,
+    similarity: Optional[git.SimilarityOptions] = None,
+    merge_base: bool = False,
+    staged: bool = False,
+) -> parse.ParseResult:
+    """
+    Same as running git.run and then parse.run, but checks the notes under notes_ref for a cached
+    result before doing any work, and caches the result there if there was none.
+
+    Results against the working tree (terminal=None), the index (staged) or the null revision are
+    never cached, since there is no commit to attach them to. With merge_base, results are cached
+    against the merge base, so they are shared with runs which were given the merge base as initial
+    revision.
+    """
+    repository = git.get_repository(repo_dir)
+    if merge_base:
+        initial = git.merge_base_revision(repository, initial, terminal)
+    if terminal is None or terminal == git.NULL_REVISION:
+        git_result = git.run_on_repository(
+            repository, initial, terminal, similarity=similarity, staged=staged
+        )
+        return parse.run(git_result, plugins, ignore_docstrings=ignore_docstrings)
+
+    initial_commit = resolve_revision(repository, initial)
+    terminal_commit = resolve_revision(repository, terminal)
+    parse_result = lookup(
+        repository,
+        initial_commit,
+        terminal_commit,
+        plugins,
+        notes_ref,
+        ignore_docstrings,
+        similarity,
+    )
+    if parse_result is None:
+        git_result = git.run_on_repository(
+            repository, initial, terminal, similarity=similarity
+        )
+        parse_result = parse.run(
+            git_result, plugins, ignore_docstrings=ignore_docstrings
+        )
+        store(
+            repository,
+            parse_result,
+            initial_commit,
+            terminal_commit,
+            plugins,
+            notes_ref,
+            ignore_docstrings,
+            similarity,
+        )
+    return parse_result
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "--notes-cache",
+        action="store_true",
+        help="Cache results in (and read cached results from) git notes",
+    )
+    parser.add_argument(
+        "--notes-ref",
+        default=DEFAULT_NOTES_REF,
+        help=(
+            f"With --notes-cache: ref under which to store the notes (default: {DEFAULT_NOTES_REF})"
+        ),
+    )
+
+
+def notes_ref_from_args(args: argparse.Namespace) -> Optional[str]:
+    """
+    Returns the notes ref under which to cache results according to the arguments added by
+    populate_argument_parser, or None if results should not be cached.
+    """
+    if not args.notes_cache:
+        return None
+    return args.notes_ref
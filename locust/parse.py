@@ -3,21 +3,116 @@ AST-related functionality
 """
 import argparse
 import ast
+import contextlib
 from dataclasses import dataclass, field
 from enum import Enum
+import hashlib
 import json
 import os
 import subprocess
 import sys
 import tempfile
-from typing import Any, Dict, List, Optional, Tuple, Union
-
-from google.protobuf.json_format import MessageToDict, Parse, ParseDict
-from pydantic import BaseModel
-from pygit2 import Repository
+from typing import Any, Dict, List, MutableMapping, Optional, Set, Tuple, Union
 
 from . import git
-from .parse_pb2 import RawDefinition, LocustChange, ParseResult, DefinitionParent
+from . import profiling
+from . import tracing
+from .parse_pb2 import (
+    RawDefinition,
+    LocustChange,
+    ParseResult,
+    DefinitionParent,
+    RunStats,
+)
+
+# Maps blob hashes (see git.blob_hash) of Python sources to the definitions that LocustVisitor finds
+# in them. Definitions only depend on the source, so a cache like this can be shared by any number
+# of runs (e.g. over the commits in a push).
+DefinitionsCache = MutableMapping[str, List[RawDefinition]]
+
+
+# Nodes whose bodies may start with a docstring.
+DOCSTRING_NODES = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Nodes which LocustVisitor turns into definitions, and whose structural hashes it records.
+HASHED_NODES = (
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.ClassDef,
+    ast.Name,
+    ast.Attribute,
+)
+
+SEMANTIC = "semantic"
+COSMETIC = "cosmetic"
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+MOVED = "moved"
+MOVED_MODIFIED = "moved+modified"
+
+# Types of definitions which are matched across files when looking for moved definitions.
+MOVABLE_TYPES = {"function", "async_function", "class"}
+
+# Minimum ratio between the sizes (in lines) of a removed and an added definition with the same name
+# for them to count as a moved+modified definition when the file it was removed from still exists.
+MOVE_SIZE_SIMILARITY = 0.5
+
+
+def is_docstring(statement: ast.stmt) -> bool:
+    return (
+        isinstance(statement, ast.Expr)
+        and isinstance(statement.value, ast.Constant)
+        and isinstance(statement.value.value, str)
+    )
+
+
+def structural_hashes(root: ast.AST, ignore_docstrings: bool = False) -> Dict[int, str]:
+    """
+    Computes a hash of the normalized AST of every node under root which LocustVisitor turns into a
+    definition, and returns a dictionary mapping the id of each such node to its hash. Since hashes
+    are computed from the AST (without line and column information), they do not depend on
+    formatting or comments. If ignore_docstrings is True, they do not depend on docstrings either.
+
+    The hash of each node is built from the hashes of its children, so all the hashes are computed
+    in a single pass over the tree.
+    """
+    hashes: Dict[int, str] = {}
+
+    def node_hash(node: ast.AST) -> bytes:
+        digest = hashlib.sha1(type(node).__name__.encode())
+        for name, value in ast.iter_fields(node):
+            if (
+                ignore_docstrings
+                and name == "body"
+                and isinstance(node, DOCSTRING_NODES)
+                and value
+                and is_docstring(value[0])
+            ):
+                value = value[1:]
+            digest.update(f"({name}".encode())
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, ast.AST):
+                    digest.update(node_hash(item))
+                else:
+                    digest.update(repr(item).encode())
+                digest.update(b",")
+            digest.update(b")")
+        if isinstance(node, HASHED_NODES):
+            hashes[id(node)] = digest.hexdigest()
+        return digest.digest()
+
+    node_hash(root)
+    return hashes
+
+
+def dependency_hash(qualified_name: str, signifier: str) -> str:
+    """
+    Structural hash of an imported symbol. Only depends on what is imported and under which name,
+    so that reordering or regrouping imports does not change it.
+    """
+    return hashlib.sha1(f"{qualified_name} as {signifier}".encode()).hexdigest()
 
 
 class ContextType(Enum):
@@ -41,11 +136,13 @@ class Scope:
 
 
 class LocustVisitor(ast.NodeVisitor):
-    def __init__(self):
+    def __init__(self, ignore_docstrings: bool = False):
         self.scope: List[Scope] = []
         self.definitions: List[RawDefinition] = []
         self.context_type: ContextType = ContextType.UNKNOWN
         self.global_symbols: Dict[str, List[str]] = {}
+        self.ignore_docstrings = ignore_docstrings
+        self.hashes: Dict[int, str] = {}
 
     def _current_symbols(self) -> Dict[str, List[str]]:
         if self.scope:
@@ -101,6 +198,7 @@ class LocustVisitor(ast.NodeVisitor):
                 end_line=node.end_lineno,
                 end_offset=node.end_col_offset,
                 parent=parent,
+                structural_hash=self.hashes.get(id(node), ""),
             )
         )
         self.generic_visit(node)
@@ -132,6 +230,7 @@ class LocustVisitor(ast.NodeVisitor):
                 end_line=node.end_lineno,
                 end_offset=node.end_col_offset,
                 parent=parent,
+                structural_hash=dependency_hash(alias.name, signifier),
             )
             self.definitions.append(definition)
 
@@ -158,6 +257,7 @@ class LocustVisitor(ast.NodeVisitor):
                 end_line=node.end_lineno,
                 end_offset=node.end_col_offset,
                 parent=parent,
+                structural_hash=dependency_hash(qualified_name, signifier),
             )
             self.definitions.append(definition)
 
@@ -178,6 +278,7 @@ class LocustVisitor(ast.NodeVisitor):
                     end_line=node.end_lineno,
                     end_offset=node.end_col_offset,
                     parent=parent,
+                    structural_hash=self.hashes.get(id(node), ""),
                 )
                 self.definitions.append(definition)
 
@@ -218,6 +319,7 @@ class LocustVisitor(ast.NodeVisitor):
                         end_line=node.end_lineno,
                         end_offset=node.end_col_offset,
                         parent=parent,
+                        structural_hash=self.hashes.get(id(node), ""),
                     )
                     # Replace prefix with qualification in final_component
                     name = final_component.replace(
@@ -231,6 +333,7 @@ class LocustVisitor(ast.NodeVisitor):
                         end_line=node.end_lineno,
                         end_offset=node.end_col_offset,
                         parent=parent,
+                        structural_hash=self.hashes.get(id(node), ""),
                     )
 
                     self.definitions.extend([origin_definition, definition])
@@ -238,90 +341,483 @@ class LocustVisitor(ast.NodeVisitor):
     def reset(self):
         self.scope = []
         self.definitions = []
+        self.hashes = {}
 
-    def patch_definitions(self, patch: git.PatchInfo) -> List[RawDefinition]:
+    def source_definitions(
+        self, filepath: str, source: Optional[str]
+    ) -> List[RawDefinition]:
         self.reset()
-        _, extension = os.path.splitext(patch.new_file)
-        if extension != ".py" or patch.new_source is None:
+        _, extension = os.path.splitext(filepath)
+        if extension != ".py" or source is None:
             return []
-        root = ast.parse(patch.new_source)
-        self.visit(root)
+        with profiling.measure(profiling.AST_PARSE, filepath):
+            root = ast.parse(source)
+        with profiling.measure(profiling.VISITOR, filepath):
+            self.hashes = structural_hashes(root, self.ignore_docstrings)
+            self.visit(root)
         return self.definitions
 
+    def patch_definitions(self, patch: git.PatchInfo) -> List[RawDefinition]:
+        return self.source_definitions(patch.new_file, patch.new_source)
+
+
+def definitions_cache_key(source: str, ignore_docstrings: bool = False) -> str:
+    """
+    Returns the key under which the definitions in the given source are stored in a
+    DefinitionsCache. Structural hashes depend on whether docstrings are ignored, so the key does
+    too.
+    """
+    key = git.blob_hash(source)
+    if ignore_docstrings:
+        key = f"{key}:ignore-docstrings"
+    return key
+
+
+def cached_source_definitions(
+    filepath: str,
+    source: Optional[str],
+    cache: Optional[DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> List[RawDefinition]:
+    """
+    Returns the definitions in the given source, only parsing the source if its definitions are not
+    already in the given cache.
+    """
+    _, extension = os.path.splitext(filepath)
+    if cache is None or extension != ".py" or not source:
+        return LocustVisitor(ignore_docstrings).source_definitions(filepath, source)
+
+    key = definitions_cache_key(source, ignore_docstrings)
+    definitions = cache.get(key)
+    if definitions is None:
+        definitions = LocustVisitor(ignore_docstrings).source_definitions(
+            filepath, source
+        )
+        cache[key] = definitions
+    return definitions
+
+
+def cached_patch_definitions(
+    patch: git.PatchInfo,
+    cache: Optional[DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> List[RawDefinition]:
+    """
+    Returns the definitions in the new source of the given patch, only parsing the source if its
+    definitions are not already in the given cache.
+    """
+    with tracing.span("patch_definitions", "parse", file=patch.new_file):
+        return cached_source_definitions(
+            patch.new_file, patch.new_source, cache, ignore_docstrings
+        )
+
+
+def definition_hashes(definitions: List[RawDefinition]) -> Dict[str, Set[str]]:
+    """
+    Maps the name of each of the given definitions to the structural hashes of the definitions with
+    that name.
+    """
+    hashes: Dict[str, Set[str]] = {}
+    for definition in definitions:
+        if definition.structural_hash:
+            hashes.setdefault(definition.name, set()).add(definition.structural_hash)
+    return hashes
+
+
+def old_definitions(
+    patch: git.PatchInfo,
+    cache: Optional[DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> List[RawDefinition]:
+    """
+    Returns the definitions in the old source of the given patch. Sources which cannot be parsed have
+    no definitions.
+    """
+    try:
+        return cached_source_definitions(
+            patch.old_file, patch.old_source, cache, ignore_docstrings
+        )
+    except:
+        return []
+
 
 def definitions_by_patch(
     git_result: git.GitResult,
+    cache: Optional[DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
 ) -> List[Tuple[git.PatchInfo, List[RawDefinition]]]:
     results: List[Tuple[git.PatchInfo, List[RawDefinition]]] = []
     for patch in git_result.patches:
-        visitor = LocustVisitor()
         try:
-            definitions = visitor.patch_definitions(patch)
+            definitions = cached_patch_definitions(patch, cache, ignore_docstrings)
             results.append((patch, definitions))
         except:
             pass
     return results
 
 
+# Usages are counted by (name of the innermost enclosing function or class, name, structural hash).
+UsageKey = Tuple[str, str, str]
+
+SCOPE_TYPES = {"function", "async_function", "class"}
+
+
+def usage_keys(definitions: List[RawDefinition]) -> Dict[int, UsageKey]:
+    """
+    Maps the id of each usage among the given definitions to its key. The enclosing definition of
+    each usage is found in a single pass over the definitions, sorted by line.
+    """
+    items = sorted(
+        (
+            definition
+            for definition in definitions
+            if definition.change_type in SCOPE_TYPES
+            or (
+                definition.change_type == ContextType.USAGE.value
+                and definition.structural_hash
+            )
+        ),
+        key=lambda definition: (
+            definition.line,
+            definition.change_type == ContextType.USAGE.value,
+        ),
+    )
+    keys: Dict[int, UsageKey] = {}
+    # Functions and classes which contain the current line, innermost last.
+    scopes: List[RawDefinition] = []
+    for definition in items:
+        while scopes and (scopes[-1].end_line or scopes[-1].line) < definition.line:
+            scopes.pop()
+        if definition.change_type in SCOPE_TYPES:
+            scopes.append(definition)
+            continue
+        scope_name = scopes[-1].name if scopes else ""
+        keys[id(definition)] = (
+            scope_name,
+            definition.name,
+            definition.structural_hash,
+        )
+    return keys
+
+
+def usage_counts(keys: Dict[int, UsageKey]) -> Dict[UsageKey, int]:
+    counts: Dict[UsageKey, int] = {}
+    for key in keys.values():
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def classify(
+    definition: RawDefinition,
+    old_hashes: Optional[Dict[str, Set[str]]],
+    usage_key: Optional[UsageKey] = None,
+    old_usages: Optional[Dict[UsageKey, int]] = None,
+    new_usages: Optional[Dict[UsageKey, int]] = None,
+) -> str:
+    """
+    Classifies a change to the given definition as cosmetic if a definition with the same name and
+    structural hash existed in the old source, and as semantic otherwise. Returns an empty string if
+    there are no structural hashes to compare.
+
+    The hash of a usage only covers the symbol it uses, so if the usage is given with its key (see
+    usage_keys) and the usage counts of both sources, a change to it is only cosmetic if its
+    enclosing definition uses the symbol as often in the new source as in the old one - a new call
+    to a symbol which was already used is semantic.
+    """
+    if old_hashes is None or not definition.structural_hash:
+        return ""
+    if usage_key is not None and old_usages is not None and new_usages is not None:
+        if new_usages.get(usage_key, 0) == old_usages.get(usage_key, 0):
+            return COSMETIC
+        return SEMANTIC
+    if definition.structural_hash in old_hashes.get(definition.name, set()):
+        return COSMETIC
+    return SEMANTIC
+
+
+def changed_lines_in_definition(
+    definition: RawDefinition, boundaries: List[Tuple[int, int]]
+) -> Optional[int]:
+    """
+    Returns the number of lines of the given definition which lie within the given boundaries (sorted
+    by their start lines, in the same coordinates as the definition), or None if none of them do.
+    """
+    possible_boundaries = [
+        boundary
+        for boundary in boundaries
+        if definition.end_line is None or boundary[0] <= definition.end_line
+    ]
+    if not possible_boundaries:
+        return None
+
+    candidate_boundary = max(
+        possible_boundaries,
+        key=lambda p: p[0],
+    )
+    if candidate_boundary[1] < definition.line:
+        return None
+
+    changed_lines = 0
+    for start, end in possible_boundaries:
+        if (end >= definition.line) and (
+            definition.end_line is None or start <= definition.end_line
+        ):
+            end_line = end
+            if definition.end_line is not None and definition.end_line < end:
+                end_line = definition.end_line
+
+            changed_lines += end_line - max(start, definition.line) + 1
+    return changed_lines
+
+
+def definition_total_lines(definition: RawDefinition) -> Optional[int]:
+    if definition.end_line is None:
+        return None
+    return definition.end_line - definition.line + 1
+
+
 def locust_changes_in_patch(
-    patch: git.PatchInfo, definitions: List[RawDefinition], terminal_ref: Optional[str]
+    patch: git.PatchInfo,
+    definitions: List[RawDefinition],
+    terminal_ref: Optional[str],
+    old_definitions: Optional[List[RawDefinition]] = None,
 ) -> Tuple[git.PatchInfo, List[LocustChange]]:
-    pass
+    """
+    Returns the changes to the given definitions (from the new source of the given patch) which the
+    insertions in the patch touch.
+
+    If the definitions in the old source of the patch are also given, the deletions in the patch are
+    matched against them in the same pass, and the two sets of definitions are merged by name:
+    - definitions which only exist in the new source are added
+    - definitions which only exist in the old source, and which the deletions touch, are removed
+      (their lines refer to the old source)
+    - definitions which exist in both sources, and which the insertions or the deletions touch, are
+      modified
+    The changed lines of a definition are the lines inserted into it, or the lines deleted from it if
+    there were no insertions. Changes are also classified as semantic or cosmetic (see classify).
+    """
     insertions_boundaries: List[Tuple[int, int]] = []
+    deletions_boundaries: List[Tuple[int, int]] = []
     for hunk in patch.hunks:
         if hunk.insertions_boundary is not None:
             insertions_boundaries.append(
                 (hunk.insertions_boundary.start, hunk.insertions_boundary.end)
             )
+        if hunk.HasField("deletions_boundary"):
+            deletions_boundaries.append(
+                (hunk.deletions_boundary.start, hunk.deletions_boundary.end)
+            )
     insertions_boundaries.sort(key=lambda p: p[0])
+    deletions_boundaries.sort(key=lambda p: p[0])
+
+    old_hashes: Optional[Dict[str, Set[str]]] = None
+    new_usage_keys: Dict[int, UsageKey] = {}
+    old_usages: Optional[Dict[UsageKey, int]] = None
+    new_usages: Optional[Dict[UsageKey, int]] = None
+    old_names: Set[str] = set()
+    if old_definitions is not None:
+        old_hashes = definition_hashes(old_definitions)
+        new_usage_keys = usage_keys(definitions)
+        old_usages = usage_counts(usage_keys(old_definitions))
+        new_usages = usage_counts(new_usage_keys)
+        old_names = {definition.name for definition in old_definitions}
+
+    def definition_change(
+        definition: RawDefinition, changed_lines: int, status: str
+    ) -> LocustChange:
+        return LocustChange(
+            name=definition.name,
+            change_type=definition.change_type,
+            filepath=patch.new_file,
+            revision=terminal_ref,
+            line=definition.line,
+            changed_lines=changed_lines,
+            total_lines=definition_total_lines(definition),
+            parent=definition.parent,
+            classification=classify(
+                definition,
+                old_hashes,
+                new_usage_keys.get(id(definition)),
+                old_usages,
+                new_usages,
+            ),
+            status=status,
+        )
 
     locust_changes: List[LocustChange] = []
     for definition in definitions:
-        possible_boundaries = [
-            boundary
-            for boundary in insertions_boundaries
-            if definition.end_line is None or boundary[0] <= definition.end_line
-        ]
-        if not possible_boundaries:
+        changed_lines = changed_lines_in_definition(definition, insertions_boundaries)
+        if changed_lines is None:
             continue
+        status = ""
+        if old_definitions is not None:
+            status = MODIFIED if definition.name in old_names else ADDED
+        locust_changes.append(definition_change(definition, changed_lines, status))
 
-        total_lines: Optional[int] = None
-        if definition.end_line is not None:
-            total_lines = definition.end_line - definition.line + 1
-
-        candidate_insertion = max(
-            possible_boundaries,
-            key=lambda p: p[0],
-        )
+    if old_definitions is None or not deletions_boundaries:
+        return (patch, locust_changes)
 
-        if candidate_insertion[1] >= definition.line:
-            changed_lines = 0
-            for start, end in possible_boundaries:
-                if (end >= definition.line) and (
-                    definition.end_line is None or start <= definition.end_line
-                ):
-                    end_line = end
-                    if definition.end_line is not None and definition.end_line < end:
-                        end_line = definition.end_line
+    changed_names = {change.name for change in locust_changes}
+    new_definitions: Dict[str, RawDefinition] = {}
+    for definition in definitions:
+        new_definitions.setdefault(definition.name, definition)
 
-                    changed_lines += end_line - max(start, definition.line) + 1
+    for definition in old_definitions:
+        changed_lines = changed_lines_in_definition(definition, deletions_boundaries)
+        if changed_lines is None or definition.name in changed_names:
+            continue
+        changed_names.add(definition.name)
 
+        new_definition = new_definitions.get(definition.name)
+        if new_definition is not None:
             locust_changes.append(
-                LocustChange(
-                    name=definition.name,
-                    change_type=definition.change_type,
-                    filepath=patch.new_file,
-                    revision=terminal_ref,
-                    line=definition.line,
-                    changed_lines=changed_lines,
-                    total_lines=total_lines,
-                    parent=definition.parent,
-                )
+                definition_change(new_definition, changed_lines, MODIFIED)
+            )
+            continue
+
+        # Removed definitions nest under the new version of their parent, if it still exists.
+        parent = DefinitionParent()
+        parent.CopyFrom(definition.parent)
+        new_parent = new_definitions.get(parent.name)
+        if parent.name and new_parent is not None:
+            parent.line = new_parent.line
+        locust_changes.append(
+            LocustChange(
+                name=definition.name,
+                change_type=definition.change_type,
+                filepath=patch.new_file,
+                revision=terminal_ref,
+                line=definition.line,
+                changed_lines=changed_lines,
+                total_lines=definition_total_lines(definition),
+                parent=parent,
+                classification=SEMANTIC,
+                status=REMOVED,
             )
+        )
 
     return (patch, locust_changes)
 
 
+# (patch, definitions in its new source, definitions in its old source, changes in the patch)
+PatchAnalysis = Tuple[
+    git.PatchInfo, List[RawDefinition], List[RawDefinition], List[LocustChange]
+]
+
+
+def detect_moves(analyses: List[PatchAnalysis]) -> None:
+    """
+    Marks the changes to definitions which were moved from one file to another in the given patches
+    as moved (if their structural hash did not change) or moved+modified (if their structural hash
+    changed but their name did not). Moved changes record the file they were moved from, and the
+    changes which report their removal (and the removal of the definitions nested in them) from that
+    file are dropped.
+
+    Definitions which disappeared from a file are indexed by structural hash and by name, and each
+    definition which appeared in another file is looked up in those indices. This takes time linear
+    in the number of definitions, rather than comparing the files pairwise.
+
+    Names alone are weak evidence (e.g. a main function removed from one module and an unrelated
+    main function added to another), so a definition only matches a removed definition by name if
+    the file it was removed from was deleted or renamed, or if the sizes of the two definitions are
+    within MOVE_SIZE_SIMILARITY of each other.
+
+    Mutates the changes in the given analyses.
+    """
+    removed_by_hash: Dict[str, List[Tuple[int, RawDefinition]]] = {}
+    removed_by_name: Dict[str, List[Tuple[int, RawDefinition]]] = {}
+    for i, (_, definitions, previous_definitions, _) in enumerate(analyses):
+        names = {definition.name for definition in definitions}
+        for definition in previous_definitions:
+            if definition.change_type in MOVABLE_TYPES and definition.name not in names:
+                if definition.structural_hash:
+                    removed_by_hash.setdefault(definition.structural_hash, []).append(
+                        (i, definition)
+                    )
+                removed_by_name.setdefault(definition.name, []).append((i, definition))
+    if not removed_by_name:
+        return
+
+    # Files which were deleted (or emptied) or renamed - their definitions went somewhere else.
+    vacated = {
+        i
+        for i, (patch, _, _, _) in enumerate(analyses)
+        if not patch.new_source or patch.old_file != patch.new_file
+    }
+
+    def similar_sizes(definition: RawDefinition, other: RawDefinition) -> bool:
+        sizes = [definition_total_lines(definition), definition_total_lines(other)]
+        if sizes[0] is None or sizes[1] is None:
+            return False
+        return min(sizes[0], sizes[1]) >= MOVE_SIZE_SIMILARITY * max(sizes[0], sizes[1])
+
+    # Each removed definition is the origin of at most one moved definition. Definitions are cached
+    # by blob, so the same definition object can occur in several patches.
+    matched: Set[Tuple[int, int]] = set()
+    origins: Set[Tuple[int, str, int]] = set()
+
+    def take_origin(
+        candidates: Optional[List[Tuple[int, RawDefinition]]], i: int
+    ) -> Optional[Tuple[int, RawDefinition]]:
+        for candidate in candidates or []:
+            j, definition = candidate
+            if j != i and (j, id(definition)) not in matched:
+                matched.add((j, id(definition)))
+                return candidate
+        return None
+
+    for i, (patch, definitions, previous_definitions, changes) in enumerate(analyses):
+        previous_names = {definition.name for definition in previous_definitions}
+        added = {
+            (definition.name, definition.line): definition
+            for definition in definitions
+            if definition.change_type in MOVABLE_TYPES
+            and definition.name not in previous_names
+        }
+        for change in changes:
+            added_definition = added.get((change.name, change.line))
+            if added_definition is None:
+                continue
+            status = MOVED
+            origin = None
+            if added_definition.structural_hash:
+                origin = take_origin(
+                    removed_by_hash.get(added_definition.structural_hash), i
+                )
+            if origin is None:
+                status = MOVED_MODIFIED
+                candidates = [
+                    (j, definition)
+                    for j, definition in removed_by_name.get(added_definition.name, [])
+                    if j in vacated or similar_sizes(definition, added_definition)
+                ]
+                origin = take_origin(candidates, i)
+            if origin is not None:
+                change.status = status
+                change.previous_filepath = analyses[origin[0]][0].old_file
+                origins.add((origin[0], origin[1].name, origin[1].line))
+
+    for j, (_, _, _, changes) in enumerate(analyses):
+        dropped = {
+            id(change)
+            for change in changes
+            if change.status == REMOVED and (j, change.name, change.line) in origins
+        }
+        # The definitions nested in a moved definition went with it, and their parent is no longer
+        # reported in this file, so their removals are dropped too.
+        parents = {(name, line) for k, name, line in origins if k == j}
+        while parents:
+            nested = [
+                change
+                for change in changes
+                if id(change) not in dropped
+                and (change.parent.name, change.parent.line) in parents
+            ]
+            dropped.update(id(change) for change in nested)
+            parents = {(change.name, change.line) for change in nested}
+        changes[:] = [change for change in changes if id(change) not in dropped]
+
+
 def calculate_changes(
     git_result: git.GitResult,
     patch_definitions: List[Tuple[git.PatchInfo, List[RawDefinition]]],
@@ -335,14 +831,37 @@ def calculate_changes(
     return changes
 
 
-def calculate_python_changes(git_result: git.GitResult) -> List[LocustChange]:
-    patch_definitions = definitions_by_patch(git_result)
-    return calculate_changes(git_result, patch_definitions)
+def calculate_python_changes(
+    git_result: git.GitResult,
+    cache: Optional[DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> List[LocustChange]:
+    """
+    Calculates the changes to Python definitions in the given git result, and classifies each of them
+    as semantic or cosmetic by comparing its structural hash against the hashes of the definitions in
+    the old source of its file. Definitions which were moved between files are marked as such (see
+    detect_moves).
+    """
+    analyses: List[PatchAnalysis] = []
+    for patch, definitions in definitions_by_patch(
+        git_result, cache, ignore_docstrings
+    ):
+        previous_definitions = old_definitions(patch, cache, ignore_docstrings)
+        with profiling.measure(profiling.CHANGES, patch.new_file):
+            _, patch_changes = locust_changes_in_patch(
+                patch, definitions, git_result.terminal_ref, previous_definitions
+            )
+        analyses.append((patch, definitions, previous_definitions, patch_changes))
+    with profiling.measure(profiling.CHANGES):
+        detect_moves(analyses)
+    return [change for _, _, _, patch_changes in analyses for change in patch_changes]
 
 
 def calculate_changes_from_file(
     git_result: git.GitResult, patch_definitions_json: str
 ) -> List[LocustChange]:
+    from google.protobuf.json_format import ParseDict
+
     with open(patch_definitions_json, "r") as ifp:
         patch_definitions_raw = json.load(ifp)
     patch_definitions = [
@@ -365,6 +884,8 @@ def calculate_plugin_changes(
     Returns a dictionary whose keys are the plugins and whose values are tuples of the form:
     (locust changes, errors)
     """
+    from google.protobuf.json_format import MessageToDict
+
     results: Dict[str, List[LocustChange]] = {}
     if not plugins:
         return results
@@ -382,8 +903,11 @@ def calculate_plugin_changes(
         results[plugin] = []
         run_string = f"{plugin} -i {git_result_filename} -o {outfile}"
         try:
-            subprocess.run(run_string, check=True, shell=True)
-            changes = calculate_changes_from_file(git_result, outfile)
+            with profiling.measure(profiling.PLUGINS, plugin=plugin), tracing.span(
+                plugin, "plugin"
+            ):
+                subprocess.run(run_string, check=True, shell=True)
+                changes = calculate_changes_from_file(git_result, outfile)
             results[plugin] = changes
         except Exception as e:
             print(
@@ -395,8 +919,13 @@ def calculate_plugin_changes(
     return results
 
 
-def run(git_result: git.GitResult, plugins: List[str]) -> ParseResult:
-    changes = calculate_python_changes(git_result)
+def run(
+    git_result: git.GitResult,
+    plugins: List[str],
+    cache: Optional[DefinitionsCache] = None,
+    ignore_docstrings: bool = False,
+) -> ParseResult:
+    changes = calculate_python_changes(git_result, cache, ignore_docstrings)
     plugin_changes_dict = calculate_plugin_changes(plugins, git_result)
     for _, plugin_changes in plugin_changes_dict.items():
         changes.extend(plugin_changes)
@@ -406,12 +935,13 @@ def run(git_result: git.GitResult, plugins: List[str]) -> ParseResult:
         terminal_ref=git_result.terminal_ref,
         patches=git_result.patches,
         changes=changes,
+        shard=git_result.shard if git_result.HasField("shard") else None,
     )
 
 
-def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+def add_plugins_argument(parser: argparse.ArgumentParser) -> None:
     """
-    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+    Adds the --plugins argument to an argparse ArgumentParser object.
 
     Mutates the provided parser.
     """
@@ -423,6 +953,20 @@ def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
     )
 
 
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    add_plugins_argument(parser)
+    parser.add_argument(
+        "--ignore-docstrings",
+        action="store_true",
+        help="Classify changes which only touch docstrings as cosmetic",
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description="Locust: Python parsing functionality")
     populate_argument_parser(parser)
@@ -440,13 +984,32 @@ def main():
         default=sys.stdout,
         help="Path to write parse results to (in JSON format)",
     )
+    git.add_shard_argument(parser)
+    profiling.populate_argument_parser(parser)
+    tracing.populate_argument_parser(parser)
 
     args = parser.parse_args()
 
+    from google.protobuf.json_format import MessageToDict, Parse
+
     with args.input as ifp:
         git_result = Parse(ifp.read(), git.GitResult())
-
-    result = run(git_result, args.plugins)
+    if args.shard is not None:
+        try:
+            git_result = git.shard_result(git_result, args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    with contextlib.ExitStack() as stack:
+        if args.trace is not None:
+            stack.enter_context(tracing.tracing(args.trace))
+        profiler: Optional[profiling.Profiler] = None
+        if args.profile:
+            profiler = stack.enter_context(profiling.profiling())
+        result = run(git_result, args.plugins, ignore_docstrings=args.ignore_docstrings)
+    if profiler is not None:
+        result.stats.CopyFrom(profiler.stats())
+        print(profiling.format_stats(result.stats, args.profile_top), file=sys.stderr)
 
     try:
         with args.output as ofp:
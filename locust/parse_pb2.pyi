@@ -2,6 +2,7 @@
 import sys
 from .git_pb2 import(
     PatchInfo as git_pb2___PatchInfo,
+    Shard as git_pb2___Shard,
 )
 
 from google.protobuf.descriptor import (
@@ -57,6 +58,7 @@ class RawDefinition(google___protobuf___message___Message):
     offset: builtin___int = ...
     end_line: builtin___int = ...
     end_offset: builtin___int = ...
+    structural_hash: typing___Text = ...
 
     @property
     def parent(self) -> type___DefinitionParent: ...
@@ -70,9 +72,10 @@ class RawDefinition(google___protobuf___message___Message):
         end_line : typing___Optional[builtin___int] = None,
         end_offset : typing___Optional[builtin___int] = None,
         parent : typing___Optional[type___DefinitionParent] = None,
+        structural_hash : typing___Optional[typing___Text] = None,
         ) -> None: ...
     def HasField(self, field_name: typing_extensions___Literal[u"parent",b"parent"]) -> builtin___bool: ...
-    def ClearField(self, field_name: typing_extensions___Literal[u"change_type",b"change_type",u"end_line",b"end_line",u"end_offset",b"end_offset",u"line",b"line",u"name",b"name",u"offset",b"offset",u"parent",b"parent"]) -> None: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"change_type",b"change_type",u"end_line",b"end_line",u"end_offset",b"end_offset",u"line",b"line",u"name",b"name",u"offset",b"offset",u"parent",b"parent",u"structural_hash",b"structural_hash"]) -> None: ...
 type___RawDefinition = RawDefinition
 
 class LocustChange(google___protobuf___message___Message):
@@ -84,6 +87,9 @@ class LocustChange(google___protobuf___message___Message):
     line: builtin___int = ...
     changed_lines: builtin___int = ...
     total_lines: builtin___int = ...
+    classification: typing___Text = ...
+    status: typing___Text = ...
+    previous_filepath: typing___Text = ...
 
     @property
     def parent(self) -> type___DefinitionParent: ...
@@ -98,11 +104,54 @@ class LocustChange(google___protobuf___message___Message):
         changed_lines : typing___Optional[builtin___int] = None,
         total_lines : typing___Optional[builtin___int] = None,
         parent : typing___Optional[type___DefinitionParent] = None,
+        classification : typing___Optional[typing___Text] = None,
+        status : typing___Optional[typing___Text] = None,
+        previous_filepath : typing___Optional[typing___Text] = None,
         ) -> None: ...
     def HasField(self, field_name: typing_extensions___Literal[u"parent",b"parent"]) -> builtin___bool: ...
-    def ClearField(self, field_name: typing_extensions___Literal[u"change_type",b"change_type",u"changed_lines",b"changed_lines",u"filepath",b"filepath",u"line",b"line",u"name",b"name",u"parent",b"parent",u"revision",b"revision",u"total_lines",b"total_lines"]) -> None: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"change_type",b"change_type",u"changed_lines",b"changed_lines",u"classification",b"classification",u"filepath",b"filepath",u"line",b"line",u"name",b"name",u"parent",b"parent",u"previous_filepath",b"previous_filepath",u"revision",b"revision",u"status",b"status",u"total_lines",b"total_lines"]) -> None: ...
 type___LocustChange = LocustChange
 
+class Cost(google___protobuf___message___Message):
+    DESCRIPTOR: google___protobuf___descriptor___Descriptor = ...
+    name: typing___Text = ...
+    wall_time: builtin___float = ...
+    cpu_time: builtin___float = ...
+    allocated_bytes: builtin___int = ...
+    calls: builtin___int = ...
+
+    def __init__(self,
+        *,
+        name : typing___Optional[typing___Text] = None,
+        wall_time : typing___Optional[builtin___float] = None,
+        cpu_time : typing___Optional[builtin___float] = None,
+        allocated_bytes : typing___Optional[builtin___int] = None,
+        calls : typing___Optional[builtin___int] = None,
+        ) -> None: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"allocated_bytes",b"allocated_bytes",u"calls",b"calls",u"cpu_time",b"cpu_time",u"name",b"name",u"wall_time",b"wall_time"]) -> None: ...
+type___Cost = Cost
+
+class RunStats(google___protobuf___message___Message):
+    DESCRIPTOR: google___protobuf___descriptor___Descriptor = ...
+
+    @property
+    def stages(self) -> google___protobuf___internal___containers___RepeatedCompositeFieldContainer[type___Cost]: ...
+
+    @property
+    def files(self) -> google___protobuf___internal___containers___RepeatedCompositeFieldContainer[type___Cost]: ...
+
+    @property
+    def plugins(self) -> google___protobuf___internal___containers___RepeatedCompositeFieldContainer[type___Cost]: ...
+
+    def __init__(self,
+        *,
+        stages : typing___Optional[typing___Iterable[type___Cost]] = None,
+        files : typing___Optional[typing___Iterable[type___Cost]] = None,
+        plugins : typing___Optional[typing___Iterable[type___Cost]] = None,
+        ) -> None: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"files",b"files",u"plugins",b"plugins",u"stages",b"stages"]) -> None: ...
+type___RunStats = RunStats
+
 class ParseResult(google___protobuf___message___Message):
     DESCRIPTOR: google___protobuf___descriptor___Descriptor = ...
     repo: typing___Text = ...
@@ -115,6 +164,12 @@ class ParseResult(google___protobuf___message___Message):
     @property
     def changes(self) -> google___protobuf___internal___containers___RepeatedCompositeFieldContainer[type___LocustChange]: ...
 
+    @property
+    def shard(self) -> git_pb2___Shard: ...
+
+    @property
+    def stats(self) -> type___RunStats: ...
+
     def __init__(self,
         *,
         repo : typing___Optional[typing___Text] = None,
@@ -122,6 +177,9 @@ class ParseResult(google___protobuf___message___Message):
         terminal_ref : typing___Optional[typing___Text] = None,
         patches : typing___Optional[typing___Iterable[git_pb2___PatchInfo]] = None,
         changes : typing___Optional[typing___Iterable[type___LocustChange]] = None,
+        shard : typing___Optional[git_pb2___Shard] = None,
+        stats : typing___Optional[type___RunStats] = None,
         ) -> None: ...
-    def ClearField(self, field_name: typing_extensions___Literal[u"changes",b"changes",u"initial_ref",b"initial_ref",u"patches",b"patches",u"repo",b"repo",u"terminal_ref",b"terminal_ref"]) -> None: ...
+    def HasField(self, field_name: typing_extensions___Literal[u"shard",b"shard",u"stats",b"stats"]) -> builtin___bool: ...
+    def ClearField(self, field_name: typing_extensions___Literal[u"changes",b"changes",u"initial_ref",b"initial_ref",u"patches",b"patches",u"repo",b"repo",u"shard",b"shard",u"stats",b"stats",u"terminal_ref",b"terminal_ref"]) -> None: ...
 type___ParseResult = ParseResult
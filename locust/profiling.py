@@ -0,0 +1,251 @@
+"""
+Opt-in measurement of the wall time, CPU time and memory that a locust run spends on each of its
+stages, files and plugins
+"""
+import argparse
+import contextlib
+import contextvars
+from dataclasses import dataclass
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+from .parse_pb2 import Cost, RunStats
+
+# Stages of a locust run, in the order in which they happen.
+OPEN = "open"
+DIFF = "diff"
+BLOBS = "blobs"
+AST_PARSE = "ast.parse"
+VISITOR = "visitor"
+CHANGES = "changes"
+PLUGINS = "plugins"
+RENDER = "render"
+
+DEFAULT_TOP_FILES = 10
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the arguments which enable profiling.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Measure the wall time, CPU time and allocated memory of each stage, file and plugin, "
+            "record them in the stats of the result and print the slowest files to stderr (memory "
+            "tracing slows the run down)"
+        ),
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP_FILES,
+        help=f"Number of slowest files to print with --profile (default: {DEFAULT_TOP_FILES})",
+    )
+
+
+def cpu_time() -> float:
+    """
+    Returns the CPU time used by this process and by the child processes it has waited for.
+    """
+    children = os.times()
+    return time.process_time() + children.children_user + children.children_system
+
+
+@dataclass
+class Measurement:
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    allocated_bytes: int = 0
+    calls: int = 0
+
+    def cost(self, name: str) -> Cost:
+        return Cost(
+            name=name,
+            wall_time=self.wall_time,
+            cpu_time=self.cpu_time,
+            allocated_bytes=self.allocated_bytes,
+            calls=self.calls,
+        )
+
+
+class Profiler:
+    """
+    Accumulates measurements by stage, by file and by plugin.
+
+    Memory is only measured while tracemalloc is tracing. Measurements of the same stage do not
+    overlap, but a file (or plugin) accumulates the measurements of every stage which worked on it.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Measurement] = {}
+        self.files: Dict[str, Measurement] = {}
+        self.plugins: Dict[str, Measurement] = {}
+        # Peak traced memory seen so far by each of the measurements in progress (innermost last).
+        self.peaks: List[int] = []
+
+    @contextlib.contextmanager
+    def measure(
+        self, stage: str, filepath: Optional[str] = None, plugin: Optional[str] = None
+    ) -> Iterator[None]:
+        tracing = tracemalloc.is_tracing()
+        start_memory = 0
+        if tracing:
+            start_memory, peak = tracemalloc.get_traced_memory()
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], peak)
+            if sys.version_info >= (3, 9):
+                tracemalloc.reset_peak()
+        self.peaks.append(start_memory)
+        start_wall = time.perf_counter()
+        start_cpu = cpu_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            elapsed_cpu = cpu_time() - start_cpu
+            peak = self.peaks.pop()
+            if tracing:
+                current_memory, traced_peak = tracemalloc.get_traced_memory()
+                # Before Python 3.9, the peak cannot be reset, so only the growth in memory is seen.
+                if sys.version_info < (3, 9):
+                    traced_peak = current_memory
+                peak = max(peak, traced_peak)
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+            allocated_bytes = max(peak - start_memory, 0)
+
+            for key, measurements in [
+                (stage, self.stages),
+                (filepath, self.files),
+                (plugin, self.plugins),
+            ]:
+                if key is None:
+                    continue
+                measurement = measurements.setdefault(key, Measurement())
+                measurement.wall_time += wall_time
+                measurement.cpu_time += elapsed_cpu
+                measurement.allocated_bytes = max(
+                    measurement.allocated_bytes, allocated_bytes
+                )
+                measurement.calls += 1
+
+    def stats(self) -> RunStats:
+        return RunStats(
+            stages=[
+                measurement.cost(name) for name, measurement in self.stages.items()
+            ],
+            files=[measurement.cost(name) for name, measurement in self.files.items()],
+            plugins=[
+                measurement.cost(name) for name, measurement in self.plugins.items()
+            ],
+        )
+
+
+active_profiler: "contextvars.ContextVar[Optional[Profiler]]" = contextvars.ContextVar(
+    "locust_profiler", default=None
+)
+
+NOT_MEASURED = contextlib.nullcontext()
+
+
+def measure(
+    stage: str, filepath: Optional[str] = None, plugin: Optional[str] = None
+) -> ContextManager[None]:
+    """
+    Measures the enclosed code as part of the given stage (and file, and plugin) if profiling is
+    enabled. Otherwise, does nothing - this is cheap enough to leave in hot paths.
+    """
+    profiler = active_profiler.get()
+    if profiler is None:
+        return NOT_MEASURED
+    return profiler.measure(stage, filepath, plugin)
+
+
+@contextlib.contextmanager
+def profiling(trace_memory: bool = True) -> Iterator[Profiler]:
+    """
+    Enables profiling for the enclosed code, and provides the profiler which collects the
+    measurements. If trace_memory is True, tracemalloc traces allocations while the profiler is
+    active (which slows Python code down noticeably).
+    """
+    profiler = Profiler()
+    token = active_profiler.set(profiler)
+    started_tracing = False
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    try:
+        yield profiler
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        active_profiler.reset(token)
+
+
+def stats_dict(stats: RunStats) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Returns the given stats as a dictionary which can be serialized as JSON. (MessageToDict would
+    serialize the 64-bit allocated_bytes fields as strings.)
+    """
+
+    def cost_dict(cost: Cost) -> Dict[str, Any]:
+        return {
+            "name": cost.name,
+            "wall_time": cost.wall_time,
+            "cpu_time": cost.cpu_time,
+            "allocated_bytes": cost.allocated_bytes,
+            "calls": cost.calls,
+        }
+
+    return {
+        "stages": [cost_dict(cost) for cost in stats.stages],
+        "files": [cost_dict(cost) for cost in stats.files],
+        "plugins": [cost_dict(cost) for cost in stats.plugins],
+    }
+
+
+def format_bytes(num_bytes: int) -> str:
+    if num_bytes < 1024:
+        return f"{num_bytes} B"
+    size = num_bytes / 1024
+    for unit in ["KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def format_costs(title: str, costs: List[Cost]) -> List[str]:
+    name_width = max([len(title)] + [len(cost.name) for cost in costs])
+    lines = [
+        f"{title:<{name_width}}  {'wall (s)':>9}  {'cpu (s)':>9}  {'allocated':>11}  {'calls':>6}"
+    ]
+    for cost in costs:
+        lines.append(
+            f"{cost.name:<{name_width}}  {cost.wall_time:>9.3f}  {cost.cpu_time:>9.3f}  "
+            f"{format_bytes(cost.allocated_bytes):>11}  {cost.calls:>6}"
+        )
+    return lines
+
+
+def format_stats(stats: RunStats, top: int = DEFAULT_TOP_FILES) -> str:
+    """
+    Formats the given stats as tables of the costs of each stage and plugin, and of the top files
+    by wall time.
+    """
+    lines = format_costs("stage", list(stats.stages))
+    if stats.plugins:
+        lines.append("")
+        lines.extend(format_costs("plugin", list(stats.plugins)))
+    slowest_files = sorted(stats.files, key=lambda cost: cost.wall_time, reverse=True)
+    if slowest_files and top > 0:
+        lines.append("")
+        lines.extend(format_costs(f"slowest files (top {top})", slowest_files[:top]))
+    return "\n".join(lines)
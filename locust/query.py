@@ -0,0 +1,64 @@
+"""
+Answers questions about the history of a repository from its locust index (see locust.index)
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+from . import git
+from . import index
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust query",
+        description=(
+            "Locust: Query the index built by locust index. Names may be given as locust reports them "
+            "(e.g. Foo.bar) or qualified with their module (e.g. package.module.Foo.bar)."
+        ),
+    )
+    index.populate_argument_parser(parser)
+    subparsers = parser.add_subparsers(dest="query", required=True)
+    commits_parser = subparsers.add_parser(
+        "commits", help="List the commits which changed a definition"
+    )
+    commits_parser.add_argument("name", help="Name of the definition")
+    definition_parser = subparsers.add_parser(
+        "definition", help="Find where a name was defined at a given revision"
+    )
+    definition_parser.add_argument("name", help="Name of the definition")
+    definition_parser.add_argument(
+        "--at", default="HEAD", help="Revision at which to look (default: HEAD)"
+    )
+    args = parser.parse_args(argv)
+
+    repository = git.get_repository(args.repo)
+    index_path = args.index
+    if index_path is None:
+        index_path = index.default_index_path(repository)
+    if not os.path.exists(index_path):
+        print(
+            f"No index at {index_path} - build one with: locust index", file=sys.stderr
+        )
+        sys.exit(1)
+
+    connection = index.connect(index_path)
+    try:
+        if args.query == "commits":
+            results = index.commits_touching(connection, args.name)
+        else:
+            results = index.definitions_at(connection, repository, args.at, args.name)
+    finally:
+        connection.close()
+
+    try:
+        for result in results:
+            print(json.dumps(result))
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
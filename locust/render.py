@@ -3,18 +3,19 @@ Rendering utilities for locust parse results.
 """
 import argparse
 import copy
+import heapq
 import json
 import os
 import sys
 import textwrap
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from google.protobuf.json_format import Parse
-import lxml
-from lxml.html import builder as E
-import yaml
+# Third-party dependencies used only for specific output formats (lxml for HTML, yaml for YAML) are
+# imported by the functions which use them. This keeps locust startup fast.
 
 from . import parse
+from . import profiling
+from . import tracing
 from .render_pb2 import IndexKey, NestedChange
 
 SerializedIndexKey = Tuple[str, Optional[str], str, int]
@@ -108,6 +109,43 @@ def nest_results(
     return results
 
 
+def select_significant_changes(
+    nested_results: Dict[str, List[NestedChange]], max_changes: int
+) -> Tuple[Dict[str, List[NestedChange]], Dict[str, int]]:
+    """
+    Selects the max_changes most significant top-level changes (by number of changed lines) across
+    all files using a heap. Selected changes keep their original order within each file.
+
+    Returns a tuple of the form:
+    (selected nested results, number of omitted top-level changes per file)
+    """
+    candidates = [
+        (filepath, index, nested_change.change.changed_lines)
+        for filepath, nested_changes in nested_results.items()
+        for index, nested_change in enumerate(nested_changes)
+    ]
+    selected = {
+        (filepath, index)
+        for filepath, index, _ in heapq.nlargest(
+            max_changes, candidates, key=lambda candidate: candidate[2]
+        )
+    }
+
+    selected_results: Dict[str, List[NestedChange]] = {}
+    omitted: Dict[str, int] = {}
+    for filepath, nested_changes in nested_results.items():
+        selected_results[filepath] = [
+            nested_change
+            for index, nested_change in enumerate(nested_changes)
+            if (filepath, index) in selected
+        ]
+        num_omitted = len(nested_changes) - len(selected_results[filepath])
+        if num_omitted:
+            omitted[filepath] = num_omitted
+
+    return selected_results, omitted
+
+
 def nested_change_to_dict(nested_change: NestedChange) -> Dict[str, Any]:
     result = {
         "name": nested_change.change.name,
@@ -116,6 +154,12 @@ def nested_change_to_dict(nested_change: NestedChange) -> Dict[str, Any]:
         "changed_lines": nested_change.change.changed_lines,
         "total_lines": nested_change.change.total_lines,
     }
+    if nested_change.change.classification:
+        result["classification"] = nested_change.change.classification
+    if nested_change.change.status:
+        result["status"] = nested_change.change.status
+    if nested_change.change.previous_filepath:
+        result["previous_filepath"] = nested_change.change.previous_filepath
 
     children_list: List[Dict[str, Any]] = []
     if nested_change.children:
@@ -128,8 +172,11 @@ def nested_change_to_dict(nested_change: NestedChange) -> Dict[str, Any]:
     return result
 
 
-def results_dict(raw_results: Dict[str, List[NestedChange]]) -> Dict[str, Any]:
-    results = {
+def results_dict(
+    raw_results: Dict[str, List[NestedChange]],
+    omitted: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
         "locust": [
             {
                 "file": filepath,
@@ -142,6 +189,11 @@ def results_dict(raw_results: Dict[str, List[NestedChange]]) -> Dict[str, Any]:
         ]
     }
 
+    if omitted:
+        for item in results["locust"]:
+            if omitted.get(item["file"]):
+                item["omitted"] = omitted[item["file"]]
+
     return results
 
 
@@ -150,6 +202,8 @@ def render_json(results: Dict[str, Any]) -> str:
 
 
 def render_yaml(results: Dict[str, Any]) -> str:
+    import yaml
+
     return yaml.dump(results, sort_keys=False)
 
 
@@ -159,6 +213,8 @@ def change_representation_full(
     """
     Generator of uncompressed html markdown.
     """
+    from lxml.html import builder as E
+
     change_elements: List[Any] = [
         E.B("Name: "),
         E.A(change["name"], href=link),
@@ -175,6 +231,19 @@ def change_representation_full(
             [E.BR(), E.B("Total lines: "), E.SPAN(str(change["total_lines"]))]
         )
 
+    if change.get("previous_filepath"):
+        change_elements.extend(
+            [
+                E.BR(),
+                E.B("Moved from: "),
+                E.SPAN(change["previous_filepath"]),
+            ]
+        )
+        if change.get("status") == parse.MOVED_MODIFIED:
+            change_elements.append(E.SPAN(" (modified)"))
+    elif change.get("status"):
+        change_elements.extend([E.BR(), E.B("Status: "), E.SPAN(change["status"])])
+
     if change["children"]:
         change_elements.extend([E.BR(), E.B("Changes:")])
     child_elements = []
@@ -195,6 +264,8 @@ def change_representation_compressed(
     """
     Generator of compressed html markdown.
     """
+    from lxml.html import builder as E
+
     change_elements: List[Any] = [
         E.B(change["type"]),
         E.SPAN(" "),
@@ -206,6 +277,13 @@ def change_representation_compressed(
     if change["total_lines"]:
         change_elements.extend([E.SPAN("/"), E.SPAN(str(change["total_lines"]))])
 
+    if change.get("previous_filepath"):
+        change_elements.extend(
+            [E.B(f" {change['status']} from: "), E.SPAN(change["previous_filepath"])]
+        )
+    elif change.get("status") == parse.REMOVED:
+        change_elements.append(E.B(" removed"))
+
     if change["children"]:
         change_elements.extend([E.BR()])
     child_elements = []
@@ -230,6 +308,8 @@ def render_change_as_html(
     """
     Returns nested part of report in compressed or uncompressed format.
     """
+    from lxml.html import builder as E
+
     if current_depth >= max_depth:
         return None
 
@@ -249,12 +329,26 @@ def render_change_as_html(
     return E.LI(*change_elements)
 
 
+def omitted_changes_element(num_omitted: int) -> Any:
+    """
+    Placeholder for changes which were left out of a report because of a size budget.
+    """
+    from lxml.html import builder as E
+
+    noun = "change" if num_omitted == 1 else "changes"
+    return E.LI(E.I(f"and {num_omitted} more {noun}"))
+
+
 def html_file_section_handler_vanilla(item: Dict[str, Any]) -> Any:
+    from lxml.html import builder as E
+
     filepath = item["file"]
     file_url = item.get("file_url", filepath)
     change_elements = [
         render_change_as_html(change, filepath, 0, 2) for change in item["changes"]
     ]
+    if item.get("omitted"):
+        change_elements.append(omitted_changes_element(item["omitted"]))
     file_elements = [
         E.H4(E.A(filepath, href=file_url)),
         E.B("Changes:"),
@@ -275,12 +369,17 @@ def generate_html_section_handler_github(
     """
 
     def html_file_section_handler_github(item: Dict[str, Any]) -> Any:
+        import lxml.html
+        from lxml.html import builder as E
+
         filepath = item["file"]
         file_url = item.get("file_url", filepath)
         change_elements = [
             render_change(change, filepath, 0, 2, compressed)
             for change in item["changes"]
         ]
+        if item.get("omitted"):
+            change_elements.append(omitted_changes_element(item["omitted"]))
         file_summary_element = E.A(filepath, href=file_url)
         file_elements = [
             E.B("Changes:"),
@@ -299,10 +398,130 @@ def generate_html_section_handler_github(
     return html_file_section_handler_github
 
 
+def html_size(element: Any) -> int:
+    """
+    Number of bytes taken up by the given element in a rendered HTML report.
+    """
+    import lxml.html
+
+    return len(lxml.html.tostring(element))
+
+
+def omitted_files_element(num_omitted: int, num_files: int) -> Any:
+    """
+    Footer for files all of whose changes were left out of a report because of a size budget.
+    """
+    from lxml.html import builder as E
+
+    change_noun = "change" if num_omitted == 1 else "changes"
+    file_noun = "file" if num_files == 1 else "files"
+    return E.P(
+        E.I(f"and {num_omitted} more {change_noun} in {num_files} other {file_noun}")
+    )
+
+
+def budgeted_sections(
+    file_section_handler: Callable[[Dict[str, Any]], Any],
+    changes_by_file: List[Dict[str, Any]],
+    max_bytes: int,
+) -> List[Any]:
+    """
+    Builds the file sections of an HTML report so that they take up at most max_bytes bytes.
+
+    Top-level changes are admitted from a heap in order of their number of changed lines. The first
+    change which does not fit into the budget stops the admission - none of the remaining changes
+    are ever rendered. Changes which were not admitted are folded into per-file "and N more"
+    counters, and files none of whose changes were admitted are summarized in a single footer.
+    """
+
+    def total_changes(item: Dict[str, Any]) -> int:
+        return len(item["changes"]) + item.get("omitted", 0)
+
+    def section(item_index: int, change_indices: List[int]) -> Dict[str, Any]:
+        item = changes_by_file[item_index]
+        budgeted_item = {key: value for key, value in item.items() if key != "changes"}
+        budgeted_item["changes"] = [item["changes"][i] for i in sorted(change_indices)]
+        budgeted_item["omitted"] = total_changes(item) - len(change_indices)
+        return budgeted_item
+
+    def assemble(admitted: Dict[int, List[int]]) -> List[Any]:
+        elements = [
+            file_section_handler(section(item_index, admitted[item_index]))
+            for item_index in sorted(admitted)
+        ]
+        omitted_items = [
+            item
+            for item_index, item in enumerate(changes_by_file)
+            if item_index not in admitted and total_changes(item)
+        ]
+        if omitted_items:
+            elements.append(
+                omitted_files_element(
+                    sum(total_changes(item) for item in omitted_items),
+                    len(omitted_items),
+                )
+            )
+        return elements
+
+    # The footer is sized for the worst case, in which no changes make it into the report.
+    num_changes = sum(total_changes(item) for item in changes_by_file)
+    used_bytes = 0
+    if num_changes:
+        used_bytes = html_size(omitted_files_element(num_changes, len(changes_by_file)))
+    if used_bytes > max_bytes:
+        raise ValueError(f"Budget of {max_bytes} bytes is too small for this report")
+
+    heap = [
+        (-change["changed_lines"], item_index, change_index)
+        for item_index, item in enumerate(changes_by_file)
+        for change_index, change in enumerate(item["changes"])
+    ]
+    heapq.heapify(heap)
+
+    admitted: Dict[int, List[int]] = {}
+    admission_order: List[Tuple[int, int]] = []
+    # Bytes taken up by the section for each file when it contains no changes (other than the
+    # "and N more" counter, sized for the worst case).
+    base_sizes: Dict[int, int] = {}
+    while heap:
+        _, item_index, change_index = heap[0]
+        additional_bytes = 0
+        if item_index not in base_sizes:
+            base_sizes[item_index] = html_size(
+                file_section_handler(section(item_index, []))
+            )
+            additional_bytes += base_sizes[item_index]
+        additional_bytes += (
+            html_size(file_section_handler(section(item_index, [change_index])))
+            - base_sizes[item_index]
+        )
+        if used_bytes + additional_bytes > max_bytes:
+            break
+        heapq.heappop(heap)
+        used_bytes += additional_bytes
+        admitted.setdefault(item_index, []).append(change_index)
+        admission_order.append((item_index, change_index))
+
+    # Section sizes are not strictly additive in their changes, so we verify the assembled report
+    # and give back the least significant changes until it fits.
+    elements = assemble(admitted)
+    while admission_order and sum(html_size(e) for e in elements) > max_bytes:
+        item_index, change_index = admission_order.pop()
+        admitted[item_index].remove(change_index)
+        if not admitted[item_index]:
+            del admitted[item_index]
+        elements = assemble(admitted)
+
+    return elements
+
+
 def generate_render_html(
     file_section_handler: Callable[[Dict[str, Any]], Any]
-) -> Callable[[Dict[str, Any]], str]:
-    def render_html(results: Dict[str, Any]) -> str:
+) -> Callable[..., str]:
+    def render_html(results: Dict[str, Any], max_bytes: Optional[int] = None) -> str:
+        import lxml.html
+        from lxml.html import builder as E
+
         heading = E.H2(
             E.A("Locust", href="https://github.com/simiotics/locust"), " summary"
         )
@@ -320,9 +539,17 @@ def generate_render_html(
         body_elements.append(E.HR())
 
         changes_by_file = results["locust"]
-        for item in changes_by_file:
-            item_element = file_section_handler(item)
-            body_elements.append(item_element)
+        if max_bytes is None:
+            for item in changes_by_file:
+                item_element = file_section_handler(item)
+                body_elements.append(item_element)
+        else:
+            document_bytes = html_size(E.HTML(E.BODY(*body_elements)))
+            body_elements.extend(
+                budgeted_sections(
+                    file_section_handler, changes_by_file, max_bytes - document_bytes
+                )
+            )
 
         html = E.HTML(E.BODY(*body_elements))
         results_string = lxml.html.tostring(html).decode()
@@ -342,6 +569,12 @@ def enrich_with_refs(
     return enriched_results
 
 
+def enrich_with_stats(results: Dict[str, Any], stats: parse.RunStats) -> Dict[str, Any]:
+    enriched_results = copy.deepcopy(results)
+    enriched_results["stats"] = profiling.stats_dict(stats)
+    return enriched_results
+
+
 def enrich_with_metadata(
     results: Dict[str, Any], metadata: Dict[str, Any]
 ) -> Dict[str, Any]:
@@ -383,9 +616,7 @@ def enrich_with_github_links(
     return enriched_results
 
 
-renderers: Dict[str, Callable[[Dict[str, List[NestedChange]]], str]] = {
-    "json": render_json,
-    "yaml": render_yaml,
+html_renderers: Dict[str, Callable[..., str]] = {
     "html": generate_render_html(html_file_section_handler_vanilla),
     # html-github kept for for backwards compatibility
     "html-github": generate_render_html(
@@ -399,6 +630,12 @@ renderers: Dict[str, Callable[[Dict[str, List[NestedChange]]], str]] = {
     ),
 }
 
+renderers: Dict[str, Callable[..., str]] = {
+    "json": render_json,
+    "yaml": render_yaml,
+    **html_renderers,
+}
+
 
 def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
     """
@@ -429,6 +666,41 @@ def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
         default=None,
         help="JSON object specifying additional metadata for Locust summary",
     )
+    parser.add_argument(
+        "--max-changes",
+        type=int,
+        default=None,
+        help=(
+            "[Optional] Maximum number of top-level changes to report - the changes with the most "
+            "changed lines are kept"
+        ),
+    )
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=None,
+        help=(
+            "[Optional] Maximum size (in bytes) of the rendered summary - only supported for HTML "
+            f"formats ({', '.join(html_renderers)})"
+        ),
+    )
+    parser.add_argument(
+        "--drop-cosmetic",
+        action="store_true",
+        help="Leave out changes which are classified as cosmetic (e.g. pure reformatting)",
+    )
+
+
+def validate_arguments(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    """
+    Exits with a usage error if a size budget is requested for a format which cannot honor it.
+    """
+    if args.max_bytes is not None and args.format not in html_renderers:
+        parser.error(
+            f"--max-bytes is only supported for HTML formats ({', '.join(html_renderers)})"
+        )
 
 
 def run(
@@ -436,13 +708,34 @@ def run(
     render_format: str,
     github_url: Optional[str],
     additional_metadata: Optional[Dict[str, Any]] = None,
+    max_changes: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    drop_cosmetic: bool = False,
 ) -> str:
-    changes = parse_result.changes
+    if max_bytes is not None and render_format not in html_renderers:
+        raise ValueError(
+            f"Size budgets are only supported for HTML formats ({', '.join(html_renderers)})"
+        )
+
+    changes: Iterable[parse.LocustChange] = parse_result.changes
+    if drop_cosmetic:
+        # A definition is only cosmetically changed if everything nested in it is too, so this
+        # never leaves out the parent of a change which is kept.
+        changes = [
+            change for change in changes if change.classification != parse.COSMETIC
+        ]
     nested_results = nest_results(changes)
-    results = results_dict(nested_results)
+    omitted: Optional[Dict[str, int]] = None
+    if max_changes is not None:
+        nested_results, omitted = select_significant_changes(
+            nested_results, max_changes
+        )
+    results = results_dict(nested_results, omitted)
     results = enrich_with_refs(
         results, parse_result.initial_ref, parse_result.terminal_ref
     )
+    if parse_result.HasField("stats"):
+        results = enrich_with_stats(results, parse_result.stats)
     if additional_metadata is not None:
         results = enrich_with_metadata(results, additional_metadata)
     if github_url is not None and parse_result.terminal_ref is not None:
@@ -450,11 +743,17 @@ def run(
             results, github_url, parse_result.terminal_ref
         )
     renderer = renderers[render_format]
-    results_string = renderer(results)
+    with profiling.measure(profiling.RENDER), tracing.span(
+        f"render {render_format}", "render"
+    ):
+        if max_bytes is not None:
+            results_string = renderer(results, max_bytes=max_bytes)
+        else:
+            results_string = renderer(results)
     return results_string
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="Locust: rendering functionality")
     populate_argument_parser(parser)
     parser.add_argument(
@@ -472,12 +771,26 @@ def main():
         help="Path to write summary to",
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    validate_arguments(parser, args)
+
+    from google.protobuf.json_format import Parse
 
     with args.input as ifp:
         parse_result = Parse(ifp.read(), parse.ParseResult())
 
-    summary = run(parse_result, args.format, args.github, args.metadata)
+    try:
+        summary = run(
+            parse_result,
+            args.format,
+            args.github,
+            args.metadata,
+            args.max_changes,
+            args.max_bytes,
+            args.drop_cosmetic,
+        )
+    except ValueError as e:
+        parser.error(str(e))
 
     try:
         with args.output as ofp:
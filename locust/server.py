@@ -0,0 +1,393 @@
+"""
+Long-running locust analysis server, which keeps repositories and caches warm between requests
+"""
+import argparse
+from contextlib import contextmanager
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import socketserver
+import stat
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Type, TYPE_CHECKING
+
+from . import git
+from . import parse
+from . import render
+from .cache import LRUCache
+
+if TYPE_CHECKING:
+    import pygit2
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7853
+DEFAULT_CACHE_SIZE = 10000
+
+# Environment variable from which the server reads the token that clients must present (unless
+# --token-file is given).
+TOKEN_ENV_VAR = "LOCUST_SERVER_TOKEN"
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "yaml": "application/x-yaml",
+}
+
+
+class InvalidRequest(Exception):
+    """
+    Raised when a request to the locust server does not specify a valid analysis.
+    """
+
+
+class RepositoryPool:
+    """
+    Keeps open repository handles for every repository the server has analyzed. Each handle is lent
+    out to at most one request at a time, and new handles are only opened when all the handles for
+    a repository are in use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List["pygit2.Repository"]] = {}
+
+    @contextmanager
+    def repository(self, repo_dir: str) -> Iterator["pygit2.Repository"]:
+        key = os.path.realpath(repo_dir)
+        handle: Optional["pygit2.Repository"] = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                handle = idle.pop()
+        if handle is None:
+            handle = git.get_repository(key)
+
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                self._idle.setdefault(key, []).append(handle)
+
+
+class Analyzer:
+    """
+    Runs locust analyses against warm repository handles, sharing caches of blob sources and
+    definitions between all requests.
+
+    Plugins are shell commands, so they are fixed when the analyzer is created. Requests may only
+    choose their own plugins if allow_request_plugins is True, which is only safe when requests come
+    from a trusted source (e.g. a local batch manifest) - never for requests from the network.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        plugins: Optional[List[str]] = None,
+        allow_request_plugins: bool = False,
+    ):
+        self.plugins = plugins or []
+        self.allow_request_plugins = allow_request_plugins
+        self.repositories = RepositoryPool()
+        self.sources: git.SourceCache = LRUCache(cache_size)
+        self.definitions: parse.DefinitionsCache = LRUCache(cache_size)
+
+    def analyze(self, request: Dict[str, Any]) -> str:
+        """
+        Runs the analysis specified by the given request and returns the rendered result.
+
+        Requests are JSON objects of the form:
+        {
+            "repo": <path to repository (required)>,
+            "initial": <initial revision>,
+            "terminal": <terminal revision>,
+            "format": <render format (default: json)>,
+            "plugins": <list of plugin invocations (only if allow_request_plugins is True)>,
+            "github": <GitHub repository URL>,
+            "metadata": <additional metadata>,
+            "max_changes": <maximum number of top-level changes>,
+            "max_bytes": <maximum size of the summary>,
+            "ignore_docstrings": <classify docstring-only changes as cosmetic>,
+            "drop_cosmetic": <leave out cosmetic changes>
+        }
+        """
+        if not isinstance(request, dict) or not isinstance(request.get("repo"), str):
+            raise InvalidRequest('Request must be a JSON object with a "repo" string')
+        render_format = request.get("format", "json")
+        if render_format not in render.renderers:
+            raise InvalidRequest(
+                f"Invalid format: {render_format}. Choices: {', '.join(render.renderers)}"
+            )
+        plugins = self.plugins
+        if request.get("plugins"):
+            if not self.allow_request_plugins:
+                raise InvalidRequest(
+                    "Requests cannot specify plugins - they are configured when the server starts"
+                )
+            plugins = request["plugins"]
+
+        with self.repositories.repository(request["repo"]) as repository:
+            git_result = git.run_on_repository(
+                repository,
+                request.get("initial"),
+                request.get("terminal"),
+                self.sources,
+            )
+        parse_result = parse.run(
+            git_result,
+            plugins,
+            self.definitions,
+            bool(request.get("ignore_docstrings", False)),
+        )
+        return render.run(
+            parse_result,
+            render_format,
+            request.get("github"),
+            request.get("metadata"),
+            request.get("max_changes"),
+            request.get("max_bytes"),
+            bool(request.get("drop_cosmetic", False)),
+        )
+
+
+def warm_up() -> None:
+    """
+    Imports the dependencies which locust only imports lazily, so that the first request does not
+    pay for them.
+    """
+    import google.protobuf.json_format
+    import lxml.html
+    import pygit2
+    import yaml
+
+
+def generate_request_handler(
+    analyzer: Analyzer, token: str, verbose: bool = False
+) -> Type[BaseHTTPRequestHandler]:
+    """
+    Generates a handler for analysis requests. Analysis requests must be JSON (with a Content-Type of
+    application/json) and present the given token in an Authorization: Bearer header.
+    """
+    if not token:
+        raise ValueError("The locust server requires a token")
+
+    class AnalysisRequestHandler(BaseHTTPRequestHandler):
+        # Keep-alive connections spare clients a handshake per query.
+        protocol_version = "HTTP/1.1"
+
+        def respond(
+            self, status: int, body: str, content_type: str, close: bool = False
+        ) -> None:
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            if close:
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+            self.wfile.write(data)
+
+        def respond_error(self, status: int, message: str) -> None:
+            self.respond(status, json.dumps({"error": message}), "application/json")
+
+        def reject(self, status: int, message: str) -> None:
+            """
+            Responds with an error without reading the body of the request, and closes the
+            connection (the unread body cannot be mistaken for the next request).
+            """
+            self.respond(
+                status, json.dumps({"error": message}), "application/json", close=True
+            )
+
+        def do_GET(self):
+            if self.path != "/health":
+                self.respond_error(404, f"Unknown path: {self.path}")
+                return
+            self.respond(200, json.dumps({"status": "ok"}), "application/json")
+
+        def do_POST(self):
+            if self.path != "/analyze":
+                self.reject(404, f"Unknown path: {self.path}")
+                return
+
+            authorization = self.headers.get("Authorization", "")
+            if not hmac.compare_digest(
+                authorization.encode(), f"Bearer {token}".encode()
+            ):
+                self.reject(401, "Missing or invalid token")
+                return
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.split(";")[0].strip().lower() != "application/json":
+                self.reject(415, "Requests must have Content-Type application/json")
+                return
+
+            content_length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(content_length))
+                result = analyzer.analyze(request)
+            except (InvalidRequest, ValueError, git.GitRepositoryNotFound) as e:
+                self.respond_error(400, str(e))
+                return
+            except KeyError as e:
+                self.respond_error(400, f"Unknown revision: {str(e)}")
+                return
+            except Exception as e:
+                self.respond_error(500, repr(e))
+                return
+
+            render_format = request.get("format", "json")
+            self.respond(200, result, CONTENT_TYPES.get(render_format, "text/html"))
+
+        def address_string(self) -> str:
+            # Clients connected over Unix sockets have no address.
+            if isinstance(self.client_address, tuple):
+                return str(self.client_address[0])
+            return "unix"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            if verbose:
+                super().log_message(format, *args)
+
+    return AnalysisRequestHandler
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """
+    Removes the Unix socket which a previous run left at the given path, if there is one, so that a
+    new socket can be bound there. Raises a ValueError (instead of removing it) if there is anything
+    other than a socket at the path.
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"Refusing to replace {socket_path}, which is not a socket")
+    os.remove(socket_path)
+
+
+def create_server(
+    analyzer: Analyzer,
+    token: str,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+    verbose: bool = False,
+) -> socketserver.BaseServer:
+    """
+    Creates (but does not start) a server which handles each request on its own thread. If
+    socket_path is provided, the server listens on a Unix socket at that path. Otherwise, it
+    listens on the given host and port (see remove_stale_socket). Clients must present the given
+    token (see generate_request_handler).
+    """
+    handler = generate_request_handler(analyzer, token, verbose)
+    if socket_path is not None:
+        remove_stale_socket(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the commonly used arguments for this module.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST, help="Host on which to listen for requests"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="Port on which to listen for requests",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Path to a Unix socket on which to listen for requests (instead of host and port)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Number of blob sources (and, separately, of blob definitions) to keep cached",
+    )
+    parser.add_argument(
+        "--plugins",
+        nargs="*",
+        default=None,
+        help="List of commands which invoke Locust plugins (used for every request)",
+    )
+    parser.add_argument(
+        "--token-file",
+        default=None,
+        help=(
+            "Path to a file containing the token which clients must present (as an Authorization: "
+            f"Bearer header). Defaults to the value of the {TOKEN_ENV_VAR} environment variable."
+        ),
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Log every request to stderr"
+    )
+
+
+def read_token(token_file: Optional[str]) -> Optional[str]:
+    """
+    Returns the server token from the given file or, if there is none, from the environment.
+    """
+    if token_file is not None:
+        with open(token_file, "r") as ifp:
+            return ifp.read().strip() or None
+    return os.environ.get(TOKEN_ENV_VAR) or None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust serve",
+        description=(
+            "Locust: analysis server. Accepts POST requests on /analyze with JSON bodies of the form "
+            '{"repo": ..., "initial": ..., "terminal": ..., "format": ...} and responds with the '
+            f"rendered results. Clients authenticate with a token (see --token-file and "
+            f"{TOKEN_ENV_VAR})."
+        ),
+    )
+    populate_argument_parser(parser)
+    args = parser.parse_args(argv)
+    token = read_token(args.token_file)
+    if token is None:
+        parser.error(f"A token is required: pass --token-file or set {TOKEN_ENV_VAR}")
+
+    warm_up()
+    try:
+        server = create_server(
+            Analyzer(args.cache_size, args.plugins),
+            token,
+            args.host,
+            args.port,
+            args.socket,
+            args.verbose,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    address = args.socket if args.socket is not None else f"{args.host}:{args.port}"
+    print(f"Locust server listening on {address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Opt-in export of the spans of a locust run in the Chrome trace event format, which trace viewers
+(e.g. chrome://tracing or Perfetto) can open
+"""
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+
+class Tracer:
+    """
+    Records spans as complete ("X") trace events, each with the ids of the process and the thread it
+    happened on. Spans can be recorded from several threads at once.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self.lock = threading.Lock()
+
+    def timestamp(self) -> float:
+        """
+        Returns the number of microseconds since the tracer was created.
+        """
+        return (time.perf_counter() - self.origin) * 1e6
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, args: Dict[str, Any]) -> Iterator[None]:
+        start = self.timestamp()
+        try:
+            yield
+        finally:
+            end = self.timestamp()
+            thread = threading.current_thread()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": end - start,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": args,
+            }
+            with self.lock:
+                self.events.append(event)
+                if thread.ident is not None:
+                    self.thread_names[thread.ident] = thread.name
+
+    def trace(self) -> Dict[str, Any]:
+        """
+        Returns the recorded spans as a trace (in the JSON object format), with metadata events
+        which name the process and the threads they happened on.
+        """
+        pid = os.getpid()
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+            thread_names = dict(self.thread_names)
+        metadata: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "locust"}}
+        ]
+        for tid, thread_name in thread_names.items():
+            metadata.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": thread_name},
+                }
+            )
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as ofp:
+            json.dump(self.trace(), ofp)
+
+
+# The tracer is shared by every thread (unlike the profiler, which is held in a context variable),
+# so that spans from worker threads end up in the same trace.
+active_tracer: Optional[Tracer] = None
+
+NOT_TRACED = contextlib.nullcontext()
+
+
+def span(name: str, category: str, **args: Any) -> ContextManager[None]:
+    """
+    Records the enclosed code as a span with the given name, category and arguments if tracing is
+    enabled. Otherwise, does nothing - this is cheap enough to leave in hot paths.
+    """
+    tracer = active_tracer
+    if tracer is None:
+        return NOT_TRACED
+    return tracer.span(name, category, args)
+
+
+@contextlib.contextmanager
+def tracing(path: Optional[str] = None) -> Iterator[Tracer]:
+    """
+    Enables tracing for the enclosed code, and provides the tracer which records the spans. If a
+    path is given, the trace is written to it on exit (also if the enclosed code raised an error).
+    """
+    global active_tracer
+    previous_tracer = active_tracer
+    tracer = Tracer()
+    active_tracer = tracer
+    try:
+        yield tracer
+    finally:
+        active_tracer = previous_tracer
+        if path is not None:
+            tracer.write(path)
+
+
+def populate_argument_parser(parser: argparse.ArgumentParser) -> None:
+    """
+    Populates an argparse ArgumentParser object with the arguments which enable tracing.
+
+    Mutates the provided parser.
+    """
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help=(
+            "Path to which to write the spans of the run (opening the repository, diffing, reading "
+            "files, parsing, plugins and rendering) in the Chrome trace event format"
+        ),
+    )
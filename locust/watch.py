@@ -0,0 +1,370 @@
+"""
+Watches the working tree of a repository, and emits an updated locust summary whenever it changes
+"""
+import argparse
+import json
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from . import git
+from . import parse
+from . import render
+from .cache import LRUCache
+from .server import DEFAULT_CACHE_SIZE, remove_stale_socket
+
+if TYPE_CHECKING:
+    import pygit2
+
+# Seconds between polls of the working tree.
+DEFAULT_INTERVAL = 0.05
+
+# (modification time in nanoseconds, size in bytes) of a file, or None if there is no file.
+FileSignature = Optional[Tuple[int, int]]
+
+
+def file_signature(path: str) -> FileSignature:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+    """
+    Keeps the parse result of the working tree of a repository against HEAD up to date.
+
+    Tracked files are polled by their modification times and sizes, and only the files which changed
+    since the last poll are diffed again. HEAD-side sources are read from the object database once,
+    and the definitions in every source are cached by blob hash, so a poll only parses the sources
+    which actually changed. When HEAD or the index change (e.g. after a commit or a checkout), the
+    whole working tree is compared against HEAD again.
+    """
+
+    def __init__(
+        self,
+        repo_dir: str,
+        plugins: List[str],
+        ignore_docstrings: bool = False,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.repository = git.get_repository(repo_dir)
+        if self.repository.is_bare:
+            raise ValueError("Bare repositories have no working tree to watch")
+        self.workdir = git.repository_path(self.repository)
+        self.index_path = os.path.join(self.repository.path, "index")
+        self.plugins = plugins
+        self.ignore_docstrings = ignore_docstrings
+        self.sources: git.SourceCache = LRUCache(cache_size)
+        self.cache: parse.DefinitionsCache = LRUCache(cache_size)
+
+        self.head: Optional[str] = None
+        self.head_tree: Optional["pygit2.Tree"] = None
+        self.index_signature: FileSignature = None
+        self.signatures: Dict[str, FileSignature] = {}
+        self.patches: Dict[str, git.PatchInfo] = {}
+        self.reset()
+        self.parse_result = self.analyze()
+
+    def head_revision(self) -> Optional[str]:
+        if self.repository.head_is_unborn:
+            return None
+        return str(self.repository.head.target)
+
+    def head_source(self, path: str) -> Optional[str]:
+        """
+        Returns the source of the file at the given path in HEAD, or None if there is no such file.
+        """
+        import pygit2
+
+        if self.head_tree is None:
+            return None
+        try:
+            blob_id = self.head_tree[path].id
+        except KeyError:
+            return None
+
+        key = str(blob_id)
+        if key in self.sources:
+            return self.sources[key]
+        source: Optional[str] = None
+        blob = self.repository.get(blob_id)
+        if isinstance(blob, pygit2.Blob):
+            source = blob.data.decode(errors="ignore")
+        self.sources[key] = source
+        return source
+
+    def file_patch(self, path: str) -> Optional[git.PatchInfo]:
+        """
+        Diffs the file at the given path in the working tree against HEAD. Returns None if the file is
+        the same on both sides.
+        """
+        import pygit2
+
+        old_source = self.head_source(path)
+        new_source: Optional[str] = None
+        try:
+            with open(os.path.join(self.workdir, path), "rb") as ifp:
+                new_source = ifp.read().decode(errors="ignore")
+        except OSError:
+            pass
+        if old_source == new_source:
+            return None
+
+        # The patch refers to these buffers without holding on to them, so they have to outlive it.
+        old_data = None if old_source is None else old_source.encode()
+        new_data = None if new_source is None else new_source.encode()
+        diff_patch = pygit2.Patch.create_from(
+            old_data,
+            new_data,
+            old_as_path=path,
+            new_as_path=path,
+            context_lines=0,
+        )
+        patch = git.PatchInfo(
+            old_file=path,
+            new_file=path,
+            hunks=[git.process_hunk(hunk) for hunk in diff_patch.hunks],
+        )
+        if old_source is not None:
+            patch.old_source = old_source
+        if new_source is not None:
+            patch.new_source = new_source
+        return patch
+
+    def update(self, paths: List[str]) -> List[str]:
+        """
+        Diffs the files at the given paths again. Returns the paths whose patches changed.
+        """
+        changed: List[str] = []
+        for path in paths:
+            patch = self.file_patch(path)
+            if patch != self.patches.get(path):
+                changed.append(path)
+                if patch is None:
+                    del self.patches[path]
+                else:
+                    self.patches[path] = patch
+        return changed
+
+    def reset(self) -> List[str]:
+        """
+        Compares the whole working tree against HEAD again. Returns the paths whose patches changed.
+        """
+        import pygit2
+
+        self.head = self.head_revision()
+        self.head_tree = None
+        if self.head is not None:
+            self.head_tree = self.repository.revparse_single(self.head).peel(
+                pygit2.Tree
+            )
+        self.index_signature = file_signature(self.index_path)
+        index = self.repository.index
+        index.read()
+
+        # Untracked files are left out, as they are when locust diffs against the working tree.
+        status = self.repository.status()
+        candidates = [
+            path
+            for path, flags in status.items()
+            if not flags & (pygit2.GIT_STATUS_WT_NEW | pygit2.GIT_STATUS_IGNORED)
+        ]
+        tracked = {entry.path for entry in index}.union(candidates)
+        self.signatures = {
+            path: file_signature(os.path.join(self.workdir, path)) for path in tracked
+        }
+
+        previous_patches = self.patches
+        self.patches = {}
+        self.update(candidates)
+        return [
+            path
+            for path in sorted(set(previous_patches).union(self.patches))
+            if previous_patches.get(path) != self.patches.get(path)
+        ]
+
+    def analyze(self) -> parse.ParseResult:
+        initial_ref = git.NULL_REVISION
+        if self.head is not None:
+            initial_ref = self.repository.revparse_single(self.head).short_id
+        git_result = git.GitResult(
+            repo=self.workdir,
+            initial_ref=initial_ref,
+            patches=[self.patches[path] for path in sorted(self.patches)],
+        )
+        return parse.run(git_result, self.plugins, self.cache, self.ignore_docstrings)
+
+    def poll(self) -> Optional[List[str]]:
+        """
+        Checks the working tree for changes, and updates the parse result if there were any. Returns
+        the (sorted) paths of the files whose patches changed, or None if none did.
+        """
+        if (
+            self.head_revision() != self.head
+            or file_signature(self.index_path) != self.index_signature
+        ):
+            changed = self.reset()
+        else:
+            modified: List[str] = []
+            for path, signature in self.signatures.items():
+                current = file_signature(os.path.join(self.workdir, path))
+                if current != signature:
+                    self.signatures[path] = current
+                    modified.append(path)
+            changed = self.update(modified)
+
+        if not changed:
+            return None
+        self.parse_result = self.analyze()
+        return sorted(changed)
+
+
+class Broadcaster:
+    """
+    Sends lines to every client connected to a Unix socket. Clients are sent the latest line as soon
+    as they connect. Only a stale socket at the path is replaced (see server.remove_stale_socket).
+    """
+
+    def __init__(self, socket_path: str):
+        remove_stale_socket(socket_path)
+        self.socket_path = socket_path
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(socket_path)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.clients: List[socket.socket] = []
+        self.latest: Optional[bytes] = None
+
+    def send_to(self, client: socket.socket, line: bytes) -> bool:
+        try:
+            client.sendall(line)
+        except OSError:
+            client.close()
+            return False
+        return True
+
+    def accept(self) -> None:
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except BlockingIOError:
+                return
+            # Clients which stop reading are dropped instead of stalling the watcher.
+            client.settimeout(1)
+            if self.latest is None or self.send_to(client, self.latest):
+                self.clients.append(client)
+
+    def send(self, line: bytes) -> None:
+        self.latest = line
+        self.clients = [client for client in self.clients if self.send_to(client, line)]
+
+    def close(self) -> None:
+        for client in self.clients:
+            client.close()
+        self.server.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def write_atomically(path: str, contents: str) -> None:
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as ofp:
+        ofp.write(contents)
+    os.replace(temporary_path, path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="locust watch",
+        description=(
+            "Locust: Watch the working tree of a repository, and emit an updated summary (against "
+            "HEAD) whenever it changes. By default, writes one JSON object per line for each update, "
+            'of the form {"files": [<paths of the files which changed>], "result": ...}.'
+        ),
+    )
+    parser.add_argument(
+        "-r", "--repo", required=False, default=".", help="Path to git repository"
+    )
+    parse.populate_argument_parser(parser)
+    render.populate_argument_parser(parser)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Seconds between polls of the working tree (default: {DEFAULT_INTERVAL})",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="Path of a file to replace with the rendered summary on each update",
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help=(
+            "Path to a Unix socket on which to send updates to every connected client (one JSON "
+            "object per line)"
+        ),
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Number of blob sources (and, separately, of blob definitions) to keep cached",
+    )
+    args = parser.parse_args(argv)
+    render.validate_arguments(parser, args)
+
+    watcher = Watcher(args.repo, args.plugins, args.ignore_docstrings, args.cache_size)
+    broadcaster: Optional[Broadcaster] = None
+    if args.socket is not None:
+        try:
+            broadcaster = Broadcaster(args.socket)
+        except ValueError as e:
+            parser.error(str(e))
+
+    def emit(files: List[str]) -> None:
+        try:
+            rendered = render.run(
+                watcher.parse_result,
+                args.format,
+                args.github,
+                args.metadata,
+                args.max_changes,
+                args.max_bytes,
+                args.drop_cosmetic,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        if args.output is not None:
+            write_atomically(args.output, rendered)
+        if args.output is None or broadcaster is not None:
+            result = json.loads(rendered) if args.format == "json" else rendered
+            line = json.dumps({"files": files, "result": result})
+            if broadcaster is not None:
+                broadcaster.send(f"{line}\n".encode())
+            else:
+                print(line, flush=True)
+
+    try:
+        emit(sorted(watcher.patches))
+        while True:
+            if broadcaster is not None:
+                broadcaster.accept()
+            changed = watcher.poll()
+            if changed is not None:
+                emit(changed)
+            time.sleep(args.interval)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        if broadcaster is not None:
+            broadcaster.close()
+
+
+if __name__ == "__main__":
+    main()
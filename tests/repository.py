@@ -0,0 +1,83 @@
+"""
+Builds scratch git repositories for tests which do not need the locust-test-cases repository.
+"""
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import pygit2
+
+SIGNATURE = pygit2.Signature("Locust Tests", "tests@locust.invalid", 1600000000, 0)
+
+
+def create_repository(
+    commits: List[Dict[str, Optional[str]]], bare: bool = False
+) -> Tuple[str, List[str]]:
+    """
+    Creates a git repository in a temporary directory with one commit (on the main branch) for each
+    of the given dictionaries. Each dictionary maps file paths to their contents in that commit (or
+    to None if the file should be deleted in that commit). Files which are not mentioned in a
+    dictionary carry over from the previous commit.
+
+    Returns a tuple of the form:
+    (path to repository, list of commit hashes)
+    """
+    repo_dir = tempfile.mkdtemp()
+    repository = pygit2.init_repository(repo_dir, bare=bare, initial_head="main")
+
+    files: Dict[str, str] = {}
+    commit_ids: List[str] = []
+    parents: List[pygit2.Oid] = []
+    for i, changes in enumerate(commits):
+        for filepath, contents in changes.items():
+            if contents is None:
+                files.pop(filepath, None)
+            else:
+                files[filepath] = contents
+
+        index = pygit2.Index()
+        for filepath, contents in files.items():
+            blob_id = repository.create_blob(contents.encode())
+            index.add(pygit2.IndexEntry(filepath, blob_id, pygit2.GIT_FILEMODE_BLOB))
+        tree_id = index.write_tree(repository)
+        commit_id = repository.create_commit(
+            "refs/heads/main", SIGNATURE, SIGNATURE, f"Commit {i}", tree_id, parents
+        )
+        parents = [commit_id]
+        commit_ids.append(str(commit_id))
+
+    if not bare:
+        repository.checkout_head(strategy=pygit2.GIT_CHECKOUT_FORCE)
+
+    return os.path.normpath(repo_dir), commit_ids
+
+
+def create_branch(
+    repo_dir: str, branch: str, parent: str, changes: Dict[str, Optional[str]]
+) -> str:
+    """
+    Creates a commit on the given branch, on top of the given parent commit, which changes the files
+    of the parent as described by changes (see create_repository).
+
+    Returns the hash of the new commit.
+    """
+    repository = pygit2.Repository(repo_dir)
+    parent_commit = repository.revparse_single(parent).peel(pygit2.Commit)
+    index = pygit2.Index()
+    index.read_tree(parent_commit.tree)
+    for filepath, contents in changes.items():
+        if contents is None:
+            index.remove(filepath)
+        else:
+            blob_id = repository.create_blob(contents.encode())
+            index.add(pygit2.IndexEntry(filepath, blob_id, pygit2.GIT_FILEMODE_BLOB))
+    tree_id = index.write_tree(repository)
+    commit_id = repository.create_commit(
+        f"refs/heads/{branch}",
+        SIGNATURE,
+        SIGNATURE,
+        f"Commit on {branch}",
+        tree_id,
+        [parent_commit.id],
+    )
+    return str(commit_id)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import stat
+import tempfile
+import time
+import unittest
+
+from google.protobuf.json_format import MessageToDict
+
+from locust import aio, git, parse, render
+from locust.cache import LRUCache
+
+from .repository import create_repository
+
+
+class TestLocustAio(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {
+                    "a.py": "def f():\n    return 2\n\ndef g():\n    pass\n",
+                    "b.py": "class C:\n    pass\n",
+                    "c.py": "def broken(:\n",
+                },
+            ]
+        )
+        self.addCleanup(aio.shutdown)
+
+    def test_aio_matches_blocking_api(self):
+        initial, terminal = self.commits
+        git_result = git.run(self.repo_dir, initial, terminal)
+        parse_result = parse.run(git_result, [])
+
+        for processes in [0, 2]:
+            with self.subTest(processes=processes):
+                aio.configure(threads=2, processes=processes)
+                cache: parse.DefinitionsCache = LRUCache(100)
+
+                async def analyze():
+                    async_git_result = await aio.git_run(
+                        self.repo_dir, initial, terminal
+                    )
+                    async_parse_result = await aio.parse_run(
+                        async_git_result, [], cache
+                    )
+                    rendered = await aio.render_run(async_parse_result, "json", None)
+                    return async_git_result, async_parse_result, rendered
+
+                async_git_result, async_parse_result, rendered = asyncio.run(analyze())
+                self.assertDictEqual(
+                    MessageToDict(async_git_result), MessageToDict(git_result)
+                )
+                self.assertDictEqual(
+                    MessageToDict(async_parse_result), MessageToDict(parse_result)
+                )
+                self.assertEqual(rendered, render.run(parse_result, "json", None))
+                self.assertEqual(
+                    asyncio.run(
+                        aio.render_run(parse_result, "json", None, drop_cosmetic=True)
+                    ),
+                    render.run(parse_result, "json", None, drop_cosmetic=True),
+                )
+                # New sources of a.py and b.py, and old source of a.py.
+                self.assertEqual(len(cache), 3)
+
+    def test_aio_iterators(self):
+        initial, terminal = self.commits
+        git_result = git.run(self.repo_dir, initial, terminal)
+        parse_result = parse.run(git_result, [])
+        aio.configure(processes=0)
+
+        async def collect():
+            patches = [
+                patch
+                async for patch in aio.iter_patches(self.repo_dir, initial, terminal)
+            ]
+            changes = [change async for change in aio.iter_changes(git_result)]
+            return patches, changes
+
+        patches, changes = asyncio.run(collect())
+        self.assertEqual(patches, list(git_result.patches))
+        self.assertEqual(changes, list(parse_result.changes))
+
+    def test_aio_concurrent_runs(self):
+        initial, terminal = self.commits
+        aio.configure(threads=4, processes=0)
+
+        async def analyze_all():
+            return await asyncio.gather(
+                *[
+                    aio.run(self.repo_dir, initial, terminal, [], "yaml")
+                    for _ in range(8)
+                ]
+            )
+
+        expected = render.run(
+            parse.run(git.run(self.repo_dir, initial, terminal), []), "yaml", None
+        )
+        for rendered in asyncio.run(analyze_all()):
+            self.assertEqual(rendered, expected)
+
+    def test_aio_timeout_kills_plugins(self):
+        initial, terminal = self.commits
+        marker = os.path.join(tempfile.mkdtemp(), "finished")
+        plugin = os.path.join(tempfile.mkdtemp(), "plugin.sh")
+        with open(plugin, "w") as ofp:
+            ofp.write(f"#!/bin/sh\nsleep 5\ntouch {marker}\n")
+        os.chmod(plugin, os.stat(plugin).st_mode | stat.S_IEXEC)
+        aio.configure(processes=0)
+
+        async def analyze():
+            git_result = await aio.git_run(self.repo_dir, initial, terminal)
+            return await aio.parse_run(git_result, [plugin], timeout=0.5)
+
+        start = time.time()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(analyze())
+        self.assertLess(time.time() - start, 5)
+
+        time.sleep(0.5)
+        self.assertFalse(os.path.exists(marker))
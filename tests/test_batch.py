@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+
+from locust import batch, git, parse, render
+
+from .repository import create_repository
+
+
+class TestLocustBatch(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n", "b.py": "class C:\n    pass\n"},
+                {"b.py": "class C:\n    x = 1\n"},
+            ]
+        )
+        self.jobs = [
+            {
+                "id": "first",
+                "repo": self.repo_dir,
+                "initial": self.commits[0],
+                "terminal": self.commits[1],
+            },
+            {"repo": self.repo_dir, "initial": self.commits[1], "terminal": "HEAD"},
+            {"id": "unknown", "repo": self.repo_dir, "initial": "no-such-revision"},
+        ]
+        self.working_dir = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.working_dir, "jobs.jsonl")
+        with open(self.manifest, "w") as ofp:
+            for job in self.jobs:
+                print(json.dumps(job), file=ofp)
+
+    def read_records(self, output_path: str):
+        with open(output_path, "r") as ifp:
+            return [json.loads(line) for line in ifp]
+
+    def test_batch_run(self):
+        output = os.path.join(self.working_dir, "results.ndjson")
+        with self.assertRaises(SystemExit):
+            batch.main([self.manifest, "-o", output, "--workers", "2"])
+
+        records = {record["id"]: record for record in self.read_records(output)}
+        self.assertSetEqual(set(records), set(batch.job_id(job) for job in self.jobs))
+        for job in self.jobs[:2]:
+            record = records[batch.job_id(job)]
+            self.assertEqual(record["status"], "ok")
+            self.assertGreaterEqual(record["seconds"], 0)
+            git_result = git.run(self.repo_dir, job["initial"], job["terminal"])
+            self.assertDictEqual(
+                record["result"],
+                json.loads(render.run(parse.run(git_result, []), "json", None)),
+            )
+        self.assertEqual(records["unknown"]["status"], "error")
+        self.assertIn("no-such-revision", records["unknown"]["error"])
+
+    def test_batch_resume(self):
+        output = os.path.join(self.working_dir, "results.ndjson")
+        with open(output, "w") as ofp:
+            print(json.dumps({"id": "first", "status": "ok"}), file=ofp)
+            # Record which was being written when the previous run was interrupted
+            ofp.write('{"id": "/')
+
+        with self.assertRaises(SystemExit):
+            batch.main([self.manifest, "-o", output, "--workers", "1"])
+
+        with open(output, "r") as ifp:
+            lines = ifp.read().splitlines()
+        self.assertEqual(len(lines), 4)
+        ids = [json.loads(line)["id"] for line in lines[2:]]
+        self.assertCountEqual(ids, [batch.job_id(job) for job in self.jobs[1:]])
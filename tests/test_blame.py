@@ -0,0 +1,109 @@
+import os
+import unittest
+
+import pygit2
+
+from locust import blame, git
+
+from .repository import SIGNATURE, create_repository
+
+
+class TestLocustBlame(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n\ndef g():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n\ndef g():\n    return 1\n"},
+                {
+                    "a.py": (
+                        "import os\n\n"
+                        "def f():\n    return 2\n\n"
+                        "class C:\n    def h(self):\n        pass\n\n"
+                        "def g():\n    return 1\n"
+                    )
+                },
+                {"b.py": "x = 1\n"},
+                {
+                    "a.py": (
+                        "import os\n\n"
+                        "def f():\n    return 2\n\n"
+                        "class C:\n    def h(self):\n        pass\n\n"
+                        "def g():\n    x = 1\n    return x\n"
+                    )
+                },
+            ]
+        )
+
+    def test_blame_run(self):
+        results = {
+            result["name"]: result
+            for result in blame.run(self.repo_dir, "a.py", use_cache=False)
+        }
+        self.assertSetEqual(set(results), {"f", "g", "C", "C.h"})
+
+        self.assertEqual(results["f"]["changes"], 2)
+        self.assertEqual(results["f"]["last_commit"], self.commits[1])
+        self.assertEqual(results["f"]["introduced"], self.commits[0])
+
+        self.assertEqual(results["g"]["changes"], 2)
+        self.assertEqual(results["g"]["last_commit"], self.commits[4])
+        self.assertEqual(results["g"]["introduced"], self.commits[0])
+        self.assertEqual(results["g"]["line"], 10)
+
+        for name in ["C", "C.h"]:
+            self.assertEqual(results[name]["changes"], 1)
+            self.assertEqual(results[name]["last_commit"], self.commits[2])
+            self.assertEqual(results[name]["introduced"], self.commits[2])
+
+    def test_blame_cache(self):
+        results = blame.run(self.repo_dir, "a.py", "HEAD~1", "C")
+        self.assertListEqual([result["name"] for result in results], ["C", "C.h"])
+
+        # a.py did not change between HEAD~2 and HEAD~1, so both share the cached results.
+        repository = git.get_repository(self.repo_dir)
+        oid = str(repository.revparse_single("HEAD~1:a.py").id)
+        self.assertTrue(os.path.exists(blame.cache_path(repository, oid)))
+        self.assertListEqual(
+            blame.run(self.repo_dir, "a.py", "HEAD~2", "C"),
+            blame.run(self.repo_dir, "a.py", "HEAD~1", "C", use_cache=False),
+        )
+        self.assertEqual(len(blame.read_cache(repository, oid)), 1)
+
+    def test_blame_invalid_sources(self):
+        repository = git.get_repository(self.repo_dir)
+        tree_index = pygit2.Index()
+        tree_index.read_tree(repository.revparse_single("HEAD").peel(pygit2.Tree))
+        for path, data in [
+            ("latin.py", "# caf\xe9\ndef f():\n    pass\n".encode("latin-1")),
+            ("broken.py", b"def f(:\n    pass\n"),
+            ("package/module.py", b"def f():\n    pass\n"),
+        ]:
+            blob_id = repository.create_blob(data)
+            tree_index.add(pygit2.IndexEntry(path, blob_id, pygit2.GIT_FILEMODE_BLOB))
+        repository.create_commit(
+            "refs/heads/main",
+            SIGNATURE,
+            SIGNATURE,
+            "Invalid sources",
+            tree_index.write_tree(repository),
+            [repository.head.target],
+        )
+
+        results = blame.run(self.repo_dir, "latin.py", use_cache=False)
+        self.assertListEqual([result["name"] for result in results], ["f"])
+        for path in ["broken.py", "missing.py", "package"]:
+            with self.assertRaises(ValueError):
+                blame.run(self.repo_dir, path, use_cache=False)
+
+    def test_blame_map_line(self):
+        # Lines 2-3 replaced by 4 lines, and 2 lines inserted after old line 10.
+        hunks = [(2, 2, 2, 4), (10, 0, 13, 2)]
+        self.assertEqual(blame.map_line(hunks, 1, True), 1)
+        self.assertEqual(blame.map_line(hunks, 5, True), 3)
+        self.assertEqual(blame.map_line(hunks, 6, True), 4)
+        self.assertEqual(blame.map_line(hunks, 13, True), 11)
+        self.assertEqual(blame.map_line(hunks, 13, False), 10)
+        self.assertEqual(blame.map_line(hunks, 15, True), 11)
+        self.assertIsNone(blame.map_extent(hunks, 13, 14))
+        self.assertTrue(blame.touches(hunks, 1, 2))
+        self.assertFalse(blame.touches(hunks, 6, 12))
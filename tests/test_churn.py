@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+
+from locust import churn
+
+from .repository import create_repository
+
+
+class TestLocustChurn(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n", "b.py": "class C:\n    pass\n"},
+                {"a.py": "def f():\n    return 2\n"},
+                {"a.py": "def f():\n    x = 3\n    return x\n"},
+                {"b.py": "class C:\n    x = 1\n"},
+                {"a.py": "def f():\n    x = 4\n    return x\n\ndef g():\n    pass\n"},
+            ]
+        )
+
+    def test_churn_run(self):
+        expected = [
+            ("a.py", "f", 4, 2 + 1 + 2 + 1),
+            ("b.py", "C", 2, 2 + 1),
+            ("a.py", "g", 1, 2),
+        ]
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                table, commits = churn.run(self.repo_dir, "HEAD", [], workers=workers)
+                self.assertEqual(len(commits), 5)
+                top = churn.top_changes(table, commits, 3)
+                self.assertListEqual(
+                    [
+                        (
+                            row["filepath"],
+                            row["name"],
+                            row["count"],
+                            row["changed_lines"],
+                        )
+                        for row in top
+                    ],
+                    expected,
+                )
+                self.assertEqual(top[0]["first_commit"], self.commits[0])
+                self.assertEqual(top[0]["last_commit"], self.commits[4])
+                self.assertEqual(top[1]["last_commit"], self.commits[3])
+                self.assertListEqual(
+                    top[0]["authors"], ["Locust Tests <tests@locust.invalid>"]
+                )
+
+    def test_churn_main(self):
+        output = os.path.join(tempfile.mkdtemp(), "churn.json")
+        churn.main(
+            [
+                "-r",
+                self.repo_dir,
+                "-o",
+                output,
+                f"{self.commits[2]}..HEAD",
+                "--sort",
+                "changed_lines",
+                "-k",
+                "1",
+                "--workers",
+                "1",
+            ]
+        )
+
+        with open(output, "r") as ifp:
+            results = json.load(ifp)
+        self.assertEqual(results["commits"], 2)
+        self.assertGreater(results["commits_per_second"], 0)
+        self.assertEqual(len(results["top"]), 1)
+        self.assertEqual(results["top"][0]["name"], "g")
+        self.assertEqual(results["top"][0]["changed_lines"], 2)
+
+        # Churn does not classify changes, so it does not accept classification options.
+        with self.assertRaises(SystemExit):
+            churn.main(["-r", self.repo_dir, "HEAD", "--ignore-docstrings"])
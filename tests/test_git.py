@@ -1,12 +1,15 @@
 import json
 import os
+import tempfile
 import unittest
 
 from google.protobuf.json_format import MessageToDict
+import pygit2
 
-from locust import git, git_pb2
+from locust import git, git_pb2, parse
 
 from . import config
+from .repository import create_branch, create_repository
 
 
 class TestLocustGit(unittest.TestCase):
@@ -52,3 +55,260 @@ class TestLocustGit(unittest.TestCase):
         result_json = MessageToDict(result, preserving_proto_field_name=True)
 
         self.assertDictEqual(result_json, expected_result_json)
+
+    def test_git_renames(self):
+        source = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(10))
+        repo_dir, commits = create_repository(
+            [
+                {"a.py": source},
+                {"a.py": None, "b.py": source.replace("return 3", "return 33")},
+            ]
+        )
+
+        result = git.run(repo_dir, commits[0], commits[1])
+        self.assertListEqual(
+            [(patch.old_file, patch.new_file) for patch in result.patches],
+            [("a.py", "b.py")],
+        )
+        # Only the edit in the renamed file counts as a change.
+        changes = parse.run(result, []).changes
+        self.assertListEqual(
+            [(change.filepath, change.name, change.status) for change in changes],
+            [("b.py", "f3", parse.MODIFIED)],
+        )
+
+        for similarity in [
+            git.SimilarityOptions(renames=False),
+            git.SimilarityOptions(rename_threshold=100),
+        ]:
+            result = git.run(repo_dir, commits[0], commits[1], similarity=similarity)
+            self.assertListEqual(
+                [(patch.old_file, patch.new_file) for patch in result.patches],
+                [("a.py", "a.py"), ("b.py", "b.py")],
+            )
+
+    def test_git_copies(self):
+        source = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(10))
+        repo_dir, commits = create_repository(
+            [
+                {"a.py": source},
+                {
+                    "a.py": source + "x = 1\n",
+                    "c.py": source.replace("return 3", "return 33"),
+                },
+            ]
+        )
+
+        result = git.run(
+            repo_dir,
+            commits[0],
+            commits[1],
+            similarity=git.SimilarityOptions(copies=True),
+        )
+        self.assertListEqual(
+            [(patch.old_file, patch.new_file) for patch in result.patches],
+            [("a.py", "a.py"), ("a.py", "c.py")],
+        )
+        self.assertEqual(len(result.patches[1].hunks), 1)
+
+    def from_diff_repository(self):
+        old_source = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(10))
+        new_source = (
+            old_source.replace("return 2\n", "x = 2\n    return x\n")
+            .replace("def f5():\n    return 5\n\n", "")
+            .replace("return 8", "return 88")
+        )
+        commits = [
+            {"a.py": old_source, "b.py": "class C:\n    pass\n"},
+            {"a.py": new_source, "b.py": None, "c.py": "import os\n\nX = os.sep\n"},
+        ]
+        repo_dir, commit_hashes = create_repository(commits)
+        sources_dir = tempfile.mkdtemp()
+        for filepath, contents in commits[1].items():
+            if contents is not None:
+                with open(os.path.join(sources_dir, filepath), "w") as ofp:
+                    ofp.write(contents)
+        return repo_dir, commit_hashes, sources_dir
+
+    def patch_dict(self, patch):
+        patch_json = MessageToDict(patch, preserving_proto_field_name=True)
+        # Hunks which were split out of diffs with context lines keep the section heading of the
+        # hunk they came from, where git would find a heading for each of them.
+        for hunk in patch_json.get("hunks", []):
+            hunk["header"] = hunk["header"].split(" @@")[0]
+        return patch_json
+
+    def test_git_from_diff(self):
+        repo_dir, commits, sources_dir = self.from_diff_repository()
+        expected = git.run(repo_dir, commits[0], commits[1])
+        repository = git.get_repository(repo_dir)
+
+        for context_lines in [0, 3]:
+            diff_text = repository.diff(
+                commits[0], commits[1], context_lines=context_lines
+            ).patch
+            result = git.run_on_diff(diff_text, sources_dir)
+            self.assertEqual(result.repo, os.path.normpath(sources_dir))
+            self.assertListEqual(
+                [self.patch_dict(patch) for patch in result.patches],
+                [self.patch_dict(patch) for patch in expected.patches],
+            )
+
+        # Sources which do not match the diff are rejected.
+        with open(os.path.join(sources_dir, "a.py"), "w") as ofp:
+            ofp.write("x = 1\n")
+        with self.assertRaises(ValueError):
+            git.run_on_diff(diff_text, sources_dir)
+
+    def test_git_from_diff_series(self):
+        repo_dir, commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n", "b.py": "x = 1\n"},
+                {"a.py": "def f():\n    return 2\n\n\ndef g():\n    pass\n"},
+                {"a.py": "def g():\n    pass\n", "b.py": None},
+            ]
+        )
+        repository = git.get_repository(repo_dir)
+        sources_dir = tempfile.mkdtemp()
+        with open(os.path.join(sources_dir, "a.py"), "w") as ofp:
+            ofp.write("def g():\n    pass\n")
+
+        # Like git format-patch, the series has a diff for each commit, two of which change a.py.
+        diff_text = "".join(
+            repository.diff(commits[i], commits[i + 1]).patch for i in range(2)
+        )
+        result = git.run_on_diff(diff_text, sources_dir)
+        expected = [
+            patch
+            for i in range(2)
+            for patch in git.run(repo_dir, commits[i], commits[i + 1]).patches
+        ]
+        self.assertListEqual(
+            [self.patch_dict(patch) for patch in result.patches],
+            [self.patch_dict(patch) for patch in expected],
+        )
+
+        # Paths in the diff cannot point outside of the sources.
+        escaping_diff = diff_text.replace("b/a.py", "b/../../etc/passwd")
+        with self.assertRaises(ValueError):
+            git.run_on_diff(escaping_diff, sources_dir)
+
+    def test_git_from_diff_blobs(self):
+        repo_dir, commits, _ = self.from_diff_repository()
+        expected = git.run(repo_dir, commits[0], commits[1])
+        repository = git.get_repository(repo_dir)
+
+        # With enough context, the diff shows the files on both sides in full.
+        diff_text = repository.diff(commits[0], commits[1], context_lines=1000).patch
+        result = git.run_on_diff(diff_text, blobs=True)
+        self.assertListEqual(
+            [self.patch_dict(patch) for patch in result.patches],
+            [self.patch_dict(patch) for patch in expected.patches],
+        )
+        # Plain diffs do not name the commit they come from.
+        expected_changes = MessageToDict(parse.run(expected, []))["changes"]
+        for change in expected_changes:
+            del change["revision"]
+        self.assertListEqual(
+            MessageToDict(parse.run(result, []))["changes"], expected_changes
+        )
+
+        # Without sources, only the hunks are available.
+        result = git.run_on_diff(diff_text)
+        for patch in result.patches:
+            self.assertEqual(patch.old_source, "")
+            self.assertEqual(patch.new_source, "")
+
+    def test_git_merge_base(self):
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": "def f():\n    return 1\n",
+                    "b.py": "def g():\n    return 1\n",
+                },
+                {"b.py": "def g():\n    return 2\n"},
+            ]
+        )
+        branch = create_branch(
+            repo_dir, "feature", commits[0], {"a.py": "def f():\n    return 2\n"}
+        )
+
+        # The direct diff also undoes the change to b.py which only happened on main.
+        result = git.run(repo_dir, "main", "feature")
+        self.assertListEqual(
+            [patch.new_file for patch in result.patches], ["a.py", "b.py"]
+        )
+
+        result = git.run(repo_dir, "main", "feature", merge_base=True)
+        self.assertEqual(result.initial_ref, commits[0][:7])
+        self.assertListEqual([patch.new_file for patch in result.patches], ["a.py"])
+
+        self.assertEqual(
+            git.merge_base_revision(git.get_repository(repo_dir), branch, None),
+            commits[0],
+        )
+        unrelated_dir, unrelated_commits = create_repository([{"c.py": "x = 1\n"}])
+        repository = git.get_repository(repo_dir)
+        repository.odb.add_disk_alternate(
+            os.path.join(unrelated_dir, ".git", "objects")
+        )
+        with self.assertRaises(ValueError):
+            git.merge_base_revision(repository, unrelated_commits[0], branch)
+
+    def test_git_staged(self):
+        repo_dir, _ = create_repository(
+            [{"a.py": "def f():\n    return 1\n", "b.py": "def g():\n    return 1\n"}]
+        )
+        staged_source = "def f():\n    return 2\n"
+        repository = git.get_repository(repo_dir)
+        blob_id = repository.create_blob(staged_source.encode())
+        repository.index.add(
+            pygit2.IndexEntry("a.py", blob_id, pygit2.GIT_FILEMODE_BLOB)
+        )
+        repository.index.write()
+        # Unstaged and untracked changes are left out.
+        for filepath, contents in [
+            ("a.py", "def f():\n    return 3\n"),
+            ("b.py", "def g():\n    return 3\n"),
+            ("c.py", "def h():\n    pass\n"),
+        ]:
+            with open(os.path.join(repo_dir, filepath), "w") as ofp:
+                ofp.write(contents)
+
+        result = git.run(repo_dir, None, None, staged=True)
+        self.assertEqual(len(result.patches), 1)
+        self.assertEqual(result.patches[0].new_file, "a.py")
+        self.assertEqual(result.patches[0].new_source, staged_source)
+        self.assertListEqual(
+            [line.line for line in result.patches[0].hunks[0].lines],
+            ["    return 1\n", "    return 2\n"],
+        )
+
+        result = git.run(repo_dir, git.NULL_REVISION, None, staged=True)
+        self.assertListEqual(
+            [(patch.new_file, patch.new_source) for patch in result.patches],
+            [("a.py", staged_source), ("b.py", "def g():\n    return 1\n")],
+        )
+
+        with self.assertRaises(ValueError):
+            git.run(repo_dir, None, "HEAD", staged=True)
+
+    def test_git_staged_unborn_head(self):
+        repo_dir = tempfile.mkdtemp()
+        repository = pygit2.init_repository(repo_dir, initial_head="main")
+        source = "def f():\n    return 1\n"
+        with open(os.path.join(repo_dir, "a.py"), "w") as ofp:
+            ofp.write(source)
+        repository.index.add("a.py")
+        repository.index.write()
+
+        # Before the first commit, the staged files are compared against the empty tree.
+        result = git.run(repo_dir, None, None, staged=True)
+        self.assertEqual(result.initial_ref, git.NULL_REVISION)
+        self.assertListEqual(
+            [
+                (patch.new_file, patch.old_source, patch.new_source)
+                for patch in result.patches
+            ],
+            [("a.py", "", source)],
+        )
@@ -0,0 +1,229 @@
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from typing import Any, Dict, List
+
+from locust.ci_helpers import github
+
+from .repository import create_branch, create_repository
+
+
+class StandInAPI:
+    """
+    Local stand-in for the summary API. It responds to the i-th request with the i-th status in
+    statuses (and with 200 once those run out), and records every request it receives.
+    """
+
+    def __init__(self, statuses: List[int]):
+        self.statuses = list(statuses)
+        self.requests: List[Dict[str, Any]] = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                api.requests.append({"headers": dict(self.headers), "body": body})
+                status = api.statuses.pop(0) if api.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/github/summary"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "StandInAPI":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestLocustGitHubPublish(unittest.TestCase):
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.summary = json.dumps({"locust": [], "refs": {"initial": "a"}})
+
+    def options(self, url: str) -> github.DeliveryOptions:
+        return github.DeliveryOptions(
+            url=url,
+            token="secret",
+            connect_timeout=1,
+            read_timeout=1,
+            retries=3,
+            backoff=0.01,
+            spool_dir=self.spool_dir,
+        )
+
+    def test_deliver_retries_transient_errors(self):
+        with StandInAPI([503, 502]) as api:
+            github.deliver(self.summary, self.options(api.url))
+
+        self.assertEqual(len(api.requests), 3)
+        request = api.requests[-1]
+        self.assertEqual(request["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(request["headers"]["Authorization"], "Bearer secret")
+        self.assertEqual(gzip.decompress(request["body"]).decode(), self.summary)
+        self.assertListEqual(os.listdir(self.spool_dir), [])
+
+    def spooled(self, url: str) -> List[str]:
+        target_dir = github.target_spool_dir(self.spool_dir, url)
+        if not os.path.isdir(target_dir):
+            return []
+        return [name for name in os.listdir(target_dir) if name.endswith(".json")]
+
+    def test_deliver_spools_undeliverable_summaries(self):
+        with StandInAPI([500] * 4) as api:
+            with self.assertRaises(github.ErrorDueSendingSummary):
+                github.deliver(self.summary, self.options(api.url))
+            self.assertEqual(len(api.requests), 4)
+            self.assertEqual(len(self.spooled(api.url)), 1)
+
+            # Summaries are only sent to the API they were spooled for.
+            other_url = "http://127.0.0.1:1/github/summary"
+            github.spool_summary(self.spool_dir, other_url, self.summary)
+
+            # The next delivery sends the spooled summary before the new one.
+            next_summary = json.dumps({"locust": [], "refs": {"initial": "b"}})
+            github.deliver(next_summary, self.options(api.url))
+
+        bodies = [gzip.decompress(r["body"]).decode() for r in api.requests[4:]]
+        self.assertListEqual(bodies, [self.summary, next_summary])
+        self.assertListEqual(self.spooled(api.url), [])
+        self.assertEqual(len(self.spooled(other_url)), 1)
+
+    def test_deliver_does_not_spool_rejected_summaries(self):
+        with StandInAPI([422]) as api:
+            with self.assertRaises(github.ErrorDueSendingSummary):
+                github.deliver(self.summary, self.options(api.url))
+        self.assertEqual(len(api.requests), 1)
+        self.assertListEqual(self.spooled(api.url), [])
+
+    def test_deliver_flushes_past_rejected_summaries(self):
+        summaries = [
+            json.dumps({"locust": [], "refs": {"initial": str(i)}}) for i in range(3)
+        ]
+        # The API rejects the oldest spooled summary, which does not hold up the others.
+        with StandInAPI([400]) as api:
+            for summary in summaries[:2]:
+                github.spool_summary(self.spool_dir, api.url, summary)
+            github.deliver(summaries[2], self.options(api.url))
+
+        bodies = [gzip.decompress(r["body"]).decode() for r in api.requests]
+        self.assertListEqual(bodies, summaries)
+        self.assertListEqual(self.spooled(api.url), [])
+        rejected_dir = os.path.join(
+            github.target_spool_dir(self.spool_dir, api.url), "rejected"
+        )
+        self.assertEqual(len(os.listdir(rejected_dir)), 1)
+
+    def test_deliver_sends_summary_when_flush_fails(self):
+        with StandInAPI([500] * 4) as api:
+            github.spool_summary(self.spool_dir, api.url, self.summary)
+            next_summary = json.dumps({"locust": [], "refs": {"initial": "b"}})
+            github.deliver(next_summary, self.options(api.url))
+
+        self.assertEqual(len(api.requests), 5)
+        self.assertEqual(
+            gzip.decompress(api.requests[-1]["body"]).decode(), next_summary
+        )
+        # The spooled summary waits for the next delivery.
+        self.assertEqual(len(self.spooled(api.url)), 1)
+
+    def test_deliver_spools_on_connection_errors(self):
+        with StandInAPI([]) as api:
+            url = api.url
+        with self.assertRaises(github.ErrorDueSendingSummary):
+            github.deliver(self.summary, self.options(url))
+        self.assertEqual(len(self.spooled(url)), 1)
+
+
+class TestLocustGitHubPush(unittest.TestCase):
+    def test_publish_commits(self):
+        repo_dir, commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n"},
+                {"b.py": "def g():\n    return 3\n"},
+                {"a.py": "def f():\n    return 2\n\n\ndef h():\n    pass\n"},
+            ]
+        )
+        options = github.DeliveryOptions(
+            url="", retries=0, compress=False, spool_dir=tempfile.mkdtemp()
+        )
+        with StandInAPI([]) as api:
+            options.url = api.url
+            github.publish_commits(
+                "https://github.com/bugout-dev/locust",
+                [{"id": commit} for commit in commits[1:]],
+                [],
+                repo_dir,
+                options,
+                workers=2,
+            )
+
+        self.assertEqual(len(api.requests), 1)
+        summaries = json.loads(api.requests[0]["body"])["summaries"]
+        self.assertListEqual(
+            [summary["terminal_hash"] for summary in summaries], commits[1:]
+        )
+        changed_definitions = [
+            [change["name"] for item in summary["locust"] for change in item["changes"]]
+            for summary in summaries
+        ]
+        self.assertListEqual(changed_definitions, [["f"], ["g"], ["h"]])
+
+    def test_helper_pr_merge_base(self):
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": "def f():\n    return 1\n",
+                    "b.py": "def g():\n    return 1\n",
+                },
+                {"b.py": "def g():\n    return 2\n"},
+            ]
+        )
+        head = create_branch(
+            repo_dir, "feature", commits[0], {"a.py": "def f():\n    return 2\n"}
+        )
+        event = {
+            "pull_request": {
+                "base": {"sha": commits[1]},
+                "head": {
+                    "sha": head,
+                    "repo": {"html_url": "https://github.com/bugout-dev/locust"},
+                },
+                "_links": {"comments": {"href": "https://api.github.com/comments"}},
+            }
+        }
+        parser = github.generate_argument_parser()
+
+        changed_definitions: List[List[str]] = []
+        for flags in [[], ["--no-merge-base"]]:
+            args = parser.parse_args(
+                ["publish", "-r", repo_dir, "--retries", "0", "--no-gzip"] + flags
+            )
+            with StandInAPI([]) as api:
+                with mock.patch.dict(os.environ, {"BUGOUT_API_URL": api.url}):
+                    github.helper_pr(args, event)
+            summary = json.loads(api.requests[0]["body"])
+            changed_definitions.append(
+                [
+                    change["name"]
+                    for item in summary["locust"]
+                    for change in item["changes"]
+                ]
+            )
+
+        # By default, the change to b.py on the base branch is left out.
+        self.assertListEqual(changed_definitions, [["f"], ["f", "g"]])
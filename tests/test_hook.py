@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from google.protobuf.json_format import MessageToDict
+
+from locust import git, hook, parse, render
+
+from .repository import create_repository
+
+NULL_HASH = "0" * 40
+
+
+class TestLocustHook(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n", "b.py": "class C:\n    pass\n"},
+                {"b.py": "class C:\n    x = 1\n"},
+            ],
+            bare=True,
+        )
+
+    def test_git_bare(self):
+        git_result = git.run(self.repo_dir, self.commits[0], self.commits[2])
+        self.assertEqual(git_result.repo, os.path.normpath(self.repo_dir))
+        self.assertListEqual(
+            sorted(patch.new_file for patch in git_result.patches), ["a.py", "b.py"]
+        )
+        for patch in git_result.patches:
+            self.assertIsNotNone(patch.new_source)
+
+        with self.assertRaises(ValueError):
+            git.run(self.repo_dir, self.commits[0], None)
+
+    def test_read_updates(self):
+        updates = hook.read_updates(
+            io.StringIO(
+                f"{self.commits[0]} {self.commits[2]} refs/heads/main\n"
+                "\n"
+                f"{NULL_HASH} {self.commits[1]} refs/heads/feature\n"
+            )
+        )
+        self.assertListEqual(
+            updates,
+            [
+                hook.RefUpdate(self.commits[0], self.commits[2], "refs/heads/main"),
+                hook.RefUpdate(NULL_HASH, self.commits[1], "refs/heads/feature"),
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            hook.read_updates(io.StringIO("invalid\n"))
+
+    def test_hook_run(self):
+        updates = [
+            hook.RefUpdate(self.commits[0], self.commits[2], "refs/heads/main"),
+            hook.RefUpdate(NULL_HASH, self.commits[1], "refs/heads/feature"),
+            hook.RefUpdate(NULL_HASH, self.commits[0], "refs/heads/initial"),
+            hook.RefUpdate(self.commits[1], NULL_HASH, "refs/heads/deleted"),
+        ]
+        repository = hook.open_repository(self.repo_dir)
+        results = list(hook.run(repository, updates, []))
+
+        # Deleted refs are skipped, and new refs are compared against their first parent.
+        self.assertListEqual([update for update, _ in results], updates[:3])
+        expected_revisions = [
+            (self.commits[0], self.commits[2]),
+            (self.commits[0], self.commits[1]),
+            (git.NULL_REVISION, self.commits[0]),
+        ]
+        for (_, parse_result), (initial, terminal) in zip(results, expected_revisions):
+            expected = parse.run(git.run(self.repo_dir, initial, terminal), [])
+            self.assertDictEqual(MessageToDict(parse_result), MessageToDict(expected))
+
+    def test_hook_open_repository(self):
+        other_dir, other_commits = create_repository([{"c.py": "x = 1\n"}], bare=True)
+        with mock.patch.dict(os.environ, {"GIT_DIR": other_dir}):
+            repository = hook.open_repository()
+            self.assertEqual(
+                os.path.normpath(repository.path), os.path.normpath(other_dir)
+            )
+            # A repository which is given explicitly takes precedence over GIT_DIR.
+            repository = hook.open_repository(self.repo_dir)
+            self.assertEqual(
+                os.path.normpath(repository.path), os.path.normpath(self.repo_dir)
+            )
+
+        # Objects in quarantine (which git exposes as alternates to pre-receive hooks) are visible.
+        alternates = {
+            "GIT_ALTERNATE_OBJECT_DIRECTORIES": os.path.join(other_dir, "objects")
+        }
+        with mock.patch.dict(os.environ, alternates):
+            repository = hook.open_repository(self.repo_dir)
+            self.assertIsNotNone(repository.get(other_commits[0]))
+
+    def test_hook_main(self):
+        directory = tempfile.mkdtemp()
+        updates_file = os.path.join(directory, "updates")
+        with open(updates_file, "w") as ofp:
+            print(f"{self.commits[2]} not-a-commit refs/heads/broken", file=ofp)
+            print(f"{self.commits[1]} {self.commits[2]} refs/heads/main", file=ofp)
+        output = os.path.join(directory, "results.ndjson")
+        hook.main(["-r", self.repo_dir, "-i", updates_file, "-o", output])
+
+        # Errors (here, the invalid commit of the first update) are reported without raising, and
+        # do not keep the other updates from being analyzed.
+        with open(output, "r") as ifp:
+            records = [json.loads(line) for line in ifp]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["ref"], "refs/heads/main")
+        self.assertEqual(records[0]["old"], self.commits[1])
+        self.assertEqual(records[0]["new"], self.commits[2])
+        git_result = git.run(self.repo_dir, self.commits[1], self.commits[2])
+        self.assertDictEqual(
+            records[0]["result"],
+            json.loads(render.run(parse.run(git_result, []), "json", None)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
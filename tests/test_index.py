@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+import unittest
+
+import pygit2
+
+from locust import git, index
+
+from .repository import SIGNATURE, create_repository
+
+
+class TestLocustIndex(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"pkg/mod.py": "def f():\n    return 1\n"},
+                {
+                    "pkg/mod.py": "class Foo:\n    def bar(self):\n        pass\n\ndef f():\n    return 1\n",
+                    "other.py": "def f():\n    pass\n",
+                },
+                {"pkg/mod.py": "def f():\n    return 2\n"},
+            ]
+        )
+        self.index_path = os.path.join(tempfile.mkdtemp(), "index.sqlite")
+        self.connection = index.connect(self.index_path)
+        self.addCleanup(self.connection.close)
+
+    def test_index_build_is_incremental(self):
+        self.assertEqual(
+            index.build(self.connection, self.repo_dir, self.commits[1]), 2
+        )
+        self.assertEqual(index.build(self.connection, self.repo_dir), 1)
+        self.assertEqual(index.build(self.connection, self.repo_dir), 0)
+
+    def test_index_commits_touching(self):
+        index.build(self.connection, self.repo_dir)
+
+        # Foo.bar was added in the second commit and removed in the third.
+        results = index.commits_touching(self.connection, "Foo.bar")
+        self.assertListEqual(
+            [result["commit"] for result in results], [self.commits[1], self.commits[2]]
+        )
+
+        results = index.commits_touching(self.connection, "pkg.mod.f")
+        self.assertListEqual(
+            [result["commit"] for result in results],
+            [self.commits[0], self.commits[2]],
+        )
+        self.assertTrue(all(result["filepath"] == "pkg/mod.py" for result in results))
+
+        self.assertEqual(len(index.commits_touching(self.connection, "f")), 3)
+
+    def test_index_definitions_at(self):
+        index.build(self.connection, self.repo_dir)
+        repository = git.get_repository(self.repo_dir)
+
+        start = time.perf_counter()
+        results = index.definitions_at(
+            self.connection, repository, self.commits[1], "Foo.bar"
+        )
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertListEqual(
+            results,
+            [
+                {
+                    "filepath": "pkg/mod.py",
+                    "name": "Foo.bar",
+                    "type": "function",
+                    "line": 2,
+                    "end_line": 3,
+                }
+            ],
+        )
+        self.assertListEqual(
+            index.definitions_at(self.connection, repository, "HEAD", "Foo.bar"), []
+        )
+        self.assertListEqual(
+            [
+                (result["filepath"], result["line"])
+                for result in index.definitions_at(
+                    self.connection, repository, self.commits[1], "f"
+                )
+            ],
+            [("other.py", 1), ("pkg/mod.py", 5)],
+        )
+        self.assertListEqual(
+            [
+                (result["filepath"], result["line"])
+                for result in index.definitions_at(
+                    self.connection, repository, "HEAD", "pkg.mod.f"
+                )
+            ],
+            [("pkg/mod.py", 1)],
+        )
+
+    def test_index_non_utf8_sources(self):
+        repository = git.get_repository(self.repo_dir)
+        tree_index = pygit2.Index()
+        tree_index.read_tree(repository.revparse_single("HEAD").peel(pygit2.Tree))
+        blob_id = repository.create_blob(
+            "# caf\xe9\ndef g():\n    pass\n".encode("latin-1")
+        )
+        tree_index.add(pygit2.IndexEntry("latin.py", blob_id, pygit2.GIT_FILEMODE_BLOB))
+        commit = repository.create_commit(
+            "refs/heads/main",
+            SIGNATURE,
+            SIGNATURE,
+            "Latin-1 source",
+            tree_index.write_tree(repository),
+            [repository.head.target],
+        )
+        index.build(self.connection, self.repo_dir)
+
+        # Definitions are stored under the blob they were read from.
+        self.assertListEqual(
+            [
+                (result["filepath"], result["line"])
+                for result in index.definitions_at(
+                    self.connection, repository, str(commit), "g"
+                )
+            ],
+            [("latin.py", 2)],
+        )
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+
+from google.protobuf.json_format import MessageToDict
+
+from locust import git, log, parse
+
+from .repository import create_repository
+
+
+class TestLocustLog(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n", "b.py": "class C:\n    pass\n"},
+                {"b.py": "class C:\n    x = 1\n"},
+                {"a.py": None},
+            ]
+        )
+
+    def test_log_run(self):
+        cache: parse.DefinitionsCache = {}
+        results = list(
+            log.run(self.repo_dir, f"{self.commits[0]}..HEAD", [], cache=cache)
+        )
+
+        self.assertEqual(len(results), 3)
+        for parent, commit, parse_result in zip(
+            self.commits, self.commits[1:], results
+        ):
+            expected = parse.run(git.run(self.repo_dir, parent, commit), [])
+            self.assertDictEqual(MessageToDict(parse_result), MessageToDict(expected))
+        # Definitions are only extracted once for each version of a.py and b.py, although every
+        # version but the last is parsed on both sides of a commit.
+        self.assertEqual(len(cache), 4)
+
+    def test_log_main(self):
+        output = os.path.join(tempfile.mkdtemp(), "log.ndjson")
+        log.main(["-r", self.repo_dir, "-o", output, "HEAD~1"])
+
+        with open(output, "r") as ifp:
+            results = [json.loads(line) for line in ifp]
+        self.assertListEqual(
+            [(result["initial_ref"], result["terminal_ref"]) for result in results],
+            [
+                (git.NULL_REVISION, self.commits[0][:7]),
+                (self.commits[0][:7], self.commits[1][:7]),
+                (self.commits[1][:7], self.commits[2][:7]),
+            ],
+        )
+
+        # Malformed ranges are usage errors.
+        for revision_range in ["HEAD..", "..HEAD", "HEAD~2...HEAD"]:
+            with self.assertRaises(SystemExit):
+                log.main(["-r", self.repo_dir, "-o", output, revision_range])
+            with self.assertRaises(ValueError):
+                log.parse_range(revision_range)
@@ -0,0 +1,108 @@
+import unittest
+
+from google.protobuf.json_format import MessageToDict
+
+from locust import git, merge, parse
+
+from .repository import create_repository
+
+
+class TestLocustMerge(unittest.TestCase):
+    def setUp(self):
+        self.filepaths = [f"module_{i}.py" for i in range(12)]
+        self.repo_dir, self.commits = create_repository(
+            [
+                {
+                    filepath: f"def f_{i}():\n    return 1\n"
+                    for i, filepath in enumerate(self.filepaths)
+                },
+                {
+                    filepath: f"def f_{i}():\n    return 2\n\n\ndef g_{i}():\n    pass\n"
+                    for i, filepath in enumerate(self.filepaths)
+                },
+            ]
+        )
+
+    def test_parse_shard(self):
+        shard = git.parse_shard("1/3")
+        self.assertEqual((shard.index, shard.count), (1, 3))
+        for value in ["3/3", "1", "a/3", "-1/3", "1/0"]:
+            with self.assertRaises(ValueError):
+                git.parse_shard(value)
+
+    def test_git_shards(self):
+        shards = [git.Shard(index=i, count=3) for i in range(3)]
+        shard_paths = [
+            [
+                patch.new_file
+                for patch in git.run(
+                    self.repo_dir, self.commits[0], self.commits[1], shard=shard
+                ).patches
+            ]
+            for shard in shards
+        ]
+        # Every file is in exactly one shard, and shards are stable between runs.
+        self.assertListEqual(
+            sorted(path for paths in shard_paths for path in paths),
+            sorted(self.filepaths),
+        )
+        for shard, paths in zip(shards, shard_paths):
+            self.assertTrue(paths)
+            for path in paths:
+                self.assertEqual(git.shard_of(path, 3), shard.index)
+
+        full_result = git.run(self.repo_dir, self.commits[0], self.commits[1])
+        self.assertFalse(full_result.HasField("shard"))
+        for shard, paths in zip(shards, shard_paths):
+            shard_result = git.shard_result(full_result, shard)
+            self.assertEqual(shard_result.shard, shard)
+            self.assertListEqual(
+                [patch.new_file for patch in shard_result.patches], paths
+            )
+            with self.assertRaises(ValueError):
+                git.shard_result(shard_result, git.Shard(index=0, count=2))
+
+    def test_merge(self):
+        full_result = parse.run(
+            git.run(self.repo_dir, self.commits[0], self.commits[1]), []
+        )
+        shard_results = [
+            parse.run(
+                git.run(
+                    self.repo_dir,
+                    self.commits[0],
+                    self.commits[1],
+                    shard=git.Shard(index=i, count=3),
+                ),
+                [],
+            )
+            for i in range(3)
+        ]
+        for shard_result in shard_results:
+            self.assertEqual(shard_result.shard.count, 3)
+
+        merged = merge.merge(list(reversed(shard_results)))
+        self.assertDictEqual(MessageToDict(merged), MessageToDict(full_result))
+
+        with self.assertRaises(ValueError):
+            merge.merge(shard_results[:2])
+        with self.assertRaises(ValueError):
+            merge.merge(shard_results + [shard_results[0]])
+        with self.assertRaises(ValueError):
+            merge.merge([full_result])
+
+        other_result = parse.run(
+            git.run(
+                self.repo_dir,
+                self.commits[0],
+                None,
+                shard=git.Shard(index=2, count=3),
+            ),
+            [],
+        )
+        with self.assertRaises(ValueError):
+            merge.merge(shard_results[:2] + [other_result])
+
+
+if __name__ == "__main__":
+    unittest.main()
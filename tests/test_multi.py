@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import unittest
+from typing import Any, Dict, List
+
+from google.protobuf.json_format import MessageToDict
+
+from locust import git, multi, parse, render
+
+from .repository import create_repository
+
+
+class CountingCache(Dict[str, Any]):
+    def __init__(self):
+        super().__init__()
+        self.stored: List[str] = []
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.stored.append(key)
+        super().__setitem__(key, value)
+
+
+class TestLocustMulti(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n", "b.py": "class C:\n    pass\n"},
+                {"a.py": "def f():\n    return 2\n", "c.py": "def g():\n    pass\n"},
+                {"b.py": "class C:\n    x = 1\n"},
+            ]
+        )
+
+    def test_multi_run(self):
+        base = self.commits[0]
+        heads = [self.commits[1], self.commits[2], self.commits[2]]
+        sources = CountingCache()
+        cache = CountingCache()
+
+        results = multi.run(self.repo_dir, base, heads, [], sources, cache)
+
+        self.assertEqual(len(results), len(heads))
+        for head, parse_result in zip(heads, results):
+            expected = parse.run(git.run(self.repo_dir, base, head), [])
+            self.assertDictEqual(MessageToDict(parse_result), MessageToDict(expected))
+
+        # a.py and c.py are the same in both heads, so each of their sources is only read and parsed
+        # once, as are the base sources of a.py and b.py.
+        self.assertEqual(len(cache.stored), len(set(cache.stored)))
+        self.assertEqual(len(cache.stored), 5)
+        self.assertEqual(len(sources.stored), len(set(sources.stored)))
+
+    def test_multi_main(self):
+        output = os.path.join(tempfile.mkdtemp(), "results.ndjson")
+        multi.main(
+            ["-r", self.repo_dir, "-o", output, self.commits[0], "HEAD~1", "HEAD"]
+        )
+
+        with open(output, "r") as ifp:
+            records = [json.loads(line) for line in ifp]
+        self.assertListEqual([record["head"] for record in records], ["HEAD~1", "HEAD"])
+        for record in records:
+            git_result = git.run(self.repo_dir, self.commits[0], record["head"])
+            self.assertDictEqual(
+                record["result"],
+                json.loads(render.run(parse.run(git_result, []), "json", None)),
+            )
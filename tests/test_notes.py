@@ -0,0 +1,87 @@
+import unittest
+
+from google.protobuf.json_format import MessageToDict
+
+from locust import cli, git, notes
+
+from .repository import create_repository
+
+
+class TestLocustNotes(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n", "b.py": "class C:\n    pass\n"},
+            ]
+        )
+        self.repository = git.get_repository(self.repo_dir)
+
+    def test_notes_run_caches_results(self):
+        initial, terminal = self.commits
+        self.assertIsNone(
+            notes.lookup(self.repository, initial, terminal, [], "refs/notes/test")
+        )
+
+        result = notes.run(self.repo_dir, initial, terminal, [], "refs/notes/test")
+
+        cached_result = notes.lookup(
+            self.repository, initial, terminal, [], "refs/notes/test"
+        )
+        self.assertIsNotNone(cached_result)
+        self.assertDictEqual(MessageToDict(cached_result), MessageToDict(result))
+        self.assertDictEqual(
+            MessageToDict(
+                notes.run(self.repo_dir, initial, terminal, [], "refs/notes/test")
+            ),
+            MessageToDict(result),
+        )
+
+    def test_notes_cache_key(self):
+        initial, terminal = self.commits
+        notes.run(self.repo_dir, initial, terminal, [], "refs/notes/test")
+
+        # Results are keyed by plugin set and by revision pair.
+        self.assertIsNone(
+            notes.lookup(
+                self.repository, initial, terminal, ["plugin"], "refs/notes/test"
+            )
+        )
+        self.assertIsNone(
+            notes.lookup(
+                self.repository,
+                git.NULL_REVISION,
+                terminal,
+                [],
+                "refs/notes/test",
+            )
+        )
+
+        # Results for several revision pairs can be attached to the same terminal commit.
+        notes.run(self.repo_dir, "null", terminal, [], "refs/notes/test")
+        for initial_revision in [initial, git.NULL_REVISION]:
+            self.assertIsNotNone(
+                notes.lookup(
+                    self.repository,
+                    initial_revision,
+                    terminal,
+                    [],
+                    "refs/notes/test",
+                )
+            )
+
+    def test_notes_arguments(self):
+        parser = cli.generate_argument_parser()
+        initial, terminal = self.commits
+
+        # The flag does not take the revision which follows it as its ref.
+        args = parser.parse_args(["--notes-cache", initial, terminal])
+        self.assertEqual((args.initial, args.terminal), (initial, terminal))
+        self.assertEqual(notes.notes_ref_from_args(args), notes.DEFAULT_NOTES_REF)
+
+        args = parser.parse_args(["--notes-ref", "refs/notes/test", initial])
+        self.assertIsNone(notes.notes_ref_from_args(args))
+        args = parser.parse_args(
+            ["--notes-cache", "--notes-ref", "refs/notes/test", initial]
+        )
+        self.assertEqual(notes.notes_ref_from_args(args), "refs/notes/test")
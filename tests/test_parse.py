@@ -4,9 +4,10 @@ import unittest
 
 from google.protobuf.json_format import MessageToDict, Parse
 
-from locust import git, parse
+from locust import git, parse, render
 
 from . import config
+from .repository import create_repository
 
 
 class TestLocustParse(unittest.TestCase):
@@ -59,3 +60,221 @@ class TestLocustParse(unittest.TestCase):
         result_json = MessageToDict(result, preserving_proto_field_name=True)
 
         self.assertDictEqual(result_json, expected_result_json)
+
+    def test_parse_classification(self):
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": (
+                        "import os\nimport sys\n\n"
+                        "def f(x):\n    return x + 1\n\n"
+                        'def g():\n    """Does g."""\n    return 1\n\n'
+                        "def h():\n    return 1\n"
+                    )
+                },
+                {
+                    "a.py": (
+                        "import sys\nimport os\n\n"
+                        "def f( x ):\n    # Increments x\n    return (x+1)\n\n"
+                        'def g():\n    """Does g, and returns 1."""\n    return 1\n\n'
+                        "def h():\n    return 2\n"
+                    )
+                },
+            ]
+        )
+        git_result = git.run(repo_dir, commits[0], commits[1])
+
+        changes = parse.run(git_result, []).changes
+        classifications = {change.name: change.classification for change in changes}
+        # Reordered imports are cosmetic, whichever of them the diff reports as moved.
+        for change in changes:
+            if change.change_type == "dependency":
+                self.assertEqual(change.classification, parse.COSMETIC)
+        self.assertEqual(classifications["f"], parse.COSMETIC)
+        self.assertEqual(classifications["g"], parse.SEMANTIC)
+        self.assertEqual(classifications["h"], parse.SEMANTIC)
+
+        result = parse.run(git_result, [], ignore_docstrings=True)
+        classifications = {
+            change.name: change.classification for change in result.changes
+        }
+        self.assertEqual(classifications["g"], parse.COSMETIC)
+        self.assertEqual(classifications["h"], parse.SEMANTIC)
+
+    def test_parse_classification_of_usages(self):
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": (
+                        "import os\n\n"
+                        "def f():\n    return os.getcwd()\n\n"
+                        "def g():\n    x = os.getcwd()\n    return x\n"
+                    )
+                },
+                {
+                    "a.py": (
+                        "import os\n\n"
+                        "def f():\n    return os.getcwd( )\n\n"
+                        "def g():\n    x = os.getcwd()\n    y = os.getcwd()\n"
+                        "    return x + y\n"
+                    )
+                },
+            ]
+        )
+        changes = parse.run(git.run(repo_dir, commits[0], commits[1]), []).changes
+        usages = {
+            (change.line, change.name): change.classification
+            for change in changes
+            if change.change_type == "usage"
+        }
+        # The new call in g (line 8) uses a symbol which the old source already used, but it is
+        # still new. The call in f (line 4) was only reformatted.
+        self.assertDictEqual(
+            usages,
+            {
+                (4, "os"): parse.COSMETIC,
+                (4, "os.getcwd"): parse.COSMETIC,
+                (8, "os"): parse.SEMANTIC,
+                (8, "os.getcwd"): parse.SEMANTIC,
+            },
+        )
+
+    def test_parse_moves(self):
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": (
+                        "def f(x):\n    return x + 1\n\n"
+                        "def g(x):\n    return x - 1\n\n"
+                        "class C:\n    pass\n"
+                    )
+                },
+                {
+                    "a.py": "class C:\n    pass\n",
+                    "b.py": (
+                        "def f(x):\n    # Moved\n    return x + 1\n\n"
+                        "def g(x):\n    return x - 2\n\n"
+                        "def h():\n    pass\n"
+                    ),
+                },
+            ]
+        )
+        result = parse.run(git.run(repo_dir, commits[0], commits[1]), [])
+
+        moves = {
+            change.name: (change.status, change.previous_filepath)
+            for change in result.changes
+            if change.filepath == "b.py"
+        }
+        self.assertDictEqual(
+            moves,
+            {
+                "f": (parse.MOVED, "a.py"),
+                "g": (parse.MOVED_MODIFIED, "a.py"),
+                "h": (parse.ADDED, ""),
+            },
+        )
+        # The definitions which moved are not reported as removed from a.py.
+        self.assertListEqual(
+            [change.name for change in result.changes if change.filepath == "a.py"], []
+        )
+
+    def test_parse_moves_by_name(self):
+        old_main = "def main():\n    run()\n"
+        new_main = (
+            "def main():\n    parser = make_parser()\n    args = parser.parse_args()\n"
+            "    for path in args.paths:\n        check(path)\n    report()\n"
+        )
+        for delete_origin, expected in [
+            (False, {("a.py", "main"): parse.REMOVED, ("b.py", "main"): parse.ADDED}),
+            (True, {("b.py", "main"): parse.MOVED_MODIFIED}),
+        ]:
+            repo_dir, commits = create_repository(
+                [
+                    {"a.py": "def run():\n    pass\n\n" + old_main},
+                    {
+                        "a.py": None if delete_origin else "def run():\n    pass\n",
+                        "b.py": new_main,
+                    },
+                ]
+            )
+            result = parse.run(git.run(repo_dir, commits[0], commits[1]), [])
+            changes = {
+                (change.filepath, change.name): change.status
+                for change in result.changes
+                if change.name == "main"
+            }
+            # An unrelated function with the same name only counts as moved if its origin is gone.
+            self.assertDictEqual(changes, expected)
+
+    def test_parse_moved_class_with_changed_method(self):
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": "def h():\n    pass\n",
+                    "c.py": "class B:\n    def f(self):\n        return 1\n",
+                },
+                {
+                    "a.py": (
+                        "def h():\n    pass\n\n"
+                        "class B:\n    def g(self):\n        return 1\n"
+                    ),
+                    "c.py": None,
+                },
+            ]
+        )
+        result = parse.run(git.run(repo_dir, commits[0], commits[1]), [])
+
+        changes = {
+            (change.filepath, change.name): change.status for change in result.changes
+        }
+        # B.f went with B, so its removal is not reported under the B which no longer exists in c.py.
+        self.assertDictEqual(
+            changes,
+            {
+                ("a.py", "B"): parse.MOVED_MODIFIED,
+                ("a.py", "B.g"): parse.ADDED,
+            },
+        )
+        render.run(result, "json", None)
+
+        repo_dir, commits = create_repository(
+            [
+                {
+                    "a.py": (
+                        "class C:\n    def f(self):\n        x = 1\n        return x\n\n"
+                        "    def g(self):\n        pass\n\n"
+                        "def h():\n    pass\n"
+                    ),
+                    "b.py": "def k():\n    pass\n",
+                },
+                {
+                    "a.py": "class C:\n    def f(self):\n        return 1\n\ndef i():\n    pass\n",
+                    "b.py": None,
+                },
+            ]
+        )
+        result = parse.run(git.run(repo_dir, commits[0], commits[1]), [])
+
+        changes = {
+            (change.filepath, change.name): (
+                change.status,
+                change.line,
+                change.parent.name,
+                change.parent.line,
+            )
+            for change in result.changes
+        }
+        self.assertDictEqual(
+            changes,
+            {
+                ("a.py", "C"): (parse.MODIFIED, 1, "", 0),
+                ("a.py", "C.f"): (parse.MODIFIED, 2, "C", 1),
+                # Lines of removed definitions refer to the old source, but they nest under the new
+                # version of their parent.
+                ("a.py", "C.g"): (parse.REMOVED, 6, "C", 1),
+                ("a.py", "h"): (parse.REMOVED, 9, "", 0),
+                ("a.py", "i"): (parse.ADDED, 5, "", 0),
+                ("b.py", "k"): (parse.REMOVED, 1, "", 0),
+            },
+        )
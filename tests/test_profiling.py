@@ -0,0 +1,72 @@
+import json
+import unittest
+
+from locust import git, parse, profiling, render
+
+from .repository import create_repository
+
+
+class TestLocustProfiling(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {
+                    "a.py": "def f():\n    return 1\n",
+                    "b.py": "class C:\n    pass\n",
+                },
+                {
+                    "a.py": "def f():\n    return 2\n",
+                    "b.py": "class C:\n    x = [i for i in range(10)]\n",
+                },
+            ]
+        )
+
+    def test_measure_disabled(self):
+        self.assertIsNone(profiling.active_profiler.get())
+        self.assertIs(profiling.measure(profiling.DIFF), profiling.NOT_MEASURED)
+
+    def test_profiling(self):
+        with profiling.profiling() as profiler:
+            parse_result = parse.run(
+                git.run(self.repo_dir, self.commits[0], self.commits[1]), []
+            )
+            render.run(parse_result, "json", None)
+        self.assertIsNone(profiling.active_profiler.get())
+
+        stats = profiler.stats()
+        self.assertListEqual(
+            [cost.name for cost in stats.stages],
+            [
+                profiling.OPEN,
+                profiling.DIFF,
+                profiling.BLOBS,
+                profiling.AST_PARSE,
+                profiling.VISITOR,
+                profiling.CHANGES,
+                profiling.RENDER,
+            ],
+        )
+        stages = {cost.name: cost for cost in stats.stages}
+        # Old and new sources of both files are parsed.
+        self.assertEqual(stages[profiling.AST_PARSE].calls, 4)
+        self.assertGreater(stages[profiling.AST_PARSE].allocated_bytes, 0)
+        for cost in stats.stages:
+            self.assertGreaterEqual(cost.wall_time, 0)
+        self.assertListEqual(
+            sorted(cost.name for cost in stats.files), ["a.py", "b.py"]
+        )
+
+        parse_result.stats.CopyFrom(stats)
+        results = json.loads(render.run(parse_result, "json", None))
+        self.assertListEqual(
+            [cost["name"] for cost in results["stats"]["files"]], ["a.py", "b.py"]
+        )
+        self.assertIsInstance(results["stats"]["stages"][0]["allocated_bytes"], int)
+
+        table = profiling.format_stats(stats, top=1)
+        self.assertIn("slowest files (top 1)", table)
+        self.assertEqual(table.count(".py"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
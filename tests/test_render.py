@@ -4,9 +4,10 @@ import unittest
 
 from google.protobuf.json_format import Parse
 
-from locust import parse, render
+from locust import git, parse, render
 
 from . import config
+from .repository import create_repository
 
 
 class TestLocustRender(unittest.TestCase):
@@ -32,3 +33,69 @@ class TestLocustRender(unittest.TestCase):
         result = json.loads(render.run(test_input, "json", None))
 
         self.assertDictEqual(result, expected_result)
+
+    def test_render_max_changes(self):
+        test_input_fixture = os.path.join(
+            config.TESTS_DIR, "fixtures", "test_parse.json"
+        )
+        with open(test_input_fixture) as ifp:
+            test_input = Parse(ifp.read(), parse.ParseResult())
+
+        result = json.loads(render.run(test_input, "json", None, max_changes=1))
+
+        self.assertEqual(len(result["locust"]), 1)
+        self.assertEqual(len(result["locust"][0]["changes"]), 1)
+        self.assertEqual(result["locust"][0]["omitted"], 3)
+
+    def test_render_max_bytes(self):
+        test_input_fixture = os.path.join(
+            config.TESTS_DIR, "fixtures", "test_parse.json"
+        )
+        with open(test_input_fixture) as ifp:
+            test_input = Parse(ifp.read(), parse.ParseResult())
+
+        full_result = render.run(test_input, "github", None)
+        for max_bytes in [300, 600, len(full_result.encode()) - 1]:
+            result = render.run(test_input, "github", None, max_bytes=max_bytes)
+            self.assertLessEqual(len(result.encode()), max_bytes)
+            self.assertIn("more change", result)
+
+        result = render.run(
+            test_input, "github", None, max_bytes=2 * len(full_result.encode())
+        )
+        self.assertEqual(result, full_result)
+
+        with self.assertRaises(ValueError):
+            render.run(test_input, "github", None, max_bytes=100)
+        with self.assertRaises(ValueError):
+            render.run(test_input, "json", None, max_bytes=10000)
+
+        # From the command line, both are usage errors.
+        for args in [["-f", "github", "--max-bytes", "100"], ["--max-bytes", "10000"]]:
+            with self.assertRaises(SystemExit):
+                render.main(["-i", test_input_fixture, "-o", os.devnull, *args])
+
+    def test_render_drop_cosmetic(self):
+        repo_dir, commits = create_repository(
+            [
+                {"a.py": "class C:\n    def f(self):\n        return 1\n"},
+                {"a.py": "class C:\n    def f(self):\n        return 2\n"},
+                {"a.py": "class C:\n\n    def f(self):\n        return  2\n"},
+            ]
+        )
+        for initial, terminal, expected in [
+            (commits[0], commits[1], ["C"]),
+            (commits[1], commits[2], []),
+        ]:
+            parse_result = parse.run(git.run(repo_dir, initial, terminal), [])
+            result = json.loads(
+                render.run(parse_result, "json", None, drop_cosmetic=True)
+            )
+            self.assertListEqual(
+                [
+                    change["name"]
+                    for item in result["locust"]
+                    for change in item["changes"]
+                ],
+                expected,
+            )
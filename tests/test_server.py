@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from locust import git, parse, render, server
+
+from .repository import create_repository
+
+TOKEN = "test-token"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def post(
+    connection: http.client.HTTPConnection,
+    request: Dict[str, Any],
+    token: Optional[str] = TOKEN,
+    content_type: str = "application/json",
+) -> Tuple[int, str]:
+    headers = {"Content-Type": content_type}
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    connection.request("POST", "/analyze", body=json.dumps(request), headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read().decode()
+
+
+class TestLocustServer(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n", "b.py": "class C:\n    pass\n"},
+                {"b.py": "class C:\n    x = 1\n"},
+            ]
+        )
+
+    def start(self, analyzer: Optional[server.Analyzer] = None, **kwargs: Any) -> None:
+        if analyzer is None:
+            analyzer = server.Analyzer(cache_size=100)
+        self.server = server.create_server(analyzer, TOKEN, **kwargs)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def expected(self, initial: str, terminal: str, render_format: str) -> str:
+        git_result = git.run(self.repo_dir, initial, terminal)
+        return render.run(parse.run(git_result, []), render_format, None)
+
+    def test_server_concurrent_requests(self):
+        self.start(port=0)
+        port = self.server.server_address[1]
+
+        pairs = [
+            (initial, terminal, render_format)
+            for initial, terminal in [
+                (self.commits[0], self.commits[1]),
+                (self.commits[1], self.commits[2]),
+                ("null", self.commits[2]),
+            ]
+            for render_format in ["json", "yaml", "github"]
+        ]
+
+        def query(pair: Tuple[str, str, str]) -> Tuple[int, str]:
+            initial, terminal, render_format = pair
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            try:
+                return post(
+                    connection,
+                    {
+                        "repo": self.repo_dir,
+                        "initial": initial,
+                        "terminal": terminal,
+                        "format": render_format,
+                    },
+                )
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(query, pairs))
+
+        for pair, (status, body) in zip(pairs, responses):
+            self.assertEqual(status, 200)
+            self.assertEqual(body, self.expected(*pair))
+
+    def test_server_unix_socket(self):
+        socket_path = os.path.join(tempfile.mkdtemp(), "locust.sock")
+        self.start(socket_path=socket_path)
+
+        connection = UnixHTTPConnection(socket_path)
+        self.addCleanup(connection.close)
+        # Requests reuse the same (keep-alive) connection.
+        for _ in range(2):
+            status, body = post(
+                connection,
+                {
+                    "repo": self.repo_dir,
+                    "initial": self.commits[0],
+                    "terminal": self.commits[1],
+                },
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(
+                body, self.expected(self.commits[0], self.commits[1], "json")
+            )
+
+        status, body = post(connection, {"repo": self.repo_dir, "format": "pdf"})
+        self.assertEqual(status, 400)
+        self.assertIn("error", json.loads(body))
+
+    def test_server_rejects_unauthorized_requests(self):
+        marker = os.path.join(tempfile.mkdtemp(), "pwned")
+        self.start(port=0)
+        connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.server_address[1]
+        )
+        self.addCleanup(connection.close)
+        request = {
+            "repo": self.repo_dir,
+            "initial": self.commits[0],
+            "terminal": self.commits[1],
+        }
+
+        self.assertEqual(post(connection, request, token=None)[0], 401)
+        self.assertEqual(post(connection, request, token="wrong")[0], 401)
+        self.assertEqual(post(connection, request, content_type="text/plain")[0], 415)
+
+        # Plugins are shell commands, so requests cannot choose them.
+        status, body = post(connection, {**request, "plugins": [f"touch {marker} #"]})
+        self.assertEqual(status, 400)
+        self.assertIn("error", json.loads(body))
+        self.assertFalse(os.path.exists(marker))
+
+        self.assertEqual(post(connection, request)[0], 200)
+
+    def test_server_plugins(self):
+        marker = os.path.join(tempfile.mkdtemp(), "plugin-ran")
+        # A plugin which records that it ran and reports no changes.
+        plugin = (
+            f"{sys.executable} -c \"import sys; open({marker!r}, 'w'); "
+            f"open(sys.argv[-1], 'w').write('[]')\""
+        )
+        self.start(server.Analyzer(cache_size=100, plugins=[plugin]), port=0)
+        connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.server_address[1]
+        )
+        self.addCleanup(connection.close)
+        status, _ = post(
+            connection,
+            {
+                "repo": self.repo_dir,
+                "initial": self.commits[0],
+                "terminal": self.commits[1],
+            },
+        )
+        self.assertEqual(status, 200)
+        self.assertTrue(os.path.exists(marker))
+
+    def test_server_requires_token(self):
+        with self.assertRaises(ValueError):
+            server.generate_request_handler(server.Analyzer(cache_size=100), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import subprocess
+import sys
+import unittest
+from typing import Dict, List, Tuple
+
+# Dependencies which are only needed on specific code paths, and which should therefore never be
+# imported just to start up a locust entry point.
+HEAVY_MODULES = [
+    "pygit2",
+    "lxml",
+    "yaml",
+    "pydantic",
+    "requests",
+    "google.protobuf.json_format",
+]
+
+# Budgets (in microseconds) for the cumulative import time of each entry point, measured with
+# python -X importtime. These are deliberately loose, so that they only trip when a heavy import
+# creeps back into module scope.
+STARTUP_BUDGETS: Dict[str, int] = {
+    "locust.cli": 250000,
+    "locust.version": 20000,
+    "locust.git": 150000,
+    "locust.parse": 200000,
+    "locust.render": 200000,
+    "locust.ci_helpers.github": 250000,
+}
+
+
+def import_times(entry_point: str) -> List[Tuple[str, int]]:
+    """
+    Starts up the given entry point (by invoking its main function with --help) in a fresh Python
+    process and returns a list of (module name, cumulative import time in microseconds) pairs, one
+    for each module which was imported.
+    """
+    script = (
+        "import sys\n"
+        f"import {entry_point}\n"
+        "sys.argv = ['locust', '--help']\n"
+        "try:\n"
+        f"    {entry_point}.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    times: List[Tuple[str, int]] = []
+    for line in result.stderr.decode().splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        times.append((module.strip(), int(cumulative)))
+    return times
+
+
+class TestLocustStartup(unittest.TestCase):
+    def test_no_heavy_imports(self):
+        for entry_point in STARTUP_BUDGETS:
+            with self.subTest(entry_point=entry_point):
+                modules = {module for module, _ in import_times(entry_point)}
+                heavy_imports = [
+                    module for module in HEAVY_MODULES if module in modules
+                ]
+                self.assertListEqual(heavy_imports, [])
+
+    def test_startup_budgets(self):
+        for entry_point, budget in STARTUP_BUDGETS.items():
+            with self.subTest(entry_point=entry_point):
+                # Take the best of a few runs to smooth out noise from the environment.
+                best = min(
+                    dict(import_times(entry_point))[entry_point] for _ in range(3)
+                )
+                self.assertLessEqual(best, budget)
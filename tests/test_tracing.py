@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from locust import git, parse, render, tracing
+
+from .repository import create_repository
+
+
+class TestLocustTracing(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {"a.py": "def f():\n    return 1\n"},
+                {"a.py": "def f():\n    return 2\n"},
+            ]
+        )
+        with open(os.path.join(self.repo_dir, "a.py"), "w") as ofp:
+            ofp.write("def f():\n    return 3\n")
+
+    def test_span_disabled(self):
+        self.assertIsNone(tracing.active_tracer)
+        self.assertIs(tracing.span("diff", "git"), tracing.NOT_TRACED)
+
+    def test_tracing(self):
+        # A plugin which reports no changes.
+        plugin = (
+            f"{sys.executable} -c \"import sys; open(sys.argv[-1], 'w').write('[]')\""
+        )
+        trace_path = os.path.join(tempfile.mkdtemp(), "trace.json")
+        with tracing.tracing(trace_path):
+            parse_result = parse.run(
+                git.run(self.repo_dir, self.commits[0], None), [plugin]
+            )
+            render.run(parse_result, "yaml", None)
+
+            def work() -> None:
+                with tracing.span("work", "test"):
+                    pass
+
+            work()
+            worker = threading.Thread(target=work, name="worker")
+            worker.start()
+            worker.join()
+        self.assertIsNone(tracing.active_tracer)
+
+        with open(trace_path, "r") as ifp:
+            trace = json.load(ifp)
+        spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+        self.assertListEqual(
+            sorted(set((span["cat"], span["name"]) for span in spans)),
+            [
+                ("git", "blob_source"),
+                ("git", "diff"),
+                ("git", "open repository"),
+                ("git", "revision_file"),
+                ("parse", "patch_definitions"),
+                ("plugin", plugin),
+                ("render", "render yaml"),
+                ("test", "work"),
+            ],
+        )
+        for span in spans:
+            self.assertEqual(span["pid"], os.getpid())
+            self.assertGreaterEqual(span["dur"], 0)
+
+        thread_names = {
+            event["tid"]: event["args"]["name"]
+            for event in trace["traceEvents"]
+            if event["name"] == "thread_name"
+        }
+        self.assertListEqual(
+            sorted(
+                thread_names[span["tid"]] for span in spans if span["cat"] == "test"
+            ),
+            ["MainThread", "worker"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
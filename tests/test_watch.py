@@ -0,0 +1,129 @@
+import os
+import socket
+import tempfile
+import unittest
+from typing import Any, Dict, List
+
+from google.protobuf.json_format import MessageToDict
+import pygit2
+
+from locust import git, parse, watch
+
+from .repository import SIGNATURE, create_repository
+
+
+class CountingCache(Dict[str, Any]):
+    def __init__(self):
+        super().__init__()
+        self.stored: List[str] = []
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.stored.append(key)
+        super().__setitem__(key, value)
+
+
+class TestLocustWatch(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir, self.commits = create_repository(
+            [
+                {
+                    "a.py": "def f():\n    return 1\n",
+                    "b.py": "class C:\n    pass\n",
+                },
+            ]
+        )
+
+    def write(self, filepath: str, contents: str) -> None:
+        with open(os.path.join(self.repo_dir, filepath), "w") as ofp:
+            ofp.write(contents)
+
+    def assert_up_to_date(self, watcher: watch.Watcher) -> None:
+        expected = parse.run(git.run(self.repo_dir, None, None), [])
+        self.assertDictEqual(
+            MessageToDict(watcher.parse_result), MessageToDict(expected)
+        )
+
+    def test_watch_poll(self):
+        self.write("a.py", "def f():\n    return 2\n")
+        watcher = watch.Watcher(self.repo_dir, [])
+        self.assert_up_to_date(watcher)
+        self.assertIsNone(watcher.poll())
+
+        # Only the file which changed is parsed again.
+        cache = CountingCache()
+        cache.update(watcher.cache)
+        watcher.cache = cache
+        self.write("b.py", "class C:\n    x = 1\n")
+        self.write("untracked.py", "def g():\n    pass\n")
+        self.assertListEqual(watcher.poll() or [], ["b.py"])
+        self.assert_up_to_date(watcher)
+        self.assertListEqual(
+            cache.stored,
+            [
+                parse.definitions_cache_key("class C:\n    x = 1\n"),
+                parse.definitions_cache_key("class C:\n    pass\n"),
+            ],
+        )
+        cache.stored.clear()
+        self.write("b.py", "class C:\n    pass\n")
+        self.assertListEqual(watcher.poll() or [], ["b.py"])
+        self.assertListEqual(cache.stored, [])
+        self.assert_up_to_date(watcher)
+
+        os.remove(os.path.join(self.repo_dir, "a.py"))
+        self.assertListEqual(watcher.poll() or [], ["a.py"])
+        self.assert_up_to_date(watcher)
+
+    def test_watch_head_moves(self):
+        self.write("a.py", "def f():\n    return 2\n")
+        watcher = watch.Watcher(self.repo_dir, [])
+        self.assertEqual(len(watcher.parse_result.changes), 1)
+
+        repository = pygit2.Repository(self.repo_dir)
+        repository.index.add("a.py")
+        repository.index.write()
+        repository.create_commit(
+            "HEAD",
+            SIGNATURE,
+            SIGNATURE,
+            "Commit a.py",
+            repository.index.write_tree(),
+            [repository.head.target],
+        )
+        self.assertListEqual(watcher.poll() or [], ["a.py"])
+        self.assertEqual(len(watcher.parse_result.changes), 0)
+        self.assert_up_to_date(watcher)
+
+    def test_watch_broadcaster(self):
+        socket_path = os.path.join(tempfile.mkdtemp(), "watch.sock")
+        broadcaster = watch.Broadcaster(socket_path)
+        try:
+            broadcaster.send(b"first\n")
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(socket_path)
+            broadcaster.accept()
+            broadcaster.send(b"second\n")
+            received = b""
+            while received.count(b"\n") < 2:
+                received += client.recv(1024)
+            self.assertEqual(received, b"first\nsecond\n")
+            client.close()
+        finally:
+            broadcaster.close()
+        self.assertFalse(os.path.exists(socket_path))
+
+        # A stale socket is replaced, but other files are left alone.
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        watch.Broadcaster(socket_path).close()
+        with open(socket_path, "w") as ofp:
+            ofp.write("data\n")
+        with self.assertRaises(ValueError):
+            watch.Broadcaster(socket_path)
+        with open(socket_path, "r") as ifp:
+            self.assertEqual(ifp.read(), "data\n")
+
+
+if __name__ == "__main__":
+    unittest.main()